@@ -13,12 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from neutron_lib import constants as nl_constants
+
 FIREWALL = 'FIREWALL'
 FIREWALL_V2 = 'FIREWALL_V2'
 
 # Constants for "topics"
 FIREWALL_PLUGIN = 'q-firewall-plugin'
 FW_AGENT = 'firewall_agent'
+FW_AGENT_L3 = 'firewall_agent_l3'
+FW_AGENT_L2 = 'firewall_agent_l2'
 FIREWALL_RULE_LIST = 'firewall_rule_list'
 
 # V2 Constants
@@ -26,6 +30,12 @@ DEFAULT_FWG = 'default'
 DEFAULT_FWP_INGRESS = 'default ingress'
 DEFAULT_FWP_EGRESS = 'default egress'
 
+# Firewall group states forbidding any change of the firewall group, or of
+# its policies and rules
+PENDING_STATES = (nl_constants.PENDING_CREATE,
+                  nl_constants.PENDING_UPDATE,
+                  nl_constants.PENDING_DELETE)
+
 # Firewall group events for agent-side
 DELETE_FWG = 'delete_firewall_group'
 UPDATE_FWG = 'update_firewall_group'
@@ -0,0 +1,94 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Patches between two revisions of the ordered rule list of a policy
+
+A patch is a dictionary with the following keys:
+
+    base_revision - revision of the policy the patch applies to
+    revision      - revision of the policy the patch results in
+    removed       - IDs of the rules removed from the base rule list
+    updated       - [rule ID, {field: new value}] pairs of the rules kept
+    added         - [index, rule] pairs of the rules to insert, by ascending
+                    index in the resulting rule list
+
+Firewall groups sent to the agents carry a patch in place of the full rule
+list of a direction under the <direction>_rule_list_patch key.
+"""
+
+import copy
+
+DIRECTIONS = ('ingress', 'egress')
+
+
+def rule_list_key(direction):
+    return '%s_rule_list' % direction
+
+
+def revision_key(direction):
+    return '%s_rule_list_revision' % direction
+
+
+def patch_key(direction):
+    return '%s_rule_list_patch' % direction
+
+
+def make_patch(base_rules, rules, base_revision, revision):
+    """Return the patch turning base_rules into rules
+
+    None is returned when the kept rules were reordered or when the patch
+    would not be smaller than the rule list itself.
+    """
+    rule_ids = set(rule['id'] for rule in rules)
+    base_by_id = {rule['id']: rule for rule in base_rules}
+    kept_base_ids = [rule['id'] for rule in base_rules
+                     if rule['id'] in rule_ids]
+    kept_ids = [rule['id'] for rule in rules if rule['id'] in base_by_id]
+    if kept_base_ids != kept_ids:
+        return None
+    added = []
+    updated = []
+    for index, rule in enumerate(rules):
+        base_rule = base_by_id.get(rule['id'])
+        if base_rule is None:
+            added.append([index, rule])
+            continue
+        if set(rule) != set(base_rule):
+            return None
+        changes = {field: value for field, value in rule.items()
+                   if base_rule[field] != value}
+        if changes:
+            updated.append([rule['id'], changes])
+    if len(added) + len(updated) >= len(rules):
+        return None
+    return {'base_revision': base_revision,
+            'revision': revision,
+            'removed': [rule['id'] for rule in base_rules
+                        if rule['id'] not in rule_ids],
+            'updated': updated,
+            'added': added}
+
+
+def apply_patch(base_rules, patch):
+    """Return the rule list resulting from a patch applied to base_rules"""
+    removed = set(patch['removed'])
+    rules = [copy.deepcopy(rule) for rule in base_rules
+             if rule['id'] not in removed]
+    rules_by_id = {rule['id']: rule for rule in rules}
+    for rule_id, changes in patch['updated']:
+        rules_by_id[rule_id].update(changes)
+    for index, rule in patch['added']:
+        rules.insert(index, rule)
+    return rules
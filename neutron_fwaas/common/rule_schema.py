@@ -0,0 +1,122 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Slim representation of the firewall rules sent to the agents
+
+The agent drivers only read the match fields, the action, the enabled flag,
+the IP version and the ID of a rule. A slim rule is the list of these
+values, in the order of SLIM_FIELDS, with the port ranges encoded as
+[min, max] integer pairs and the protocol in lower case. Agents decode slim
+rules back to dictionaries holding only the fields the drivers read.
+"""
+
+from neutron_fwaas.common import rule_list_patch
+
+SLIM_FIELDS = ('id', 'ip_version', 'protocol', 'source_ip_address',
+               'destination_ip_address', 'source_port', 'destination_port',
+               'action', 'enabled')
+PORT_FIELDS = ('source_port', 'destination_port')
+
+
+def _encode_port_range(port_range):
+    if port_range is None:
+        return None
+    port_min, _sep, port_max = str(port_range).partition(':')
+    return [int(port_min), int(port_max or port_min)]
+
+
+def _decode_port_range(port_range):
+    if port_range is None:
+        return None
+    port_min, port_max = port_range
+    if port_min == port_max:
+        return '%d' % port_min
+    return '%d:%d' % (port_min, port_max)
+
+
+def encode_rule(rule):
+    """Return the slim rule of a firewall rule dictionary"""
+    values = []
+    for field in SLIM_FIELDS:
+        value = rule.get(field)
+        if field in PORT_FIELDS:
+            value = _encode_port_range(value)
+        elif field == 'protocol' and value is not None:
+            value = str(value).lower()
+        values.append(value)
+    return values
+
+
+def decode_rule(values):
+    """Return the firewall rule dictionary of a slim rule"""
+    rule = dict(zip(SLIM_FIELDS, values))
+    for field in PORT_FIELDS:
+        rule[field] = _decode_port_range(rule[field])
+    return rule
+
+
+def slim_rule(rule):
+    """Return a firewall rule dictionary stripped to the slim fields"""
+    return decode_rule(encode_rule(rule))
+
+
+def slim_firewall_group(firewall_group):
+    """Strip the rules of the rule lists of a firewall group in place
+
+    The rules are left as dictionaries, as decoded by the agents from the
+    slim rules of the firewall groups cast to them.
+    """
+    for direction in rule_list_patch.DIRECTIONS:
+        key = rule_list_patch.rule_list_key(direction)
+        if key in firewall_group:
+            firewall_group[key] = [slim_rule(rule)
+                                   for rule in firewall_group[key]]
+    return firewall_group
+
+
+def encode_firewall_group(firewall_group):
+    """Encode the rule lists and patches of a firewall group in place"""
+    for direction in rule_list_patch.DIRECTIONS:
+        key = rule_list_patch.rule_list_key(direction)
+        if key in firewall_group:
+            firewall_group[key] = [encode_rule(rule)
+                                   for rule in firewall_group[key]]
+        key = rule_list_patch.patch_key(direction)
+        patch = firewall_group.get(key)
+        if patch is not None:
+            # patches are shared by the firewall groups of a policy
+            firewall_group[key] = dict(
+                patch, added=[[index, encode_rule(rule)]
+                              for index, rule in patch['added']])
+    return firewall_group
+
+
+def decode_firewall_group(firewall_group):
+    """Decode the slim rules of a firewall group in place
+
+    The rules which are already dictionaries are left untouched.
+    """
+    for direction in rule_list_patch.DIRECTIONS:
+        key = rule_list_patch.rule_list_key(direction)
+        if key in firewall_group:
+            firewall_group[key] = [
+                decode_rule(rule) if isinstance(rule, list) else rule
+                for rule in firewall_group[key]]
+        patch = firewall_group.get(rule_list_patch.patch_key(direction))
+        if patch is not None:
+            patch['added'] = [
+                [index, decode_rule(rule) if isinstance(rule, list) else rule]
+                for index, rule in patch['added']]
+    return firewall_group
@@ -33,16 +33,22 @@ from oslo_db import exception as db_exc
 from oslo_log import log as logging
 from oslo_utils import uuidutils
 import sqlalchemy as sa
-from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy import or_
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
 
 from neutron_fwaas.common import fwaas_constants as const
+from neutron_fwaas.common import rule_list_patch
+from neutron_fwaas.common import rule_schema
+from neutron_fwaas.db.firewall.v2 import policy_cache
 
 
 LOG = logging.getLogger(__name__)
 
+# Gap left between the positions of consecutive rules of a policy, so that a
+# rule can be inserted or removed without renumbering the other rules.
+RULE_POSITION_GAP = 1024
+
 
 class FirewallDefaultParameterExists(exceptions.InUse):
     """Default Firewall Parameter conflict exception
@@ -91,19 +97,27 @@ class FirewallRuleV2(standard_attr.HasStandardAttributes, model_base.BASEV2,
 class FirewallGroup(standard_attr.HasStandardAttributes, model_base.BASEV2,
                     model_base.HasId, HasName, model_base.HasProject):
     __tablename__ = 'firewall_groups_v2'
+    __table_args__ = (
+        sa.Index('ix_firewall_groups_v2_project_id_name',
+                 'project_id', 'name'),
+        model_base.BASEV2.__table_args__
+    )
     port_associations = orm.relationship(
-        'FirewallGroupPortAssociation',
+        'FirewallGroupPortAssociation', lazy='selectin',
         backref=orm.backref('firewall_group_port_associations_v2',
                             cascade='all, delete'))
     name = sa.Column(sa.String(db_constants.NAME_FIELD_SIZE))
     ingress_firewall_policy_id = sa.Column(
         sa.String(db_constants.UUID_FIELD_SIZE),
-        sa.ForeignKey('firewall_policies_v2.id'))
+        sa.ForeignKey('firewall_policies_v2.id'),
+        index=True)
     egress_firewall_policy_id = sa.Column(
         sa.String(db_constants.UUID_FIELD_SIZE),
-        sa.ForeignKey('firewall_policies_v2.id'))
+        sa.ForeignKey('firewall_policies_v2.id'),
+        index=True)
     admin_state_up = sa.Column(sa.Boolean)
-    status = sa.Column(sa.String(db_constants.STATUS_FIELD_SIZE))
+    status = sa.Column(sa.String(db_constants.STATUS_FIELD_SIZE),
+                       index=True)
     shared = sa.Column(sa.Boolean)
     api_collections = ['firewall_groups']
     collection_resource_map = {"firewall_groups": "firewall_group"}
@@ -148,7 +162,7 @@ class FirewallPolicyRuleAssociation(model_base.BASEV2):
     firewall_rule_id = sa.Column(sa.String(db_constants.UUID_FIELD_SIZE),
                                  sa.ForeignKey('firewall_rules_v2.id',
                                                ondelete="CASCADE"),
-                                 primary_key=True)
+                                 primary_key=True, index=True)
     position = sa.Column(sa.Integer)
 
 
@@ -159,10 +173,9 @@ class FirewallPolicy(standard_attr.HasStandardAttributes, model_base.BASEV2,
     rule_count = sa.Column(sa.Integer)
     audited = sa.Column(sa.Boolean)
     rule_associations = orm.relationship(
-        FirewallPolicyRuleAssociation,
+        FirewallPolicyRuleAssociation, lazy='selectin',
         backref=orm.backref('firewall_policies_v2', cascade='all, delete'),
-        order_by='FirewallPolicyRuleAssociation.position',
-        collection_class=ordering_list('position', count_from=1))
+        order_by='FirewallPolicyRuleAssociation.position')
     shared = sa.Column(sa.Boolean)
     api_collections = ['firewall_policies']
     collection_resource_map = {"firewall_policies": "firewall_policy"}
@@ -206,15 +219,21 @@ class FirewallPluginDb(object):
             result_filters=_list_firewall_policies_result_filter_hook)
         return super(FirewallPluginDb, cls).__new__(cls, *args, **kwargs)
 
-    def _get_firewall_group(self, context, id):
+    def __init__(self, *args, **kwargs):
+        super(FirewallPluginDb, self).__init__(*args, **kwargs)
+        self.policy_rules_cache = policy_cache.PolicyRulesCache()
+
+    def _get_firewall_group(self, context, id, lazy_fields=None):
         try:
-            return model_query.get_by_id(context, FirewallGroup, id)
+            return model_query.get_by_id(context, FirewallGroup, id,
+                                         lazy_fields=lazy_fields)
         except exc.NoResultFound:
             raise f_exc.FirewallGroupNotFound(firewall_id=id)
 
-    def _get_firewall_policy(self, context, id):
+    def _get_firewall_policy(self, context, id, lazy_fields=None):
         try:
-            return model_query.get_by_id(context, FirewallPolicy, id)
+            return model_query.get_by_id(context, FirewallPolicy, id,
+                                         lazy_fields=lazy_fields)
         except exc.NoResultFound:
             raise f_exc.FirewallPolicyNotFound(firewall_policy_id=id)
 
@@ -321,8 +340,10 @@ class FirewallPluginDb(object):
         return db_utils.resource_fields(res, fields)
 
     def _make_firewall_group_dict(self, firewall_group_db, fields=None):
-        fwg_ports = [port_assoc.port_id for port_assoc in
-                     firewall_group_db.port_associations]
+        fwg_ports = None
+        if not fields or 'ports' in fields:
+            fwg_ports = [port_assoc.port_id for port_assoc in
+                         firewall_group_db.port_associations]
         res = {'id': firewall_group_db['id'],
                'tenant_id': firewall_group_db['tenant_id'],
                'name': firewall_group_db['name'],
@@ -342,28 +363,137 @@ class FirewallPluginDb(object):
         return db_utils.resource_fields(res, fields)
 
     def _get_policy_ordered_rules(self, context, policy_id):
-        query = (context.session.query(FirewallRuleV2)
-                 .join(FirewallPolicyRuleAssociation)
-                 .filter_by(firewall_policy_id=policy_id)
-                 .order_by(FirewallPolicyRuleAssociation.position))
-        return [self._make_firewall_rule_dict(rule) for rule in query]
+        return self._get_policies_ordered_rules(
+            context, [policy_id])[policy_id]
+
+    def _get_policies_revision_number(self, context, policy_ids):
+        query = (context.session.query(
+                     FirewallPolicy.id,
+                     standard_attr.StandardAttribute.revision_number)
+                 .join(standard_attr.StandardAttribute,
+                       standard_attr.StandardAttribute.id ==
+                       FirewallPolicy.standard_attr_id)
+                 .filter(FirewallPolicy.id.in_(list(policy_ids))))
+        return dict(query)
+
+    def _get_policies_ordered_rules(self, context, policy_ids):
+        """Return the ordered rules of several policies keyed by policy ID
+
+        The rule lists are served from the compiled policy cache when the
+        revision number of their policy did not change, the other ones are
+        fetched with a single query and cached.
+        """
+        policy_rules = {policy_id: [] for policy_id in policy_ids}
+        if not policy_ids:
+            return policy_rules
+        revisions = self._get_policies_revision_number(context, policy_ids)
+        missed_ids = set()
+        for policy_id in policy_rules:
+            rules = self.policy_rules_cache.get(policy_id,
+                                                revisions.get(policy_id))
+            if rules is None:
+                missed_ids.add(policy_id)
+            else:
+                policy_rules[policy_id] = rules
+        if not missed_ids:
+            return policy_rules
+        policy_id = FirewallPolicyRuleAssociation.firewall_policy_id
+        query = (context.session.query(FirewallRuleV2, policy_id)
+                 .join(FirewallPolicyRuleAssociation,
+                       FirewallPolicyRuleAssociation.firewall_rule_id ==
+                       FirewallRuleV2.id)
+                 .filter(policy_id.in_(list(missed_ids)))
+                 .order_by(policy_id, FirewallPolicyRuleAssociation.position))
+        for rule, rule_policy_id in query:
+            policy_rules[rule_policy_id].append(
+                self._make_firewall_rule_dict(rule))
+        for missed_id in missed_ids:
+            if missed_id in revisions:
+                self.policy_rules_cache.set(
+                    missed_id, revisions[missed_id], policy_rules[missed_id])
+        return policy_rules
+
+    def get_compiled_policies(self, context, policy_ids, slim=False):
+        """Return the compiled rule lists of policies keyed by policy ID
+
+        Each policy is returned as a dictionary holding its revision number,
+        its ordered rules and, when the revision previously compiled by this
+        process is known, the patch of its rule list from that revision.
+        The rules are stripped to the fields read by the agents if slim is
+        set.
+        """
+        with db_api.CONTEXT_READER.using(context):
+            self._get_policies_ordered_rules(context, policy_ids)
+        compiled = {}
+        for policy_id in policy_ids:
+            latest = self.policy_rules_cache.get_latest(policy_id)
+            if latest is None:
+                continue
+            revision, rules, previous = latest
+            if slim:
+                rules = [rule_schema.slim_rule(rule) for rule in rules]
+                if previous is not None:
+                    previous = (previous[0],
+                                [rule_schema.slim_rule(rule)
+                                 for rule in previous[1]])
+            patch = None
+            if previous is not None:
+                patch = rule_list_patch.make_patch(
+                    previous[1], rules, previous[0], revision)
+            compiled[policy_id] = {'revision': revision,
+                                   'rules': rules,
+                                   'patch': patch}
+        return compiled
 
     def make_firewall_group_dict_with_rules(self, context, firewall_group_id):
         firewall_group = self.get_firewall_group(context, firewall_group_id)
-        ingress_policy_id = firewall_group['ingress_firewall_policy_id']
-        if ingress_policy_id:
-            firewall_group['ingress_rule_list'] = (
-                self._get_policy_ordered_rules(context, ingress_policy_id))
-        else:
-            firewall_group['ingress_rule_list'] = []
+        return self._add_rule_lists_to_firewall_groups(
+            context, [firewall_group])[0]
 
-        egress_policy_id = firewall_group['egress_firewall_policy_id']
-        if egress_policy_id:
-            firewall_group['egress_rule_list'] = (
-                self._get_policy_ordered_rules(context, egress_policy_id))
-        else:
-            firewall_group['egress_rule_list'] = []
-        return firewall_group
+    def add_rule_lists_to_firewall_groups(self, context, firewall_groups):
+        """Return copies of firewall group dicts with their rule lists"""
+        return self._add_rule_lists_to_firewall_groups(
+            context, copy.deepcopy(firewall_groups))
+
+    def _add_rule_lists_to_firewall_groups(self, context, firewall_groups):
+        """Add their ordered rule lists to firewall group dicts
+
+        The rules of all the policies of the firewall groups are fetched
+        with a single query.
+        """
+        policy_rules = self._get_policies_ordered_rules(
+            context, {fwg[policy] for fwg in firewall_groups
+                      for policy in ('ingress_firewall_policy_id',
+                                     'egress_firewall_policy_id')
+                      if fwg[policy]})
+        for fwg in firewall_groups:
+            fwg['ingress_rule_list'] = list(policy_rules.get(
+                fwg['ingress_firewall_policy_id'], []))
+            fwg['egress_rule_list'] = list(policy_rules.get(
+                fwg['egress_firewall_policy_id'], []))
+        return firewall_groups
+
+    def _make_firewall_groups_dict_with_rules(self, context, fwg_query):
+        """Return the firewall groups of a query with their rule lists
+
+        The ports and the ordered rule lists of all the firewall groups are
+        loaded with a constant number of queries.
+        """
+        fwgs = [self._make_firewall_group_dict(fwg_db) for fwg_db in fwg_query]
+        return self._add_rule_lists_to_firewall_groups(context, fwgs)
+
+    def get_fwgs_with_rules(self, context, project_ids=None):
+        """Return the firewall groups with their rule lists
+
+        The firewall groups visible from the context are returned, limited
+        to the given projects if any, in a constant number of queries.
+        """
+        with db_api.CONTEXT_READER.using(context):
+            query = model_query.query_with_hooks(context, FirewallGroup)
+            if project_ids is not None:
+                query = query.filter(
+                    FirewallGroup.tenant_id.in_(list(project_ids)))
+            return self._make_firewall_groups_dict_with_rules(context, query)
 
     def _check_firewall_rule_conflict(self, fwr_db, fwp_db):
         if not fwr_db['shared']:
@@ -374,24 +504,58 @@ class FirewallPluginDb(object):
 
     def _process_rule_for_policy(self, context, firewall_policy_id,
                                  firewall_rule_id, position, association_db):
-        with db_api.CONTEXT_READER.using(context):
-            fwp_query = context.session.query(
-                FirewallPolicy).with_for_update()
-            fwp_db = fwp_query.filter_by(id=firewall_policy_id).one()
+        # The policy row is not locked: the revision number of the policy is
+        # compared and swapped when it is bumped, as it is the version of its
+        # standard attributes. A concurrent change of the policy makes the
+        # flush below raise StaleDataError, which the callers retry.
+        with db_api.CONTEXT_WRITER.using(context):
+            fwp_db = self._get_firewall_policy(context, firewall_policy_id)
             if position:
                 # Note that although position numbering starts at 1,
                 # internal ordering of the list starts at 0, so we compensate.
+                index = min(position - 1, len(fwp_db.rule_associations))
                 fwp_db.rule_associations.insert(
-                    position - 1,
+                    index,
                     FirewallPolicyRuleAssociation(
-                        firewall_rule_id=firewall_rule_id))
+                        firewall_rule_id=firewall_rule_id,
+                        position=self._get_rule_position(
+                            fwp_db.rule_associations, index)))
             else:
                 fwp_db.rule_associations.remove(association_db)
                 context.session.delete(association_db)
-            fwp_db.rule_associations.reorder()
             fwp_db.audited = False
+            fwp_db.bump_revision()
+            context.session.flush()
+        self.policy_rules_cache.invalidate([firewall_policy_id])
         return self._make_firewall_policy_dict(fwp_db)
 
+    @staticmethod
+    def _renumber_rule_associations(rule_associations):
+        for index, rule_association in enumerate(rule_associations, 1):
+            rule_association.position = index * RULE_POSITION_GAP
+
+    def _get_rule_position(self, rule_associations, index):
+        """Return the position of a rule inserted at the given list index
+
+        The position is taken in the middle of the gap between the
+        positions of its neighbours, the rule associations of the policy are
+        only renumbered when there is no gap left. A rule inserted first or
+        last is given a full gap from its neighbour, the positions going
+        below zero, so that repeated inserts at the top never renumber.
+        """
+        if not rule_associations:
+            return RULE_POSITION_GAP
+        if index == 0:
+            return rule_associations[0].position - RULE_POSITION_GAP
+        previous = rule_associations[index - 1].position
+        if index == len(rule_associations):
+            return previous + RULE_POSITION_GAP
+        following = rule_associations[index].position
+        if following - previous < 2:
+            self._renumber_rule_associations(rule_associations)
+            return self._get_rule_position(rule_associations, index)
+        return (previous + following) // 2
+
     def _get_policy_rule_association_query(self, context, firewall_policy_id,
                                            firewall_rule_id):
         fwpra_query = context.session.query(FirewallPolicyRuleAssociation)
@@ -494,7 +658,7 @@ class FirewallPluginDb(object):
             'eg_ipv6': self.create_firewall_rule(context, eg_fwr_v6)['id'],
         }
 
-    def create_firewall_rule(self, context, firewall_rule):
+    def _add_firewall_rule(self, context, firewall_rule):
         fwr = firewall_rule
         self._validate_fwr_protocol_parameters(fwr)
         self._validate_fwr_src_dst_ip_version(fwr)
@@ -503,26 +667,43 @@ class FirewallPluginDb(object):
             fwr['source_port'])
         dst_port_min, dst_port_max = self._get_min_max_ports_from_range(
             fwr['destination_port'])
+        fwr_db = FirewallRuleV2(
+            id=uuidutils.generate_uuid(),
+            tenant_id=fwr['tenant_id'],
+            name=fwr['name'],
+            description=fwr['description'],
+            protocol=fwr['protocol'],
+            ip_version=fwr['ip_version'],
+            source_ip_address=fwr['source_ip_address'],
+            destination_ip_address=fwr['destination_ip_address'],
+            source_port_range_min=src_port_min,
+            source_port_range_max=src_port_max,
+            destination_port_range_min=dst_port_min,
+            destination_port_range_max=dst_port_max,
+            action=fwr['action'],
+            enabled=fwr['enabled'],
+            shared=fwr['shared'])
+        context.session.add(fwr_db)
+        return fwr_db
+
+    def create_firewall_rule(self, context, firewall_rule):
         with db_api.CONTEXT_WRITER.using(context):
-            fwr_db = FirewallRuleV2(
-                id=uuidutils.generate_uuid(),
-                tenant_id=fwr['tenant_id'],
-                name=fwr['name'],
-                description=fwr['description'],
-                protocol=fwr['protocol'],
-                ip_version=fwr['ip_version'],
-                source_ip_address=fwr['source_ip_address'],
-                destination_ip_address=fwr['destination_ip_address'],
-                source_port_range_min=src_port_min,
-                source_port_range_max=src_port_max,
-                destination_port_range_min=dst_port_min,
-                destination_port_range_max=dst_port_max,
-                action=fwr['action'],
-                enabled=fwr['enabled'],
-                shared=fwr['shared'])
-            context.session.add(fwr_db)
+            fwr_db = self._add_firewall_rule(context, firewall_rule)
         return self._make_firewall_rule_dict(fwr_db)
 
+    def create_firewall_rules(self, context, firewall_rules):
+        """Create several firewall rules in a single transaction
+
+        The rules are all validated and added to the session before being
+        inserted with a single flush.
+        """
+        with db_api.CONTEXT_WRITER.using(context):
+            fwr_dbs = [self._add_firewall_rule(context, firewall_rule)
+                       for firewall_rule in firewall_rules]
+            context.session.flush()
+            return [self._make_firewall_rule_dict(fwr_db)
+                    for fwr_db in fwr_dbs]
+
     def update_firewall_rule(self, context, id, firewall_rule):
         fwr = firewall_rule
         fwr_db = self._get_firewall_rule(context, id)
@@ -548,8 +729,14 @@ class FirewallPluginDb(object):
             # if the rule on a policy, fix audited flag
             fwp_ids = self.get_policies_with_rule(context, id)
             for fwp_id in fwp_ids:
-                fwp_db = self._get_firewall_policy(context, fwp_id)
+                fwp_db = self._get_firewall_policy(
+                    context, fwp_id,
+                    lazy_fields=[FirewallPolicy.rule_associations])
                 fwp_db['audited'] = False
+                # the compiled rule lists of the policies are outdated, let
+                # the other API workers know it through the revision number
+                fwp_db.bump_revision()
+        self.policy_rules_cache.invalidate(fwp_ids)
         return self._make_firewall_rule_dict(fwr_db)
 
     def delete_firewall_rule(self, context, id):
@@ -584,10 +771,9 @@ class FirewallPluginDb(object):
                 # rule is inserted after reference_firewall_rule_id.
                 fwpra_db = self._get_policy_rule_association(
                     context, id, ref_firewall_rule_id)
-                if insert_before:
-                    position = fwpra_db.position
-                else:
-                    position = fwpra_db.position + 1
+                position = fwp_db.rule_associations.index(fwpra_db) + 1
+                if not insert_before:
+                    position += 1
             else:
                 # If reference_firewall_rule_id is not set, it is assumed
                 # that the new rule needs to be inserted at the top.
@@ -617,6 +803,10 @@ class FirewallPluginDb(object):
             context, FirewallRuleV2, self._make_firewall_rule_dict,
             filters=filters, fields=fields)
 
+    def get_firewall_rules_count(self, context, filters=None):
+        return model_query.get_collection_count(
+            context, FirewallRuleV2, filters=filters)
+
     def _get_rules_in_policy(self, context, fwpid):
         """Gets rules in a firewall policy"""
         with db_api.CONTEXT_READER.using(context):
@@ -642,21 +832,23 @@ class FirewallPluginDb(object):
         rule_id_list = fwp['firewall_rules']
         if not rule_id_list:
             return
-        position = 0
         with db_api.CONTEXT_WRITER.using(context):
-            for rule_id in rule_id_list:
+            for index, rule_id in enumerate(rule_id_list, 1):
                 fw_pol_rul_db = FirewallPolicyRuleAssociation(
                     firewall_policy_id=fwp_db['id'],
                     firewall_rule_id=rule_id,
-                    position=position)
+                    position=index * RULE_POSITION_GAP)
                 context.session.add(fw_pol_rul_db)
-                position += 1
 
     def _check_rules_for_policy_is_valid(self, context, fwp, fwp_db,
                                          rule_id_list, filters):
         rules_in_fwr_db = model_query.get_collection_query(
             context, FirewallRuleV2, filters=filters)
         rules_dict = dict((fwr_db['id'], fwr_db) for fwr_db in rules_in_fwr_db)
+        self._check_policy_rules(fwp, fwp_db, rule_id_list, rules_dict)
+
+    @staticmethod
+    def _check_policy_rules(fwp, fwp_db, rule_id_list, rules_dict):
         for fwrule_id in rule_id_list:
             if fwrule_id not in rules_dict:
                 # Bail as soon as we find an invalid rule.
@@ -704,13 +896,33 @@ class FirewallPluginDb(object):
             eg_fwg_ids = [entry.id for entry in fwg_eg_pol_qry]
         return ing_fwg_ids, eg_fwg_ids
 
+    def get_fwgs_with_rules_for_policies(self, context, fwp_ids):
+        """Return the firewall groups with ports using any of the policies
+
+        The firewall groups are returned with their ordered rule lists. A
+        constant number of queries is run whatever the number of firewall
+        groups.
+        """
+        if not fwp_ids:
+            return []
+        with db_api.CONTEXT_READER.using(context):
+            query = (context.session.query(FirewallGroup)
+                     .filter(or_(
+                         FirewallGroup.ingress_firewall_policy_id.in_(
+                             fwp_ids),
+                         FirewallGroup.egress_firewall_policy_id.in_(
+                             fwp_ids)))
+                     .filter(FirewallGroup.port_associations.any()))
+            return self._make_firewall_groups_dict_with_rules(context, query)
+
     def _check_fwgs_associated_with_policy_in_same_project(self, context,
                                                            fwp_id,
                                                            fwp_tenant_id):
         with db_api.CONTEXT_READER.using(context):
             fwg_with_fwp_id_db = context.session.query(FirewallGroup).filter(
                 or_(FirewallGroup.ingress_firewall_policy_id == fwp_id,
-                FirewallGroup.egress_firewall_policy_id == fwp_id))
+                FirewallGroup.egress_firewall_policy_id == fwp_id)).options(
+                orm.lazyload(FirewallGroup.port_associations))
         for entry in fwg_with_fwp_id_db:
             if entry.tenant_id != fwp_tenant_id:
                 raise f_exc.FirewallPolicyInUse(
@@ -759,7 +971,6 @@ class FirewallPluginDb(object):
             fwp_db.rule_associations = []
             for fwrule_id in rule_id_list:
                 fwp_db.rule_associations.append(rules_dict[fwrule_id])
-            fwp_db.rule_associations.reorder()
 
     def _create_default_firewall_policy(self, context, tenant_id, policy_type,
                                         **kwargs):
@@ -795,6 +1006,48 @@ class FirewallPluginDb(object):
         self._ensure_not_default_resource(firewall_policy, 'firewall_policy')
         return self._do_create_firewall_policy(context, firewall_policy)
 
+    def create_firewall_policies(self, context, firewall_policies):
+        """Create several firewall policies in a single transaction
+
+        The rules of all the policies are fetched with a single query, the
+        policies and their rule associations being inserted with a single
+        flush.
+        """
+        for firewall_policy in firewall_policies:
+            self._ensure_not_default_resource(firewall_policy,
+                                              'firewall_policy')
+        rule_ids = {rule_id for fwp in firewall_policies
+                    for rule_id in fwp['firewall_rules'] or []}
+        with db_api.CONTEXT_WRITER.using(context):
+            rules_dict = {}
+            if rule_ids:
+                rules_dict = {fwr_db['id']: fwr_db
+                              for fwr_db in model_query.get_collection_query(
+                                  context, FirewallRuleV2,
+                                  filters={'id': list(rule_ids)})}
+            fwp_dbs = []
+            for fwp in firewall_policies:
+                rule_id_list = fwp['firewall_rules'] or []
+                fwp_db = FirewallPolicy(
+                    id=uuidutils.generate_uuid(),
+                    tenant_id=fwp['tenant_id'],
+                    name=fwp['name'],
+                    description=fwp['description'],
+                    audited=fwp['audited'],
+                    shared=fwp['shared'],
+                    rule_associations=[
+                        FirewallPolicyRuleAssociation(
+                            firewall_rule_id=rule_id,
+                            position=index * RULE_POSITION_GAP)
+                        for index, rule_id in enumerate(rule_id_list, 1)])
+                self._check_policy_rules(fwp, fwp_db, rule_id_list,
+                                         rules_dict)
+                context.session.add(fwp_db)
+                fwp_dbs.append(fwp_db)
+            context.session.flush()
+            return [self._make_firewall_policy_dict(fwp_db)
+                    for fwp_db in fwp_dbs]
+
     def update_firewall_policy(self, context, id, firewall_policy):
         fwp = firewall_policy
         with db_api.CONTEXT_WRITER.using(context):
@@ -812,16 +1065,19 @@ class FirewallPluginDb(object):
             if 'firewall_rules' in fwp:
                 self._set_rules_for_policy(context, fwp_db, fwp)
                 del fwp['firewall_rules']
+                fwp_db.bump_revision()
             if 'audited' not in fwp:
                 fwp['audited'] = False
             fwp_db.update(fwp)
+        self.policy_rules_cache.invalidate([id])
         return self._make_firewall_policy_dict(fwp_db)
 
     def delete_firewall_policy(self, context, id):
         with db_api.CONTEXT_WRITER.using(context):
             fwp_db = self._get_firewall_policy(context, id)
             # check if policy in use
-            qry = context.session.query(FirewallGroup)
+            qry = context.session.query(FirewallGroup).options(
+                orm.lazyload(FirewallGroup.port_associations))
             if qry.filter_by(ingress_firewall_policy_id=id).first():
                 raise f_exc.FirewallPolicyInUse(firewall_policy_id=id)
             elif qry.filter_by(egress_firewall_policy_id=id).first():
@@ -839,6 +1095,15 @@ class FirewallPluginDb(object):
             context, FirewallPolicy, self._make_firewall_policy_dict,
             filters=filters, fields=fields)
 
+    def get_firewall_policies_count(self, context, filters=None):
+        return model_query.get_collection_count(
+            context, FirewallPolicy, filters=filters)
+
+    def get_firewall_policy_ids(self, context, filters=None):
+        """Return the IDs of the firewall policies matching the filters"""
+        return model_query.get_values(
+            context, FirewallPolicy, 'id', filters=filters)
+
     def _set_ports_for_firewall_group(self, context, fwg_db, fwg):
         port_id_list = fwg['ports']
         if not port_id_list:
@@ -866,6 +1131,65 @@ class FirewallPluginDb(object):
             fw_ports = [entry.port_id for entry in fw_group_port_rows]
         return fw_ports
 
+    def get_firewall_group_ports_in_use(self, context, port_ids, project_id,
+                                        exclude_id=None):
+        """Return the given ports bound to a firewall group of a project
+
+        The ports bound to the firewall group exclude_id are left out. A
+        single query is run whatever the number of ports.
+        """
+        fwg_id = FirewallGroupPortAssociation.firewall_group_id
+        with db_api.CONTEXT_READER.using(context):
+            query = (context.session.query(
+                         FirewallGroupPortAssociation.port_id)
+                     .join(FirewallGroup, FirewallGroup.id == fwg_id)
+                     .filter(FirewallGroup.tenant_id == project_id)
+                     .filter(FirewallGroupPortAssociation.port_id.in_(
+                         list(port_ids))))
+            if exclude_id is not None:
+                query = query.filter(fwg_id != exclude_id)
+            return {port_id for port_id, in query}
+
+    def get_pending_firewall_groups(self, context, project_id,
+                                    policy_ids=None, rule_id=None,
+                                    queued_policy_ids=None):
+        """Return the pending firewall groups of a project using policies
+
+        The firewall groups in a pending state using any of the given
+        policies, or any policy of the project with the given rule, are
+        returned as a dictionary of statuses keyed by firewall group ID. A
+        single query is run whatever the number of firewall groups. The
+        firewall groups in PENDING_UPDATE using any of queued_policy_ids are
+        left out.
+        """
+        with db_api.CONTEXT_READER.using(context):
+            if rule_id is not None:
+                fwp_id = FirewallPolicyRuleAssociation.firewall_policy_id
+                policy_ids = (
+                    sa.select(fwp_id)
+                    .join(FirewallPolicy, FirewallPolicy.id == fwp_id)
+                    .where(FirewallPolicyRuleAssociation.firewall_rule_id ==
+                           rule_id)
+                    .where(FirewallPolicy.tenant_id == project_id))
+            else:
+                policy_ids = list(policy_ids)
+            query = (context.session.query(
+                        FirewallGroup.id, FirewallGroup.status,
+                        FirewallGroup.ingress_firewall_policy_id,
+                        FirewallGroup.egress_firewall_policy_id)
+                     .filter(FirewallGroup.tenant_id == project_id)
+                     .filter(FirewallGroup.status.in_(const.PENDING_STATES))
+                     .filter(or_(
+                         FirewallGroup.ingress_firewall_policy_id.in_(
+                             policy_ids),
+                         FirewallGroup.egress_firewall_policy_id.in_(
+                             policy_ids))))
+            queued_policy_ids = set(queued_policy_ids or [])
+            return {fwg_id: status
+                    for fwg_id, status, ingress_id, egress_id in query
+                    if not (status == nl_constants.PENDING_UPDATE and
+                            {ingress_id, egress_id} & queued_policy_ids)}
+
     def _delete_ports_in_firewall_group(self, context, firewall_group_id):
         """Delete the Ports associated with the  firewall group."""
         with db_api.CONTEXT_WRITER.using(context):
@@ -878,7 +1202,8 @@ class FirewallPluginDb(object):
     def _get_default_fwg_id(self, context, tenant_id):
         """Returns an id of default firewall group for given tenant or None"""
         default_fwg = model_query.query_with_hooks(
-            context.elevated(), FirewallGroup).filter_by(
+            context.elevated(), FirewallGroup,
+            lazy_fields=[FirewallGroup.port_associations]).filter_by(
             project_id=tenant_id, name=const.DEFAULT_FWG).first()
         if default_fwg:
             return default_fwg.id
@@ -893,6 +1218,31 @@ class FirewallPluginDb(object):
             return fwg_port.firewall_group_id
         return None
 
+    def get_firewall_groups_with_rules_on_ports(self, context, port_ids):
+        """Return the firewall groups bound to any of the given ports
+
+        A list of (firewall group with rules, bound port IDs) tuples is
+        returned, the port IDs being limited to the given ones.
+        """
+        if not port_ids:
+            return []
+        fwgs = {}
+        fwg_id = FirewallGroupPortAssociation.firewall_group_id
+        with db_api.CONTEXT_READER.using(context):
+            fwg_qry = model_query.query_with_hooks(
+                context, FirewallGroup).join(
+                FirewallGroupPortAssociation, FirewallGroup.id == fwg_id).\
+                filter(FirewallGroupPortAssociation.port_id.in_(port_ids)).\
+                add_columns(FirewallGroupPortAssociation.port_id)
+            for fwg_db, port_id in fwg_qry:
+                if fwg_db.id not in fwgs:
+                    fwgs[fwg_db.id] = (self._make_firewall_group_dict(fwg_db),
+                                       [])
+                fwgs[fwg_db.id][1].append(port_id)
+            self._add_rule_lists_to_firewall_groups(
+                context, [fwg for fwg, fwg_ports in fwgs.values()])
+        return list(fwgs.values())
+
     def get_fwg_ports_in_tenant(self, context, tenant_id):
         """Return a list of ports under a given tenant"""
         try:
@@ -984,24 +1334,56 @@ class FirewallPluginDb(object):
             self._ensure_default_firewall_group(context, tenant_id)
 
         with db_api.CONTEXT_WRITER.using(context):
-            fwg_db = FirewallGroup(
-                id=uuidutils.generate_uuid(),
-                tenant_id=tenant_id,
-                name=fwg['name'],
-                description=fwg['description'],
-                status=fwg['status'],
-                ingress_firewall_policy_id=fwg['ingress_firewall_policy_id'],
-                egress_firewall_policy_id=fwg['egress_firewall_policy_id'],
-                admin_state_up=fwg['admin_state_up'],
-                shared=fwg['shared'])
-            context.session.add(fwg_db)
-            self._set_ports_for_firewall_group(context, fwg_db, fwg)
+            fwg_db = self._add_firewall_group(context, fwg)
         return self._make_firewall_group_dict(fwg_db)
 
+    @staticmethod
+    def _add_firewall_group(context, fwg):
+        """Add a firewall group and its port associations to the session"""
+        fwg_db = FirewallGroup(
+            id=uuidutils.generate_uuid(),
+            tenant_id=fwg['tenant_id'],
+            name=fwg['name'],
+            description=fwg['description'],
+            status=fwg['status'],
+            ingress_firewall_policy_id=fwg['ingress_firewall_policy_id'],
+            egress_firewall_policy_id=fwg['egress_firewall_policy_id'],
+            admin_state_up=fwg['admin_state_up'],
+            shared=fwg['shared'],
+            port_associations=[
+                FirewallGroupPortAssociation(port_id=port_id)
+                for port_id in fwg['ports'] or []])
+        context.session.add(fwg_db)
+        return fwg_db
+
     def create_firewall_group(self, context, firewall_group):
         self._ensure_not_default_resource(firewall_group, 'firewall_group')
         return self._create_firewall_group(context, firewall_group)
 
+    def create_firewall_groups(self, context, firewall_groups):
+        """Create several firewall groups in a single transaction
+
+        The default firewall group of each project is ensured once, the
+        firewall groups and their port associations being inserted with a
+        single flush.
+        """
+        for firewall_group in firewall_groups:
+            self._ensure_not_default_resource(firewall_group,
+                                              'firewall_group')
+            if firewall_group.get('status') is None:
+                firewall_group['status'] = nl_constants.CREATED
+        for tenant_id in sorted({fwg['tenant_id'] for fwg in firewall_groups}):
+            self._ensure_default_firewall_group(context, tenant_id)
+        with db_api.CONTEXT_WRITER.using(context):
+            fwg_dbs = [self._add_firewall_group(context, firewall_group)
+                       for firewall_group in firewall_groups]
+            try:
+                context.session.flush()
+            except db_exc.DBDuplicateEntry as e:
+                raise f_exc.FirewallGroupPortInUse(port_ids=[e.value])
+            return [self._make_firewall_group_dict(fwg_db)
+                    for fwg_db in fwg_dbs]
+
     def update_firewall_group(self, context, id, firewall_group):
         fwg = firewall_group
         # make sure that no group can be updated to have name=default
@@ -1031,16 +1413,63 @@ class FirewallPluginDb(object):
                     db_utils.filter_non_model_columns(fwg, FirewallGroup))
         return self.get_firewall_group(context, id)
 
+    def add_firewall_group_port(self, context, id, port_id):
+        """Associate a single port to a firewall group
+
+        Only the association of the port is inserted.
+        """
+        with db_api.CONTEXT_WRITER.using(context):
+            self._get_firewall_group(
+                context, id, lazy_fields=[FirewallGroup.port_associations])
+            context.session.add(FirewallGroupPortAssociation(
+                firewall_group_id=id, port_id=port_id))
+            try:
+                context.session.flush()
+            except db_exc.DBDuplicateEntry:
+                raise f_exc.FirewallGroupPortInUse(port_ids=[port_id])
+
     def update_firewall_group_status(self, context, id, status, not_in=None):
         """Conditionally update firewall_group status.
         Status transition is performed only if firewall is not in the specified
         states as defined by 'not_in' list.
         """
+        return self.update_firewall_groups_status(context, [id], status,
+                                                  not_in=not_in)
+
+    def update_firewall_groups_status(self, context, ids, status,
+                                      not_in=None):
+        """Conditionally update the status of several firewall groups.
+        The status transitions are performed in a single UPDATE, only for
+        the firewall groups not in the states defined by 'not_in' list.
+        """
+        if not ids:
+            return 0
+        # filter in_ wants iterable objects, None isn't.
+        not_in = not_in or []
+        with db_api.CONTEXT_WRITER.using(context):
+            return (context.session.query(FirewallGroup).
+                    filter(FirewallGroup.id.in_(ids)).
+                    filter(~FirewallGroup.status.in_(not_in)).
+                    update({'status': status}, synchronize_session=False))
+
+    def update_firewall_groups_status_for_policies(self, context, fwp_ids,
+                                                   status, not_in=None):
+        """Update the status of the firewall groups using any of the policies
+
+        Only the firewall groups with ports, not in the states defined by
+        'not_in' list, are updated, in a single UPDATE.
+        """
+        if not fwp_ids:
+            return 0
         # filter in_ wants iterable objects, None isn't.
         not_in = not_in or []
         with db_api.CONTEXT_WRITER.using(context):
             return (context.session.query(FirewallGroup).
-                    filter(FirewallGroup.id == id).
+                    filter(or_(
+                        FirewallGroup.ingress_firewall_policy_id.in_(fwp_ids),
+                        FirewallGroup.egress_firewall_policy_id.in_(
+                            fwp_ids))).
+                    filter(FirewallGroup.port_associations.any()).
                     filter(~FirewallGroup.status.in_(not_in)).
                     update({'status': status}, synchronize_session=False))
 
@@ -1101,18 +1530,35 @@ class FirewallPluginDb(object):
                 raise FirewallDefaultParameterExists(
                     resource_type='Firewall Policy', name=resource['name'])
 
+    @staticmethod
+    def _firewall_group_lazy_fields(fields):
+        # the ports are only loaded when they are returned
+        if fields and 'ports' not in fields:
+            return [FirewallGroup.port_associations]
+        return None
+
     def get_firewall_group(self, context, id, fields=None):
-        fw = self._get_firewall_group(context, id)
+        fw = self._get_firewall_group(
+            context, id, lazy_fields=self._firewall_group_lazy_fields(fields))
         return self._make_firewall_group_dict(fw, fields)
 
-    def get_firewall_groups(self, context, filters=None, fields=None):
+    def _ensure_default_firewall_group_for_filters(self, context, filters):
         if context.tenant_id:
             tenant_id = filters.get('tenant_id') if filters else None
             tenant_id = tenant_id[0] if tenant_id else context.tenant_id
             self._ensure_default_firewall_group(context, tenant_id)
+
+    def get_firewall_groups(self, context, filters=None, fields=None):
+        self._ensure_default_firewall_group_for_filters(context, filters)
         return model_query.get_collection(
             context, FirewallGroup, self._make_firewall_group_dict,
-            filters=filters, fields=fields)
+            filters=filters, fields=fields,
+            lazy_fields=self._firewall_group_lazy_fields(fields))
+
+    def get_firewall_groups_count(self, context, filters=None):
+        self._ensure_default_firewall_group_for_filters(context, filters)
+        return model_query.get_collection_count(
+            context, FirewallGroup, filters=filters)
 
 
 def _is_default(fwg_db):
@@ -0,0 +1,155 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+import time
+
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_POLICIES = 10000
+# Minimum number of seconds between two logs of the cache statistics
+STATS_INTERVAL = 60
+
+
+class PolicyRulesCache(object):
+    """Process-local cache of the ordered rule lists of firewall policies
+
+    The rule list of a policy is stored serialized, as it is sent to the
+    agents, along with the revision number of the policy it was compiled
+    from. A lookup only hits when the given revision number matches the
+    cached one, which keeps the cache consistent with the changes done by
+    other API workers as long as they bump the policy revision number.
+
+    The latest compiled revision of a policy is kept along with the one it
+    replaced, the base of the rule list patches sent to the agents. The
+    least recently used policies are evicted beyond max_policies entries.
+
+    The cache is shared by the threads of the process, its entries are only
+    accessed under a lock. Its statistics are logged at debug level, at
+    most every STATS_INTERVAL seconds, while it is looked up.
+    """
+
+    def __init__(self, max_policies=DEFAULT_MAX_POLICIES):
+        self.max_policies = max_policies
+        # policy ID -> (revision number, serialized rules, previous entry)
+        self._entries = collections.OrderedDict()
+        self._stale = set()
+        self._memory = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._reported_at = time.monotonic()
+
+    def get(self, policy_id, revision_number):
+        """Return the cached rule list of a policy revision or None"""
+        self._report_stats()
+        with self._lock:
+            entry = self._entries.get(policy_id)
+            if (entry is None or entry[0] != revision_number or
+                    policy_id in self._stale):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(policy_id)
+        return jsonutils.loads(entry[1])
+
+    def get_latest(self, policy_id):
+        """Return the latest (revision number, rules) of a policy or None
+
+        The previously compiled (revision number, rules) of the policy are
+        returned as well, as a third item which may be None.
+        """
+        with self._lock:
+            entry = self._entries.get(policy_id)
+            if entry is None or policy_id in self._stale:
+                return None
+        previous = entry[2]
+        if previous is not None:
+            previous = (previous[0], jsonutils.loads(previous[1]))
+        return entry[0], jsonutils.loads(entry[1]), previous
+
+    def set(self, policy_id, revision_number, rules):
+        """Cache the rule list of a policy revision"""
+        serialized = jsonutils.dumps(rules)
+        with self._lock:
+            entry = self._pop(policy_id)
+            previous = None
+            if entry is not None:
+                previous = (entry[:2] if entry[0] != revision_number
+                            else entry[2])
+            self._add(policy_id, (revision_number, serialized, previous))
+            while len(self._entries) > self.max_policies:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, policy_ids):
+        """Mark the cached rule lists of the given policies as outdated
+
+        They are not returned anymore but are still used as the base of the
+        patch to their next compiled revision.
+        """
+        with self._lock:
+            self._stale.update(policy_id for policy_id in policy_ids
+                               if policy_id in self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.clear()
+            self._memory = 0
+
+    @staticmethod
+    def _entry_memory(entry):
+        memory = len(entry[1])
+        if entry[2] is not None:
+            memory += len(entry[2][1])
+        return memory
+
+    def _add(self, policy_id, entry):
+        self._entries[policy_id] = entry
+        self._memory += self._entry_memory(entry)
+
+    def _pop(self, policy_id):
+        self._stale.discard(policy_id)
+        entry = self._entries.pop(policy_id, None)
+        if entry is not None:
+            self._memory -= self._entry_memory(entry)
+        return entry
+
+    def _report_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._reported_at < STATS_INTERVAL:
+                return
+            self._reported_at = now
+        LOG.debug("Firewall policy rules cache stats: %s", self.get_stats())
+
+    def get_stats(self):
+        """Return the hit rate and the memory used by the cache
+
+        The memory is approximated by the length of the serialized rule
+        lists.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'policies': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': (float(self.hits) / lookups if lookups
+                                 else 0.0),
+                    'memory': self._memory}
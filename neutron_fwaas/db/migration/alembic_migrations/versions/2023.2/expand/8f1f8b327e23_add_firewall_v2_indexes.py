@@ -0,0 +1,45 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add firewall v2 indexes
+
+Revision ID: 8f1f8b327e23
+Revises: 6941ce70131e
+Create Date: 2026-10-19 09:12:41.503118
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8f1f8b327e23'
+down_revision = '6941ce70131e'
+
+INDEXES = {
+    'firewall_groups_v2': [
+        ['ingress_firewall_policy_id'],
+        ['egress_firewall_policy_id'],
+        ['status'],
+        ['project_id', 'name'],
+    ],
+    'firewall_policy_rule_associations_v2': [
+        ['firewall_rule_id'],
+    ],
+}
+
+
+def upgrade():
+    for table, indexes in INDEXES.items():
+        for columns in indexes:
+            op.create_index(op.f('ix_%s_%s' % (table, '_'.join(columns))),
+                            table, columns, unique=False)
@@ -138,7 +138,7 @@ class Firewall_v2(extensions.APIExtensionDescriptor):
         return resource_helper.build_resource_info(
             plural_mappings, firewall_v2.RESOURCE_ATTRIBUTE_MAP,
             fwaas_constants.FIREWALL_V2, action_map=firewall_v2.ACTION_MAP,
-            register_quota=True)
+            register_quota=True, allow_bulk=True)
 
     @classmethod
     def get_plugin_interface(cls):
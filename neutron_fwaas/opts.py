@@ -12,6 +12,7 @@
 
 import neutron.conf.services.provider_configuration
 
+import neutron_fwaas.services.firewall.service_drivers.agents.agents
 import neutron_fwaas.services.firewall.service_drivers.agents.\
     firewall_agent_api
 import neutron_fwaas.extensions.firewall_v2
@@ -33,4 +34,7 @@ def list_opts():
          neutron.conf.services.provider_configuration.serviceprovider_opts),
         ('default_fwg_rules',
          neutron_fwaas.extensions.firewall_v2.default_fwg_rules_opts),
+        ('fwaas',
+         neutron_fwaas.services.firewall.service_drivers.agents.agents.
+            agent_driver_opts),
     ]
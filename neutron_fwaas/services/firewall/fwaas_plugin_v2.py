@@ -13,6 +13,7 @@
 #    under the License.
 
 from neutron.db import servicetype_db as st_db
+from neutron.quota import resource_registry
 from neutron import service
 from neutron.services import provider_configuration as provider_conf
 from neutron.services import service_base
@@ -24,6 +25,7 @@ from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
 from neutron_lib import constants as nl_constants
 from neutron_lib.db import api as db_api
+from neutron_lib import exceptions as n_exc
 from neutron_lib.exceptions import firewall_v2 as f_exc
 from neutron_lib.plugins import constants as plugin_const
 from neutron_lib.plugins import directory
@@ -32,6 +34,7 @@ from oslo_log import log as logging
 
 from neutron_fwaas.common import exceptions
 from neutron_fwaas.common import fwaas_constants
+from neutron_fwaas.db.firewall.v2 import firewall_db_v2
 from neutron_fwaas.extensions.firewall_v2 import Firewallv2PluginBase
 from neutron_fwaas.services.firewall.service_drivers import driver_api
 from neutron_fwaas.services.logapi.agents.drivers.iptables \
@@ -40,6 +43,12 @@ from neutron_fwaas.services.logapi.agents.drivers.iptables \
 LOG = logging.getLogger(__name__)
 
 
+class FirewallRpcWorker(service.RpcWorker):
+    """RPC worker processes dedicated to the firewall agent callbacks"""
+    start_listeners_method = 'start_fwaas_rpc_listeners'
+    desc = 'fwaas rpc worker'
+
+
 @registry.has_registry_receivers
 class FirewallPluginV2(Firewallv2PluginBase):
     """Firewall v2 Neutron service plugin class"""
@@ -47,6 +56,13 @@ class FirewallPluginV2(Firewallv2PluginBase):
     supported_extension_aliases = [firewall_v2.ALIAS]
     path_prefix = firewall_v2.API_PREFIX
 
+    # Bulk creations are done in a single transaction
+    __native_bulk_support = True
+
+    @resource_registry.tracked_resources(
+        firewall_group=firewall_db_v2.FirewallGroup,
+        firewall_policy=firewall_db_v2.FirewallPolicy,
+        firewall_rule=firewall_db_v2.FirewallRuleV2)
     def __init__(self):
         super(FirewallPluginV2, self).__init__()
         """Do the initialization for the firewall service plugin here."""
@@ -71,8 +87,15 @@ class FirewallPluginV2(Firewallv2PluginBase):
         self.driver = drivers[default_provider]
 
         # start rpc listener if driver required
+        self.rpc_workers = 0
         if isinstance(self.driver, driver_api.FirewallDriverRPCMixin):
-            rpc_worker = service.RpcWorker([self], worker_process_count=0)
+            self.rpc_workers = self.driver.get_rpc_workers()
+            if self.rpc_workers:
+                rpc_worker = FirewallRpcWorker(
+                    [self], worker_process_count=self.rpc_workers)
+            else:
+                rpc_worker = service.RpcWorker([self],
+                                               worker_process_count=0)
             self.add_worker(rpc_worker)
 
         log_plugin = directory.get_plugin(plugin_const.LOG_API)
@@ -83,6 +106,12 @@ class FirewallPluginV2(Firewallv2PluginBase):
             log_plugin.driver_manager.register_driver(logging_driver.DRIVER)
 
     def start_rpc_listeners(self):
+        if self.rpc_workers:
+            # the listener runs in the dedicated firewall RPC workers only
+            return []
+        return self.driver.start_rpc_listener()
+
+    def start_fwaas_rpc_listeners(self):
         return self.driver.start_rpc_listener()
 
     @property
@@ -99,51 +128,63 @@ class FirewallPluginV2(Firewallv2PluginBase):
         :return: Firewall group dict
         """
         fwg = self.get_firewall_group(context, fwg_id)
-        if fwg['status'] in [nl_constants.PENDING_CREATE,
-                             nl_constants.PENDING_UPDATE,
-                             nl_constants.PENDING_DELETE]:
+        if fwg['status'] in fwaas_constants.PENDING_STATES:
             raise f_exc.FirewallGroupInPendingState(
                 firewall_id=fwg_id, pending_state=fwg['status'])
         return fwg
 
+    @staticmethod
+    def _ensure_no_pending_firewall_groups(pending_fwgs):
+        if pending_fwgs:
+            fwg_id = min(pending_fwgs)
+            raise f_exc.FirewallGroupInPendingState(
+                firewall_id=fwg_id, pending_state=pending_fwgs[fwg_id])
+
     def _ensure_update_firewall_policy(self, context, fwp_id):
         """Checks if the firewall policy can be updated
 
-        Fetch firewall group associated to the policy and checks if they can be
-        updated.
+        Look up the firewall groups associated to the policy in a pending
+        state, with a single query.
         :param context: neutron context
         :param fwp_id: firewall policy ID to check
         """
         fwp = self.get_firewall_policy(context, fwp_id)
-        ing_fwg_ids, eg_fwg_ids = self._get_fwgs_with_policy(context, fwp)
-        for fwg_id in list(set(ing_fwg_ids + eg_fwg_ids)):
-            self._ensure_update_firewall_group(context, fwg_id)
+        self._ensure_no_pending_firewall_groups(
+            self.driver.get_pending_firewall_groups_for_policies(
+                context, fwp['tenant_id'], [fwp_id]))
 
     def _ensure_update_firewall_rule(self, context, fwr_id):
         """Checks if the firewall rule can be updated
 
-        Fetch firewall policy associated to the rule and checks if they can be
-        updated.
+        Look up the firewall groups associated to the policies using the
+        rule in a pending state, with a single query.
         :param context: neutron context
         :param fwr_id: firewall policy ID to check
         """
         fwr = self.get_firewall_rule(context, fwr_id)
-        fwp_ids = self._get_policies_with_rule(context, fwr)
-        for fwp_id in fwp_ids:
-            self._ensure_update_firewall_policy(context, fwp_id)
+        self._ensure_no_pending_firewall_groups(
+            self.driver.get_pending_firewall_groups_for_rule(
+                context, fwr['tenant_id'], fwr_id))
 
-    def _validate_firewall_policies_for_firewall_group(self, context, fwg):
+    def _validate_firewall_policies_for_firewall_group(self, context, fwg,
+                                                       policies=None):
         """Validate firewall group and policy owner
 
         Check if the firewall policy is not shared, it have the same project
         owner than the friewall group.
         :param context: neutron context
         :param fwg: firewall group to validate
+        :param policies: firewall policies already read by the operation,
+                         keyed by ID, completed with the ones read here
         """
+        policies = {} if policies is None else policies
         for policy_type in ['ingress_firewall_policy_id',
                             'egress_firewall_policy_id']:
             if fwg.get(policy_type):
-                fwp = self.get_firewall_policy(context, fwg[policy_type])
+                if fwg[policy_type] not in policies:
+                    policies[fwg[policy_type]] = self.get_firewall_policy(
+                        context, fwg[policy_type])
+                fwp = policies[fwg[policy_type]]
                 if fwg['tenant_id'] != fwp['tenant_id'] and not fwp['shared']:
                     raise f_exc.FirewallPolicyConflict(
                         firewall_policy_id=fwg[policy_type])
@@ -159,9 +200,16 @@ class FirewallPluginV2(Firewallv2PluginBase):
         :param tenant_id: firewall group project ID
         :param fwg_ports: firewall group associated ports
         """
+        if not fwg_ports:
+            return
         # TODO(sridar): elevated context and do we want to use public ?
+        # All the ports are loaded at once and then checked in memory
+        ports = {port['id']: port for port in self._core_plugin.get_ports(
+            context, filters={'id': list(fwg_ports)})}
         for port_id in fwg_ports:
-            port = self._core_plugin.get_port(context, port_id)
+            port = ports.get(port_id)
+            if port is None:
+                raise n_exc.PortNotFound(port_id=port_id)
 
             if port['tenant_id'] != tenant_id:
                 raise f_exc.FirewallGroupPortInvalidProject(
@@ -173,17 +221,19 @@ class FirewallPluginV2(Firewallv2PluginBase):
                         driver_name=self.driver_name, port_id=port_id)
             elif device_owner.startswith(
                     nl_constants.DEVICE_OWNER_COMPUTE_PREFIX):
-                if not self._is_supported_l2_port(context, port_id):
+                if not self._is_supported_l2_port(context, port_id,
+                                                  port=port):
                     raise exceptions.FirewallGroupPortNotSupported(
                         driver_name=self.driver_name, port_id=port_id)
             else:
                 raise f_exc.FirewallGroupPortInvalid(port_id=port_id)
 
-    def _is_supported_l2_port(self, context, port_id):
+    def _is_supported_l2_port(self, context, port_id, port=None):
         """Whether this l2 port is supported"""
 
-        # Re-fetch to get up-to-date data from db
-        port = self._core_plugin.get_port(context, id=port_id)
+        if port is None:
+            # Re-fetch to get up-to-date data from db
+            port = self._core_plugin.get_port(context, id=port_id)
 
         # Skip port binding is unbound or failed
         if port[pb_def.VIF_TYPE] in [pb_def.VIF_TYPE_UNBOUND,
@@ -204,53 +254,12 @@ class FirewallPluginV2(Firewallv2PluginBase):
         if 'ports' not in firewall_group or not firewall_group['ports']:
             return
 
-        filters = {
-            'tenant_id': [firewall_group['tenant_id']],
-            'ports': firewall_group['ports'],
-        }
-        ports_in_use = set()
-        for fwg in self.get_firewall_groups(context, filters=filters):
-            if id is not None and fwg['id'] == id:
-                continue
-            ports_in_use |= set(fwg.get('ports', [])) & \
-                set(firewall_group['ports'])
+        ports_in_use = self.driver.get_firewall_group_ports_in_use(
+            context, firewall_group['ports'], firewall_group['tenant_id'],
+            exclude_id=id)
         if ports_in_use:
             raise f_exc.FirewallGroupPortInUse(port_ids=list(ports_in_use))
 
-    def _get_fwgs_with_policy(self, context, firewall_policy):
-        """List firewall group IDs which use a firewall policy
-
-        List all firewall group IDs which have the given firewall policy as
-        ingress or egress.
-        :param context: neutron context
-        :param firewall_policy: firewall policy to filter
-        """
-        filters = {
-            'tenant_id': [firewall_policy['tenant_id']],
-            'ingress_firewall_policy_id': [firewall_policy['id']],
-        }
-        ingress_fwp_ids = [fwg['id']
-                           for fwg in self.get_firewall_groups(
-                               context, filters=filters)]
-
-        filters = {
-            'tenant_id': [firewall_policy['tenant_id']],
-            'egress_firewall_policy_id': [firewall_policy['id']],
-        }
-        egress_fwp_ids = [fwg['id']
-                          for fwg in self.get_firewall_groups(
-                              context, filters=filters)]
-
-        return ingress_fwp_ids, egress_fwp_ids
-
-    def _get_policies_with_rule(self, context, firewall_rule):
-        filters = {
-            'tenant_id': [firewall_rule['tenant_id']],
-            'firewall_rules': [firewall_rule['id']],
-        }
-        return [fwp['id'] for fwp in self.get_firewall_policies(
-                    context, filters=filters)]
-
     def _validate_insert_remove_rule_request(self, rule_info):
         """Validate rule_info dict
 
@@ -292,7 +301,7 @@ class FirewallPluginV2(Firewallv2PluginBase):
                 'tenant_id': [project_id],
                 'name': [fwaas_constants.DEFAULT_FWG],
             },
-            fields=['id', 'ports'],
+            fields=['id'],
         )
         if len(fwgs) != 1:
             # Cannot found default Firewall Group, abandon
@@ -302,10 +311,8 @@ class FirewallPluginV2(Firewallv2PluginBase):
         default_fwg = fwgs[0]
 
         # Add default firewall group to the port
-        port_ids = default_fwg.get('ports', []) + [port_id]
         try:
-            self.update_firewall_group(context, default_fwg['id'],
-                                       {'firewall_group': {'ports': port_ids}})
+            self.add_firewall_group_port(context, default_fwg['id'], port_id)
         except f_exc.FirewallGroupPortInUse:
             LOG.warning("Port %s has been already associated with default "
                         "firewall group %s and skip association", port_id,
@@ -329,6 +336,28 @@ class FirewallPluginV2(Firewallv2PluginBase):
 
         return self.driver.create_firewall_group(context, firewall_group)
 
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_WRITER
+    def create_firewall_group_bulk(self, context, firewall_groups):
+        firewall_groups = [item['firewall_group']
+                           for item in firewall_groups['firewall_groups']]
+        port_ids = set()
+        # the policies shared by the firewall groups are read once
+        policies = {}
+        for firewall_group in firewall_groups:
+            ports = firewall_group.get('ports', [])
+            if port_ids & set(ports):
+                raise f_exc.FirewallGroupPortInUse(
+                    port_ids=sorted(port_ids & set(ports)))
+            port_ids |= set(ports)
+            self._validate_firewall_policies_for_firewall_group(
+                context, firewall_group, policies=policies)
+            self._validate_ports_for_firewall_group(
+                context, firewall_group['tenant_id'], ports)
+            self._validate_if_firewall_group_on_ports(context, firewall_group)
+
+        return self.driver.create_firewall_groups(context, firewall_groups)
+
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
     def delete_firewall_group(self, context, id):
@@ -355,9 +384,9 @@ class FirewallPluginV2(Firewallv2PluginBase):
         return self.driver.get_firewall_groups(context, filters, fields)
 
     @log_helpers.log_method_call
+    @db_api.CONTEXT_WRITER
     def get_firewall_groups_count(self, context, filters=None):
-        filters = filters or {}
-        return len(self.get_firewall_groups(context=context, filters=filters))
+        return self.driver.get_firewall_groups_count(context, filters)
 
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
@@ -379,6 +408,23 @@ class FirewallPluginV2(Firewallv2PluginBase):
 
         return self.driver.update_firewall_group(context, id, firewall_group)
 
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_WRITER
+    def add_firewall_group_port(self, context, id, port_id):
+        """Associate a single port to a firewall group
+
+        Unlike a port list update, only the added port is validated and
+        associated, and only its addition is notified to the driver.
+        """
+        firewall_group = self._ensure_update_firewall_group(context, id)
+        self._validate_ports_for_firewall_group(
+            context, firewall_group['tenant_id'], [port_id])
+        self._validate_if_firewall_group_on_ports(
+            context, {'ports': [port_id],
+                      'tenant_id': firewall_group['tenant_id']},
+            id=id)
+        return self.driver.add_firewall_group_port(context, id, port_id)
+
     # Firewall Policy
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
@@ -386,6 +432,15 @@ class FirewallPluginV2(Firewallv2PluginBase):
         firewall_policy = firewall_policy['firewall_policy']
         return self.driver.create_firewall_policy(context, firewall_policy)
 
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_WRITER
+    def create_firewall_policy_bulk(self, context, firewall_policies):
+        firewall_policies = [
+            item['firewall_policy']
+            for item in firewall_policies['firewall_policies']]
+        return self.driver.create_firewall_policies(context,
+                                                    firewall_policies)
+
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
     def delete_firewall_policy(self, context, id):
@@ -401,6 +456,11 @@ class FirewallPluginV2(Firewallv2PluginBase):
     def get_firewall_policies(self, context, filters=None, fields=None):
         return self.driver.get_firewall_policies(context, filters, fields)
 
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_READER
+    def get_firewall_policies_count(self, context, filters=None):
+        return self.driver.get_firewall_policies_count(context, filters)
+
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
     def update_firewall_policy(self, context, id, firewall_policy):
@@ -415,6 +475,13 @@ class FirewallPluginV2(Firewallv2PluginBase):
         firewall_rule = firewall_rule['firewall_rule']
         return self.driver.create_firewall_rule(context, firewall_rule)
 
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_WRITER
+    def create_firewall_rule_bulk(self, context, firewall_rules):
+        firewall_rules = [item['firewall_rule']
+                          for item in firewall_rules['firewall_rules']]
+        return self.driver.create_firewall_rules(context, firewall_rules)
+
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
     def delete_firewall_rule(self, context, id):
@@ -430,6 +497,11 @@ class FirewallPluginV2(Firewallv2PluginBase):
     def get_firewall_rules(self, context, filters=None, fields=None):
         return self.driver.get_firewall_rules(context, filters, fields)
 
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_READER
+    def get_firewall_rules_count(self, context, filters=None):
+        return self.driver.get_firewall_rules_count(context, filters)
+
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
     def update_firewall_rule(self, context, id, firewall_rule):
@@ -438,6 +510,7 @@ class FirewallPluginV2(Firewallv2PluginBase):
         return self.driver.update_firewall_rule(context, id, firewall_rule)
 
     @log_helpers.log_method_call
+    @db_api.retry_if_session_inactive()
     @db_api.CONTEXT_WRITER
     def insert_rule(self, context, policy_id, rule_info):
         self._ensure_update_firewall_policy(context, policy_id)
@@ -445,6 +518,7 @@ class FirewallPluginV2(Firewallv2PluginBase):
         return self.driver.insert_rule(context, policy_id, rule_info)
 
     @log_helpers.log_method_call
+    @db_api.retry_if_session_inactive()
     @db_api.CONTEXT_WRITER
     def remove_rule(self, context, policy_id, rule_info):
         self._ensure_update_firewall_policy(context, policy_id)
@@ -17,22 +17,102 @@ from neutron_lib.api.definitions import portbindings as pb_def
 from neutron_lib import constants as nl_constants
 from neutron_lib import context as neutron_context
 from neutron_lib.db import api as db_api
+from neutron_lib import exceptions as n_exc
 from neutron_lib.exceptions import firewall_v2 as f_exc
+from neutron_lib.plugins import constants as plugin_constants
+from neutron_lib.plugins import directory
 from neutron_lib import rpc as n_rpc
 from oslo_config import cfg
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 import oslo_messaging
 
+from neutron_fwaas._i18n import _
 from neutron_fwaas.common import fwaas_constants as constants
+from neutron_fwaas.common import rule_list_patch
+from neutron_fwaas.common import rule_schema
+from neutron_fwaas.services.firewall.service_drivers.agents import \
+    notification_queue
 from neutron_fwaas.services.firewall.service_drivers import driver_api
 
 
 LOG = logging.getLogger(__name__)
 
+agent_driver_opts = [
+    cfg.BoolOpt(
+        'host_targeted_notifications',
+        default=False,
+        help=_("Cast the firewall group changes only to the agents hosting "
+               "the firewall group ports instead of fanning them out to "
+               "every agent. The L3 agents are resolved from the router L3 "
+               "agent bindings and the L2 agents from the port binding "
+               "host. Enable it once all the agents are upgraded.")),
+    cfg.BoolOpt(
+        'delta_notifications',
+        default=False,
+        help=_("Send the rule lists of the firewall groups updated on a "
+               "policy or rule change as patches from the previous revision "
+               "of their policy. The agents missing that revision fetch the "
+               "full rule lists. Enable it once all the agents support the "
+               "version 1.1 of the firewall agent RPC API.")),
+    cfg.BoolOpt(
+        'slim_rule_notifications',
+        default=False,
+        help=_("Send the rules of the firewall groups to the agents as "
+               "compact lists of the fields read by the agent drivers "
+               "rather than as full rule dictionaries. Enable it once all "
+               "the agents support the version 1.2 of the firewall agent "
+               "RPC API.")),
+    cfg.IntOpt(
+        'rpc_workers',
+        default=0,
+        min=0,
+        help=_("Number of RPC worker processes dedicated to the firewall "
+               "agent callbacks. When set to 0, the callbacks are served by "
+               "the API and RPC workers of the Neutron server, along with "
+               "every other request.")),
+    cfg.BoolOpt(
+        'async_notifications',
+        default=False,
+        help=_("Build and cast the firewall group notifications to the "
+               "agents from a background thread once the API request "
+               "transaction commits, rather than within the API request. "
+               "Pending policy notifications are coalesced.")),
+    cfg.FloatOpt(
+        'policy_notification_delay',
+        default=0,
+        min=0,
+        help=_("Seconds the notifications of policy and rule changes are "
+               "held back with asynchronous notifications. The changes "
+               "done in the meantime are coalesced, every firewall group "
+               "affected being cast once with its final state.")),
+]
+cfg.CONF.register_opts(agent_driver_opts, 'fwaas')
+
+# Version of the firewall agent RPC API handling rule list revisions and
+# patches
+DELTA_RPC_VERSION = '1.1'
+# Version of the firewall agent RPC API handling slim rules
+SLIM_RPC_VERSION = '1.2'
+
+# Port fields the agents use in the firewall group port details
+PORT_DETAILS_FIELDS = ['id', 'device_owner', 'device_id', 'network_id',
+                       'fixed_ips', 'allowed_address_pairs',
+                       'port_security_enabled', 'status', pb_def.HOST_ID]
+
 
 class FirewallAgentCallbacks(object):
-    target = oslo_messaging.Target(version='1.0')
+    """Plugin side of agent to plugin RPC API
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - Added get_firewall_groups_for_projects.
+        1.2 - Added get_firewall_groups_for_router.
+        1.3 - Added get_firewall_groups_for_ports.
+        1.4 - Added get_firewall_policies_rule_lists.
+    """
+
+    target = oslo_messaging.Target(version='1.4')
 
     def __init__(self, firewall_db):
         self.firewall_db = firewall_db
@@ -78,27 +158,68 @@ class FirewallAgentCallbacks(object):
             LOG.info('Firewall group %s already deleted', fwg_id)
             return True
 
+    @staticmethod
+    def _slim_rule_lists(fwg_with_rules):
+        """Strips the rules of a firewall group returned to the agents
+
+        With slim rule notifications, the rules returned by the agent
+        callbacks are stripped to the fields of the slim rules cast to the
+        agents, so that they compare equal to the rules decoded by the
+        agents from the casts.
+        """
+        if cfg.CONF.fwaas.slim_rule_notifications:
+            rule_schema.slim_firewall_group(fwg_with_rules)
+        return fwg_with_rules
+
+    @classmethod
+    def _set_firewall_group_sync_ports(cls, fwg_with_rules, port_ids):
+        """Sets the ports to (un)set of a firewall group sent to agents"""
+        if fwg_with_rules['status'] == nl_constants.PENDING_DELETE:
+            fwg_with_rules['add-port-ids'] = []
+            fwg_with_rules['del-port-ids'] = port_ids
+        else:
+            fwg_with_rules['add-port-ids'] = port_ids
+            fwg_with_rules['del-port-ids'] = []
+        return cls._slim_rule_lists(fwg_with_rules)
+
     @log_helpers.log_method_call
-    @db_api.CONTEXT_WRITER
+    @db_api.CONTEXT_READER
     def get_firewall_groups_for_project(self, context, **kwargs):
         """Gets all firewall_groups and rules on a project."""
-        fwg_list = []
-        for fwg in self.firewall_db.get_firewall_groups(context):
-            fwg_with_rules =\
-                self.firewall_db.make_firewall_group_dict_with_rules(
-                    context, fwg['id'])
-            if fwg['status'] == nl_constants.PENDING_DELETE:
-                fwg_with_rules['add-port-ids'] = []
-                fwg_with_rules['del-port-ids'] = (
-                    self.firewall_db.get_ports_in_firewall_group(
-                        context, fwg['id']))
-            else:
-                fwg_with_rules['add-port-ids'] = (
-                    self.firewall_db.get_ports_in_firewall_group(
-                        context, fwg['id']))
-                fwg_with_rules['del-port-ids'] = []
-            fwg_list.append(fwg_with_rules)
-        return fwg_list
+        return [self._set_firewall_group_sync_ports(fwg, fwg['ports'])
+                for fwg in self.firewall_db.get_fwgs_with_rules(context)]
+
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_READER
+    def get_firewall_groups_for_projects(self, context, project_ids,
+                                         **kwargs):
+        """Gets all firewall_groups and rules of several projects at once.
+
+        Returns a dictionary of firewall group lists keyed by project ID.
+        """
+        ctx = context.elevated()
+        fwgs_by_project = {project_id: [] for project_id in project_ids}
+        if not project_ids:
+            return fwgs_by_project
+        for fwg in self.firewall_db.get_fwgs_with_rules(
+                ctx, project_ids=project_ids):
+            fwgs_by_project.setdefault(fwg['tenant_id'], []).append(
+                self._set_firewall_group_sync_ports(fwg, fwg['ports']))
+        return fwgs_by_project
+
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_READER
+    def get_firewall_groups_for_router(self, context, port_ids, **kwargs):
+        """Gets the firewall_groups and rules bound to router ports.
+
+        Only the firewall groups bound to one of the given router interface
+        ports are returned, their ports to (un)set being limited to them.
+        """
+        return [self._set_firewall_group_sync_ports(fwg_with_rules,
+                                                    fwg_port_ids)
+                for fwg_with_rules, fwg_port_ids in (
+                    self.firewall_db.get_firewall_groups_with_rules_on_ports(
+                        context, port_ids))]
 
     @log_helpers.log_method_call
     @db_api.CONTEXT_WRITER
@@ -109,31 +230,49 @@ class FirewallAgentCallbacks(object):
         fwg_project_list = list(set(fwg['tenant_id'] for fwg in fwg_list))
         return fwg_project_list
 
+    def _get_firewall_groups_for_ports(self, context, port_ids):
+        ctx = context.elevated()
+        fwgs_by_port = {}
+        for fwg_with_rules, fwg_port_ids in (
+                self.firewall_db.get_firewall_groups_with_rules_on_ports(
+                    ctx, port_ids)):
+            self._slim_rule_lists(fwg_with_rules)
+            for port_id in fwg_port_ids:
+                fwgs_by_port[port_id] = fwg_with_rules
+        return fwgs_by_port
+
     @log_helpers.log_method_call
-    @db_api.CONTEXT_WRITER
+    @db_api.CONTEXT_READER
     def get_firewall_group_for_port(self, context, **kwargs):
         """Get firewall_group is associated with a port."""
-        ctx = context.elevated()
-        # Only one Firewall Group can be associated to a port at a time
-        fwg_port_binding = self.firewall_db.get_firewall_groups(
-            ctx, filters={'ports': [kwargs.get('port_id')]})
-        if len(fwg_port_binding) != 1:
-            return
-        fwg = fwg_port_binding[0]
-
-        fwg['ingress_rule_list'] = []
-        for rule_id in self.firewall_db.get_firewall_policy(
-                context, fwg['ingress_firewall_policy_id'],
-                fields=['firewall_rules'])['firewall_rules']:
-            fwg['ingress_rule_list'].append(
-                self.firewall_db.get_firewall_rule(context, rule_id))
-        fwg['egress_rule_list'] = []
-        for rule_id in self.firewall_db.get_firewall_policy(
-                context, fwg['egress_firewall_policy_id'],
-                fields=['firewall_rules'])['firewall_rules']:
-            fwg['egress_rule_list'].append(
-                self.firewall_db.get_firewall_rule(context, rule_id))
-        return fwg
+        port_id = kwargs.get('port_id')
+        return self._get_firewall_groups_for_ports(
+            context, [port_id]).get(port_id)
+
+    @log_helpers.log_method_call
+    @db_api.CONTEXT_READER
+    def get_firewall_groups_for_ports(self, context, port_ids, **kwargs):
+        """Get the firewall_groups associated with several ports at once.
+
+        Returns a dictionary of firewall groups with their rules keyed by
+        port ID, the ports not bound to any firewall group being left out.
+        """
+        return self._get_firewall_groups_for_ports(context, port_ids)
+
+    @log_helpers.log_method_call
+    def get_firewall_policies_rule_lists(self, context, policy_ids,
+                                         **kwargs):
+        """Get the rule lists of several policies with their revision.
+
+        Returns a dictionary of {'revision': ..., 'rules': ...} keyed by
+        policy ID. Agents use it when they cannot patch a rule list.
+        """
+        compiled = self.firewall_db.get_compiled_policies(
+            context.elevated(), policy_ids,
+            slim=cfg.CONF.fwaas.slim_rule_notifications)
+        return {policy_id: {'revision': policy['revision'],
+                            'rules': policy['rules']}
+                for policy_id, policy in compiled.items()}
 
 
 class FirewallAgentApi(object):
@@ -144,20 +283,37 @@ class FirewallAgentApi(object):
         target = oslo_messaging.Target(topic=topic, version='1.0')
         self.client = n_rpc.get_client(target)
 
-    def create_firewall_group(self, context, firewall_group):
-        cctxt = self.client.prepare(fanout=True)
-        cctxt.cast(context, 'create_firewall_group',
-                   firewall_group=firewall_group, host=self.host)
-
-    def update_firewall_group(self, context, firewall_group):
-        cctxt = self.client.prepare(fanout=True)
-        cctxt.cast(context, 'update_firewall_group',
-                   firewall_group=firewall_group, host=self.host)
-
-    def delete_firewall_group(self, context, firewall_group):
-        cctxt = self.client.prepare(fanout=True)
-        cctxt.cast(context, 'delete_firewall_group',
-                   firewall_group=firewall_group, host=self.host)
+    def _prepare_casts(self, agent_hosts, version=None):
+        """Returns the clients to cast a firewall group change with.
+
+        The change is fanned out to every agent unless the hosts of the
+        agents involved are given, as a dictionary of host lists keyed by
+        agent topic.
+        """
+        kwargs = {'version': version} if version else {}
+        if agent_hosts is None:
+            return [self.client.prepare(fanout=True, **kwargs)]
+        return [self.client.prepare(topic=topic, server=host, **kwargs)
+                for topic, hosts in sorted(agent_hosts.items())
+                for host in hosts]
+
+    def create_firewall_group(self, context, firewall_group,
+                              agent_hosts=None, version=None):
+        for cctxt in self._prepare_casts(agent_hosts, version=version):
+            cctxt.cast(context, 'create_firewall_group',
+                       firewall_group=firewall_group, host=self.host)
+
+    def update_firewall_group(self, context, firewall_group,
+                              agent_hosts=None, version=None):
+        for cctxt in self._prepare_casts(agent_hosts, version=version):
+            cctxt.cast(context, 'update_firewall_group',
+                       firewall_group=firewall_group, host=self.host)
+
+    def delete_firewall_group(self, context, firewall_group,
+                              agent_hosts=None):
+        for cctxt in self._prepare_casts(agent_hosts):
+            cctxt.cast(context, 'delete_firewall_group',
+                       firewall_group=firewall_group, host=self.host)
 
 
 class FirewallAgentDriver(driver_api.FirewallDriverDB,
@@ -171,6 +327,9 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
     def __init__(self, service_plugin):
         super(FirewallAgentDriver, self).__init__(service_plugin)
         self.agent_rpc = FirewallAgentApi(constants.FW_AGENT, cfg.CONF.host)
+        self.notification_queue = None
+        if cfg.CONF.fwaas.async_notifications:
+            self.notification_queue = notification_queue.NotificationQueue()
 
     def is_supported_l2_port(self, port):
         if port[pb_def.VIF_TYPE] == pb_def.VIF_TYPE_OVS:
@@ -189,6 +348,9 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
     def is_supported_l3_port(self, port):
         return True
 
+    def get_rpc_workers(self):
+        return cfg.CONF.fwaas.rpc_workers
+
     def start_rpc_listener(self):
         self.endpoints = [FirewallAgentCallbacks(self.firewall_db)]
         self.rpc_connection = n_rpc.Connection()
@@ -196,41 +358,204 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
                                             self.endpoints, fanout=False)
         return self.rpc_connection.consume_in_threads()
 
-    def _rpc_update_firewall_group(self, context, fwg_id):
-        fw_ports = self.firewall_db.get_ports_in_firewall_group(
-            context, fwg_id)
-        if not fw_ports:
+    def _rpc_update_firewall_policies(self, context, firewall_policy_ids):
+        """Propagates a change of policies to the firewall groups using them
+
+        The payloads of all the firewall groups with ports using any of the
+        policies are built in a constant number of queries and their status
+        is set to PENDING_UPDATE in a single UPDATE.
+        """
+        fwgs_with_rules = self.firewall_db.get_fwgs_with_rules_for_policies(
+            context, firewall_policy_ids)
+        if not fwgs_with_rules:
             return
-        status_update = {"status": nl_constants.PENDING_UPDATE}
-        self.update_firewall_group(context, fwg_id, status_update)
-        fwg_with_rules = self.firewall_db.make_firewall_group_dict_with_rules(
-            context, fwg_id)
-        # this is triggered on an update to fwg rule or policy, no
-        # change in associated ports.
-        fwg_with_rules['add-port-ids'] = fw_ports
-        fwg_with_rules['del-port-ids'] = []
-        fwg_with_rules['port_details'] = self._get_fwg_port_details(
-            context, fwg_with_rules['add-port-ids'])
-        self.agent_rpc.update_firewall_group(context, fwg_with_rules)
+        self.firewall_db.update_firewall_groups_status(
+            context, [fwg['id'] for fwg in fwgs_with_rules],
+            nl_constants.PENDING_UPDATE)
+        port_details = self._get_fwg_port_details(
+            context, [port_id for fwg in fwgs_with_rules
+                      for port_id in fwg['ports']])
+        version = self._encode_rule_lists(context, fwgs_with_rules,
+                                          patches=True)
+        for fwg_with_rules in fwgs_with_rules:
+            fwg_with_rules['status'] = nl_constants.PENDING_UPDATE
+            # this is triggered on an update to fwg rule or policy, no
+            # change in associated ports.
+            fwg_with_rules['add-port-ids'] = fwg_with_rules['ports']
+            fwg_with_rules['del-port-ids'] = []
+            fwg_with_rules['port_details'] = {
+                port_id: port_details[port_id]
+                for port_id in fwg_with_rules['ports']}
+            self.agent_rpc.update_firewall_group(
+                context, fwg_with_rules,
+                agent_hosts=self._get_fwg_agent_hosts(
+                    context, fwg_with_rules['port_details']),
+                version=version)
 
     def _rpc_update_firewall_policy(self, context, firewall_policy_id):
-        firewall_policy = self.get_firewall_policy(context, firewall_policy_id)
-        if firewall_policy:
-            ing_fwg_ids, eg_fwg_ids = self.firewall_db.get_fwgs_with_policy(
-                context, firewall_policy_id)
-            for fwg_id in list(set(ing_fwg_ids + eg_fwg_ids)):
-                self._rpc_update_firewall_group(context, fwg_id)
+        self._notify_firewall_policies(context, [firewall_policy_id])
+
+    def _notify(self, context, key, method, *args, on_failure=None):
+        """Calls a method building and casting notifications to the agents
+
+        With asynchronous notifications, the method is queued under key and
+        called from a background thread once the transaction commits. If it
+        keeps failing, on_failure is called with the same arguments.
+        """
+        if self.notification_queue is None:
+            method(context, *args)
+        else:
+            self.notification_queue.put(context, key, method, *args,
+                                        on_failure=on_failure)
+
+    def _fail_firewall_groups(self, context, firewall_groups):
+        # the firewall groups whose notification failed in the background
+        # are not left pending, unless they are being deleted
+        self.firewall_db.update_firewall_groups_status(
+            context, [fwg['id'] for fwg in firewall_groups],
+            nl_constants.ERROR, not_in=[nl_constants.PENDING_DELETE])
+
+    def _fail_firewall_group(self, context, firewall_group, *args):
+        self._fail_firewall_groups(context, [firewall_group])
+
+    def _fail_firewall_policies(self, context, firewall_policy_ids):
+        self.firewall_db.update_firewall_groups_status_for_policies(
+            context, firewall_policy_ids, nl_constants.ERROR,
+            not_in=[nl_constants.PENDING_DELETE])
+
+    def _notify_firewall_policies(self, context, firewall_policy_ids):
+        if self.notification_queue is None or not firewall_policy_ids:
+            self._rpc_update_firewall_policies(context, firewall_policy_ids)
+            return
+        # The firewall groups are set to PENDING_UPDATE within the request,
+        # their notifications are built in the background.
+        self.firewall_db.update_firewall_groups_status_for_policies(
+            context, firewall_policy_ids, nl_constants.PENDING_UPDATE)
+        # The pending policy notifications are merged into a single one
+        # which casts every firewall group using any of the policies once.
+        self.notification_queue.put_items(
+            context, 'policies', self._rpc_update_firewall_policies,
+            firewall_policy_ids,
+            delay=cfg.CONF.fwaas.policy_notification_delay,
+            on_failure=self._fail_firewall_policies)
+
+    def _get_queued_policy_ids(self):
+        if self.notification_queue is None:
+            return set()
+        return self.notification_queue.get_items('policies')
+
+    def get_pending_firewall_groups_for_policies(self, context, project_id,
+                                                 policy_ids):
+        # The firewall groups only pending on a policy notification still
+        # waiting in the queue do not block the changes of their policies,
+        # which are coalesced into that notification.
+        return self.firewall_db.get_pending_firewall_groups(
+            context, project_id, policy_ids=policy_ids,
+            queued_policy_ids=self._get_queued_policy_ids())
+
+    def get_pending_firewall_groups_for_rule(self, context, project_id,
+                                             rule_id):
+        return self.firewall_db.get_pending_firewall_groups(
+            context, project_id, rule_id=rule_id,
+            queued_policy_ids=self._get_queued_policy_ids())
+
+    def _encode_rule_lists(self, context, fwgs_with_rules, patches=False):
+        """Encodes the rule lists of firewall groups for the agents
+
+        With delta notifications, the rule lists are labeled with the
+        revision of their policy and, if patches is set, replaced by a patch
+        from the previous revision of the policy when there is one. With
+        slim rule notifications, the rules are encoded as slim rules.
+        Returns the RPC version to cast the firewall groups with, None when
+        both are disabled.
+        """
+        delta = cfg.CONF.fwaas.delta_notifications
+        slim = cfg.CONF.fwaas.slim_rule_notifications
+        if delta:
+            self._add_rule_list_patches(context, fwgs_with_rules, patches,
+                                        slim)
+        if slim:
+            for fwg_with_rules in fwgs_with_rules:
+                rule_schema.encode_firewall_group(fwg_with_rules)
+            return SLIM_RPC_VERSION
+        return DELTA_RPC_VERSION if delta else None
+
+    def _add_rule_list_patches(self, context, fwgs_with_rules, patches,
+                               slim):
+        compiled = self.firewall_db.get_compiled_policies(
+            context, {fwg['%s_firewall_policy_id' % direction]
+                      for fwg in fwgs_with_rules
+                      for direction in rule_list_patch.DIRECTIONS
+                      if fwg['%s_firewall_policy_id' % direction]},
+            slim=slim)
+        for fwg_with_rules in fwgs_with_rules:
+            for direction in rule_list_patch.DIRECTIONS:
+                policy = compiled.get(
+                    fwg_with_rules['%s_firewall_policy_id' % direction])
+                if policy is None:
+                    continue
+                fwg_with_rules[rule_list_patch.revision_key(direction)] = (
+                    policy['revision'])
+                if patches and policy['patch'] is not None:
+                    del fwg_with_rules[rule_list_patch.rule_list_key(
+                        direction)]
+                    fwg_with_rules[rule_list_patch.patch_key(direction)] = (
+                        policy['patch'])
+                else:
+                    # the rules compiled with that revision
+                    fwg_with_rules[rule_list_patch.rule_list_key(
+                        direction)] = policy['rules']
+
+    def _get_fwg_agent_hosts(self, context, port_details):
+        """Returns the hosts of the agents handling some ports.
+
+        Returns None, meaning every agent, unless host targeted
+        notifications are enabled. Otherwise returns a dictionary of host
+        lists keyed by agent topic: the hosts of the L3 agents the routers
+        of router ports are bound to and the binding hosts of compute ports.
+        """
+        if not cfg.CONF.fwaas.host_targeted_notifications:
+            return None
+        l3_plugin = directory.get_plugin(plugin_constants.L3)
+        get_hosts_to_notify = getattr(l3_plugin, 'get_hosts_to_notify', None)
+        if not get_hosts_to_notify:
+            LOG.debug("No L3 agent scheduler to resolve the agent hosts, "
+                      "falling back to fanout")
+            return None
+        l3_hosts = set()
+        l2_hosts = set()
+        router_ids = set()
+        for port in port_details.values():
+            if port['device_owner'] in nl_constants.ROUTER_INTERFACE_OWNERS:
+                router_ids.add(port['device_id'])
+            elif port.get('host'):
+                l2_hosts.add(port['host'])
+        admin_context = context.elevated()
+        for router_id in router_ids:
+            l3_hosts.update(get_hosts_to_notify(admin_context, router_id))
+        return {constants.FW_AGENT_L3: sorted(l3_hosts),
+                constants.FW_AGENT_L2: sorted(l2_hosts)}
 
     def _get_fwg_port_details(self, context, fwg_ports):
-        """Returns a dictionary list of port details. """
+        """Returns a dictionary list of port details.
+
+        The ports are all fetched with a single query, only loading the
+        fields the agents use.
+        """
         port_details = {}
-        for port_id in fwg_ports:
-            port_db = self._core_plugin.get_port(context, port_id)
+        if not fwg_ports:
+            return port_details
+        port_ids = set(fwg_ports)
+        ports = self._core_plugin.get_ports(
+            context, filters={'id': list(port_ids)},
+            fields=PORT_DETAILS_FIELDS)
+        for port_db in ports:
             # Add more parameters below based on requirement.
             device_owner = port_db['device_owner']
-            port_details[port_id] = {
+            port_details[port_db['id']] = {
                 'device_owner': device_owner,
                 'device': port_db['id'],
+                'device_id': port_db['device_id'],
                 'network_id': port_db['network_id'],
                 'fixed_ips': port_db['fixed_ips'],
                 'allowed_address_pairs':
@@ -242,8 +567,11 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
             }
             if device_owner.startswith(
                     nl_constants.DEVICE_OWNER_COMPUTE_PREFIX):
-                port_details[port_id].update(
-                    {'host': port_db[pb_def.HOST_ID]})
+                port_details[port_db['id']].update(
+                    {'host': port_db.get(pb_def.HOST_ID)})
+        missing_port_ids = port_ids - set(port_details)
+        if missing_port_ids:
+            raise n_exc.PortNotFound(port_id=sorted(missing_port_ids)[0])
         return port_details
 
     def create_firewall_group_precommit(self, context, firewall_group):
@@ -261,14 +589,54 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
 
     def create_firewall_group_postcommit(self, context, firewall_group):
         if firewall_group['status'] != nl_constants.INACTIVE:
-            fwg_with_rules =\
-                self.firewall_db.make_firewall_group_dict_with_rules(
-                    context, firewall_group['id'])
-            fwg_with_rules['add-port-ids'] = firewall_group['ports']
+            self._notify(context, None, self._rpc_create_firewall_group,
+                         firewall_group, on_failure=self._fail_firewall_group)
+
+    def _rpc_create_firewall_group(self, context, firewall_group):
+        fwg_with_rules = self.firewall_db.make_firewall_group_dict_with_rules(
+            context, firewall_group['id'])
+        fwg_with_rules['add-port-ids'] = firewall_group['ports']
+        fwg_with_rules['del-ports-id'] = []
+        fwg_with_rules['port_details'] = self._get_fwg_port_details(
+            context, firewall_group['ports'])
+        version = self._encode_rule_lists(context, [fwg_with_rules])
+        self.agent_rpc.create_firewall_group(
+            context, fwg_with_rules,
+            agent_hosts=self._get_fwg_agent_hosts(
+                context, fwg_with_rules['port_details']),
+            version=version)
+
+    def create_firewall_groups_postcommit(self, context, firewall_groups):
+        firewall_groups = [fwg for fwg in firewall_groups
+                           if fwg['status'] != nl_constants.INACTIVE]
+        if firewall_groups:
+            self._notify(context, None, self._rpc_create_firewall_groups,
+                         firewall_groups,
+                         on_failure=self._fail_firewall_groups)
+
+    def _rpc_create_firewall_groups(self, context, firewall_groups):
+        """Casts the firewall groups created in bulk to the agents
+
+        The rule lists and the port details of all the firewall groups are
+        fetched at once.
+        """
+        fwgs_with_rules = self.firewall_db.add_rule_lists_to_firewall_groups(
+            context, firewall_groups)
+        port_details = self._get_fwg_port_details(
+            context, [port_id for fwg in firewall_groups
+                      for port_id in fwg['ports']])
+        version = self._encode_rule_lists(context, fwgs_with_rules)
+        for fwg_with_rules in fwgs_with_rules:
+            fwg_with_rules['add-port-ids'] = fwg_with_rules['ports']
             fwg_with_rules['del-ports-id'] = []
-            fwg_with_rules['port_details'] = self._get_fwg_port_details(
-                context, firewall_group['ports'])
-            self.agent_rpc.create_firewall_group(context, fwg_with_rules)
+            fwg_with_rules['port_details'] = {
+                port_id: port_details[port_id]
+                for port_id in fwg_with_rules['ports']}
+            self.agent_rpc.create_firewall_group(
+                context, fwg_with_rules,
+                agent_hosts=self._get_fwg_agent_hosts(
+                    context, fwg_with_rules['port_details']),
+                version=version)
 
     def _need_pending_update(self, old_firewall_group, new_firewall_group):
         port_updated = (set(new_firewall_group['ports']) !=
@@ -294,10 +662,13 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
 
     def update_firewall_group_postcommit(self, context, old_firewall_group,
                                          new_firewall_group):
-        if not self._need_pending_update(old_firewall_group,
-                                         new_firewall_group):
-            return
+        if self._need_pending_update(old_firewall_group, new_firewall_group):
+            self._notify(context, None, self._rpc_update_firewall_group,
+                         old_firewall_group, new_firewall_group,
+                         on_failure=self._fail_firewall_group)
 
+    def _rpc_update_firewall_group(self, context, old_firewall_group,
+                                   new_firewall_group):
         fwg_with_rules = self.firewall_db.make_firewall_group_dict_with_rules(
             context, new_firewall_group['id'])
 
@@ -337,7 +708,50 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
                 # association and enforce default policies
                 return
         # Warn agents Firewall Group port list updated
-        self.agent_rpc.update_firewall_group(context, fwg_with_rules)
+        version = self._encode_rule_lists(context, [fwg_with_rules])
+        self.agent_rpc.update_firewall_group(
+            context, fwg_with_rules,
+            agent_hosts=self._get_fwg_agent_hosts(
+                context, fwg_with_rules['port_details']),
+            version=version)
+
+    def add_firewall_group_port_precommit(self, context, firewall_group,
+                                          port_id):
+        if (firewall_group['ingress_firewall_policy_id'] or
+                firewall_group['egress_firewall_policy_id']):
+            firewall_group['status'] = nl_constants.PENDING_UPDATE
+
+    def add_firewall_group_port_postcommit(self, context, firewall_group,
+                                           port_id):
+        if firewall_group['status'] == nl_constants.PENDING_UPDATE:
+            self._notify(context, None, self._rpc_add_firewall_group_port,
+                         firewall_group, port_id,
+                         on_failure=self._fail_firewall_group)
+
+    def _rpc_add_firewall_group_port(self, context, firewall_group, port_id):
+        """Casts the association of a single port to a firewall group
+
+        Neither the ports already in the firewall group nor their details
+        are loaded, the firewall group being cast with the added port only.
+        """
+        port_details = self._get_fwg_port_details(context, [port_id])
+        if (firewall_group['name'] == constants.DEFAULT_FWG and
+                port_details[port_id].get('status') != nl_constants.ACTIVE):
+            # If port not yet active, just associate to default firewall
+            # group. When agent will set it to UP, it'll found FG
+            # association and enforce default policies
+            return
+        fwg_with_rules = self.firewall_db.add_rule_lists_to_firewall_groups(
+            context, [dict(firewall_group, ports=[port_id])])[0]
+        fwg_with_rules['add-port-ids'] = [port_id]
+        fwg_with_rules['del-port-ids'] = []
+        fwg_with_rules['last-port'] = False
+        fwg_with_rules['port_details'] = port_details
+        version = self._encode_rule_lists(context, [fwg_with_rules])
+        self.agent_rpc.update_firewall_group(
+            context, fwg_with_rules,
+            agent_hosts=self._get_fwg_agent_hosts(context, port_details),
+            version=version)
 
     def update_firewall_policy_postcommit(self, context, old_firewall_policy,
                                           new_firewall_group):
@@ -347,8 +761,7 @@ class FirewallAgentDriver(driver_api.FirewallDriverDB,
                                         new_firewall_rule):
         firewall_policy_ids = self.firewall_db.get_policies_with_rule(
             context, new_firewall_rule['id'])
-        for firewall_policy_id in firewall_policy_ids:
-            self._rpc_update_firewall_policy(context, firewall_policy_id)
+        self._notify_firewall_policies(context, firewall_policy_ids)
 
     def insert_rule_postcommit(self, context, policy_id, rule_info):
         self._rpc_update_firewall_policy(context, policy_id)
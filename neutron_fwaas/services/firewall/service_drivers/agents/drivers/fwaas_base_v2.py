@@ -14,6 +14,7 @@
 #    under the License.
 
 import abc
+import contextlib
 
 
 class FwaasDriverBase(object, metaclass=abc.ABCMeta):
@@ -57,6 +58,25 @@ class FwaasDriverBase(object, metaclass=abc.ABCMeta):
     application of rules. Argument agent_mode indicates the l3 agent in DVR or
     DVR_SNAT or LEGACY mode.
     """
+    @contextlib.contextmanager
+    def defer_apply(self):
+        """Defer apply context.
+
+        Drivers able to batch their backend updates may override this so
+        that all the changes made within the context are applied at once
+        when it exits.
+        """
+        yield
+
+    def audit_router(self, agent_mode, router_info):
+        """Check the firewall rules of a router against the backend.
+
+        Drivers able to detect that the rules installed on the backend
+        drifted from the ones they compiled may override this to reapply
+        the compiled rules. Returns True if a drift was repaired.
+        """
+        return False
+
     @abc.abstractmethod
     def create_firewall_group(self, agent_mode, apply_list, firewall):
         """Create the Firewall with default (drop all) policy.
@@ -13,6 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import contextlib
+import hashlib
+import re
+
 from neutron.agent.linux import iptables_manager
 from neutron.common import utils
 from neutron_lib import constants
@@ -59,6 +64,10 @@ ROUTER_2_FIP_DEV_PREFIX = 'rfp-'
 
 MAX_INTF_NAME_LEN = 14
 
+# Firewall group chains once truncated by the iptables manager, e.g.
+# 'iv4' followed by the first characters of the firewall group ID.
+FWAAS_FWG_CHAIN_RE = re.compile(r'^[io]v[46][0-9a-f]+$')
+
 
 class IptablesFwaasDriver(fwaas_base_v2.FwaasDriverBase):
     """IPTables driver for Firewall As A Service."""
@@ -67,6 +76,143 @@ class IptablesFwaasDriver(fwaas_base_v2.FwaasDriverBase):
         LOG.debug("Initializing fwaas iptables driver")
         self.pre_firewall = None
         self.conntrack = conntrack_base.load_and_init_conntrack_driver()
+        self._deferred_ipt_mgrs = None
+
+    @contextlib.contextmanager
+    def defer_apply(self):
+        """Defer iptables-restore until the end of the context.
+
+        Every iptables manager touched within the context is applied once
+        when it exits instead of once per firewall group operation.
+        """
+        if self._deferred_ipt_mgrs is not None:
+            # Nested context, the outermost one applies the changes.
+            yield
+            return
+        self._deferred_ipt_mgrs = []
+        try:
+            yield
+        finally:
+            ipt_mgrs, self._deferred_ipt_mgrs = self._deferred_ipt_mgrs, None
+            failed = False
+            for ipt_mgr in ipt_mgrs:
+                try:
+                    ipt_mgr.defer_apply_off()
+                except (LookupError, RuntimeError):
+                    LOG.exception("Failed to apply deferred firewall rules "
+                                  "in namespace %s", ipt_mgr.namespace)
+                    failed = True
+            if failed:
+                raise fw_ext.FirewallInternalDriverError(
+                    driver=FWAAS_DRIVER_NAME)
+
+    def _apply(self, ipt_mgr):
+        """Apply the changes of an iptables manager
+
+        The changes are applied immediately (no defer in firewall path)
+        unless a defer_apply context is active.
+        """
+        if self._deferred_ipt_mgrs is None:
+            ipt_mgr.defer_apply_off()
+        elif ipt_mgr not in self._deferred_ipt_mgrs:
+            self._deferred_ipt_mgrs.append(ipt_mgr)
+
+    def audit_router(self, agent_mode, router_info):
+        """Reapply the fwaas chains of a router if they drifted.
+
+        A checksum of the fwaas chains compiled in the iptables managers of
+        the router is compared with a checksum of the same chains in the
+        live iptables-save output. The compiled rules are only reapplied
+        when the checksums differ.
+        """
+        drifted = False
+        for ipt_if_prefix in self._get_ipt_mgrs_with_if_prefix(
+                agent_mode, router_info):
+            ipt_mgr = ipt_if_prefix['ipt']
+            if (ipt_mgr.iptables_apply_deferred or
+                    ipt_mgr in (self._deferred_ipt_mgrs or [])):
+                # The compiled rules are being updated and not applied yet.
+                continue
+            try:
+                compiled = self._get_compiled_fwaas_checksum(ipt_mgr)
+                live = self._get_live_fwaas_checksum(ipt_mgr)
+                if compiled == live:
+                    continue
+                LOG.warning("FWaaS rules of router %(router)s drifted in "
+                            "namespace %(ns)s, reapplying them",
+                            {'router': router_info.router_id,
+                             'ns': ipt_mgr.namespace})
+                self._apply(ipt_mgr)
+                drifted = True
+            except (LookupError, RuntimeError):
+                LOG.exception("Failed to audit firewall rules in "
+                              "namespace %s", ipt_mgr.namespace)
+                raise fw_ext.FirewallInternalDriverError(
+                    driver=FWAAS_DRIVER_NAME)
+        return drifted
+
+    def _is_fwaas_chain(self, wrap_name, chain):
+        """Whether a (wrapped) chain name is a fwaas one."""
+        prefix = '%s-' % wrap_name
+        if not chain.startswith(prefix):
+            return False
+        chain = chain[len(prefix):]
+        return (chain in [iptables_manager.get_chain_name(name)
+                          for name in (ACCEPTED_CHAIN, DROPPED_CHAIN,
+                                       REJECTED_CHAIN, FWAAS_DEFAULT_CHAIN)]
+                or FWAAS_FWG_CHAIN_RE.match(chain) is not None)
+
+    def _get_fwaas_checksum(self, wrap_name, lines):
+        """Checksum the fwaas rules among iptables-save formatted lines.
+
+        The rules of the fwaas chains and the rules jumping to them are
+        kept, in order, per chain. Chains are sorted by name since
+        iptables-save does not list them in creation order.
+        """
+        rules_by_chain = collections.defaultdict(list)
+        for line in lines:
+            args = line.split()
+            if len(args) < 2 or args[0] != '-A':
+                continue
+            target = args[args.index('-j') + 1] if '-j' in args[:-1] else ''
+            if (self._is_fwaas_chain(wrap_name, args[1]) or
+                    self._is_fwaas_chain(wrap_name, target)):
+                rules_by_chain[args[1]].append(' '.join(args))
+        checksum = hashlib.sha256()
+        for chain in sorted(rules_by_chain):
+            for rule in rules_by_chain[chain]:
+                checksum.update(rule.encode('utf-8'))
+                checksum.update(b'\n')
+        return checksum.hexdigest()
+
+    def _get_filter_tables(self, ipt_mgr):
+        """Returns the filter tables along with their save command."""
+        tables = [(ipt_mgr.ipv4['filter'], 'iptables-save')]
+        if ipt_mgr.use_ipv6:
+            tables.append((ipt_mgr.ipv6['filter'], 'ip6tables-save'))
+        return tables
+
+    def _get_compiled_fwaas_checksum(self, ipt_mgr):
+        checksums = []
+        for table, save_cmd in self._get_filter_tables(ipt_mgr):
+            # Top rules are inserted before the others by iptables-restore.
+            rules = ([r for r in table.rules if r.top] +
+                     [r for r in table.rules if not r.top])
+            checksums.append(self._get_fwaas_checksum(
+                ipt_mgr.wrap_name, [str(rule) for rule in rules]))
+        return checksums
+
+    def _get_live_fwaas_checksum(self, ipt_mgr):
+        checksums = []
+        for table, save_cmd in self._get_filter_tables(ipt_mgr):
+            args = [save_cmd, '-t', 'filter']
+            if ipt_mgr.namespace:
+                args = ['ip', 'netns', 'exec', ipt_mgr.namespace] + args
+            output = ipt_mgr.execute(args, run_as_root=True,
+                                     privsep_exec=True)
+            checksums.append(self._get_fwaas_checksum(
+                ipt_mgr.wrap_name, output.splitlines()))
+        return checksums
 
     def _get_intf_name(self, if_prefix, port_id):
         _name = "%s%s" % (if_prefix, port_id)
@@ -125,8 +271,7 @@ class IptablesFwaasDriver(fwaas_base_v2.FwaasDriverBase):
                     ipt_mgr = ipt_if_prefix['ipt']
                     self._remove_chains(fwid, ipt_mgr)
                     self._remove_default_chains(ipt_mgr)
-                    # apply the changes immediately (no defer in firewall path)
-                    ipt_mgr.defer_apply_off()
+                    self._apply(ipt_mgr)
             self.pre_firewall = None
         except (LookupError, RuntimeError):
             # catch known library exceptions and raise Fwaas generic exception
@@ -177,8 +322,7 @@ class IptablesFwaasDriver(fwaas_base_v2.FwaasDriverBase):
                     self._enable_policy_chain(fwid, ipt_if_prefix,
                                               router_fw_ports)
 
-                    # apply the changes immediately (no defer in firewall path)
-                    ipt_mgr.defer_apply_off()
+                    self._apply(ipt_mgr)
         except (LookupError, RuntimeError):
             # catch known library exceptions and raise Fwaas generic exception
             LOG.exception(
@@ -206,8 +350,7 @@ class IptablesFwaasDriver(fwaas_base_v2.FwaasDriverBase):
                 # create chain based on configured policy
                 self._setup_chains(firewall, ipt_if_prefix, router_fw_ports)
 
-                # apply the changes immediately (no defer in firewall path)
-                ipt_mgr.defer_apply_off()
+                self._apply(ipt_mgr)
 
     def _get_chain_name(self, fwid, ver, direction):
         return '%s%s%s' % (CHAIN_NAME_PREFIX[direction],
@@ -13,16 +13,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import copy
+import threading
+
 from neutron_lib import rpc as n_rpc
 from oslo_config import cfg
 import oslo_messaging
 
 from neutron_fwaas._i18n import _
+from neutron_fwaas.common import rule_list_patch
+from neutron_fwaas.common import rule_schema
 
 
 FWAAS_V1 = "v1"
 FWAAS_V2 = "v2"
 FW_L2_NOOP_DRIVER = 'noop'
+DEFAULT_MAX_RULE_LISTS = 1000
 
 FWaaSOpts = [
     cfg.StrOpt(
@@ -45,7 +52,43 @@ FWaaSOpts = [
         'firewall_l2_driver',
         default=FW_L2_NOOP_DRIVER,
         help=_("Name of the firewall l2 driver")
-    )
+    ),
+    cfg.BoolOpt(
+        'startup_bulk_sync',
+        default=False,
+        help=_("Gather the firewall work of all the routers added during "
+               "the initial full sync of the L3 agent, fetch their firewall "
+               "groups in bulk and apply the rules once per namespace when "
+               "the sync has settled.")),
+    cfg.IntOpt(
+        'startup_bulk_sync_quiet_period',
+        default=10,
+        min=1,
+        help=_("Number of seconds without any new router added after which "
+               "the routers gathered by the startup bulk sync are "
+               "firewalled.")),
+    cfg.IntOpt(
+        'startup_bulk_sync_max_duration',
+        default=120,
+        min=1,
+        help=_("Number of seconds since the agent start after which the "
+               "routers gathered by the startup bulk sync are firewalled, "
+               "even if routers are still being added.")),
+    cfg.IntOpt(
+        'audit_interval',
+        default=0,
+        min=0,
+        help=_("Interval in seconds between two audits of the firewall "
+               "rules installed in the router namespaces. Routers whose "
+               "rules drifted from the compiled ones get them reapplied. "
+               "0 disables the audit.")),
+    cfg.IntOpt(
+        'audit_max_routers',
+        default=100,
+        min=1,
+        help=_("Maximum number of routers audited at each audit interval. "
+               "Routers are audited in turn so that all of them get "
+               "audited over several intervals.")),
 ]
 cfg.CONF.register_opts(FWaaSOpts, 'fwaas')
 
@@ -73,6 +116,95 @@ class FWaaSPluginApiMixin(object):
         return cctxt.call(context, 'firewall_deleted', host=self.host,
                           firewall_id=firewall_id)
 
+    def get_firewall_policies_rule_lists(self, context, policy_ids):
+        """Make a RPC to get the rule lists of policies with their revision.
+
+        Returns a dictionary of {'revision': ..., 'rules': ...} keyed by
+        policy ID.
+        """
+        cctxt = self.client.prepare(version='1.4')
+        return cctxt.call(context, 'get_firewall_policies_rule_lists',
+                          policy_ids=policy_ids)
+
+
+class RuleListResolver(object):
+    """Agent side cache of the rule lists of firewall policies
+
+    Firewall groups may be cast with the revision of the rule lists of their
+    policies and, in place of a rule list, with a patch from a previous
+    revision. The resolver caches the latest rule list received for each
+    policy and rebuilds the rule lists of the patched firewall groups from
+    it. The rule lists it cannot rebuild are fetched from the plugin.
+    Slim rules are decoded back to rule dictionaries on the way.
+    """
+
+    def __init__(self, plugin_rpc, max_policies=DEFAULT_MAX_RULE_LISTS):
+        self.plugin_rpc = plugin_rpc
+        self.max_policies = max_policies
+        # policy ID -> (revision number, rules)
+        self._rule_lists = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, policy_id):
+        with self._lock:
+            return self._rule_lists.get(policy_id)
+
+    def _set(self, policy_id, revision, rules):
+        with self._lock:
+            self._rule_lists.pop(policy_id, None)
+            self._rule_lists[policy_id] = (revision, rules)
+            while len(self._rule_lists) > self.max_policies:
+                self._rule_lists.popitem(last=False)
+
+    def _patch(self, policy_id, patch):
+        cached = self._get(policy_id)
+        if cached is None:
+            return None
+        revision, rules = cached
+        if revision == patch['revision']:
+            return rules
+        if revision != patch['base_revision']:
+            return None
+        rules = rule_list_patch.apply_patch(rules, patch)
+        self._set(policy_id, patch['revision'], rules)
+        return rules
+
+    def resolve(self, context, firewall_group):
+        """Set the full rule lists of a firewall group in place"""
+        rule_schema.decode_firewall_group(firewall_group)
+        missing = {}
+        for direction in rule_list_patch.DIRECTIONS:
+            policy_id = firewall_group.get(
+                '%s_firewall_policy_id' % direction)
+            revision = firewall_group.get(
+                rule_list_patch.revision_key(direction))
+            patch = firewall_group.pop(
+                rule_list_patch.patch_key(direction), None)
+            if not policy_id or revision is None:
+                continue
+            rule_list_key = rule_list_patch.rule_list_key(direction)
+            if patch is None:
+                self._set(policy_id, revision,
+                          copy.deepcopy(firewall_group[rule_list_key]))
+                continue
+            rules = self._patch(policy_id, patch)
+            if rules is None:
+                missing[direction] = policy_id
+            else:
+                firewall_group[rule_list_key] = copy.deepcopy(rules)
+        if not missing:
+            return firewall_group
+        rule_lists = self.plugin_rpc.get_firewall_policies_rule_lists(
+            context, sorted(set(missing.values())))
+        for direction, policy_id in missing.items():
+            rule_list = rule_lists[policy_id]
+            self._set(policy_id, rule_list['revision'], rule_list['rules'])
+            firewall_group[rule_list_patch.revision_key(direction)] = (
+                rule_list['revision'])
+            firewall_group[rule_list_patch.rule_list_key(direction)] = (
+                copy.deepcopy(rule_list['rules']))
+        return firewall_group
+
 
 class FWaaSAgentRpcCallbackMixin(object):
     """Mixin for FWaaS agent Implementations."""
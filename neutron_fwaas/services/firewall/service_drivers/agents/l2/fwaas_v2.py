@@ -15,6 +15,7 @@
 from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
+import oslo_messaging
 
 from neutron.agent import securitygroups_rpc
 from neutron import manager
@@ -47,6 +48,14 @@ class FWaaSL2PluginApi(api.FWaaSPluginApiMixin):
         return cctxt.call(context, 'get_firewall_group_for_port',
                           port_id=port_id)
 
+    def get_firewall_groups_for_ports(self, context, port_ids):
+        """Get the firewall groups associated with several ports"""
+
+        LOG.debug("Get firewall groups associated with ports %s", port_ids)
+        cctxt = self.client.prepare(version='1.3')
+        return cctxt.call(context, 'get_firewall_groups_for_ports',
+                          port_ids=port_ids)
+
     def set_firewall_group_status(self, context, fwg_id, status, host):
         """Set the status of a group operation."""
 
@@ -65,6 +74,15 @@ class FWaaSL2PluginApi(api.FWaaSPluginApiMixin):
 
 
 class FWaaSV2AgentExtension(l2_extension.L2AgentExtension):
+    """FWaaS L2 agent extension.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - Firewall groups may carry rule list revisions and patches.
+        1.2 - Firewall groups may carry slim rules.
+    """
+
+    target = oslo_messaging.Target(version='1.2')
 
     def initialize(self, connection, driver_type):
         """Perform Agent Extension initialization"""
@@ -79,6 +97,7 @@ class FWaaSV2AgentExtension(l2_extension.L2AgentExtension):
             FWAAS_L2_DRIVER, fw_l2_driver_cls)(self.agent_api, sg_with_ovs)
         self.plugin_rpc = FWaaSL2PluginApi(
             consts.FIREWALL_PLUGIN, self.conf.host)
+        self.rule_lists = api.RuleListResolver(self.plugin_rpc)
         self.start_rpc_listeners()
         self.fwg_map = PortFirewallGroupMap()
 
@@ -89,6 +108,8 @@ class FWaaSV2AgentExtension(l2_extension.L2AgentExtension):
         self.conn = n_rpc.Connection()
         endpoints = [self]
         self.conn.create_consumer(consts.FW_AGENT, endpoints, fanout=False)
+        # Firewall group changes cast to this host only
+        self.conn.create_consumer(consts.FW_AGENT_L2, endpoints, fanout=False)
         return self.conn.consume_in_threads()
 
     def _load_l2_driver_class(self, driver_type):
@@ -294,6 +315,7 @@ class FWaaSV2AgentExtension(l2_extension.L2AgentExtension):
         host = cfg.CONF.host
         with self.driver.defer_apply():
             try:
+                self.rule_lists.resolve(context, firewall_group)
                 self._create_firewall_group(context, firewall_group, host)
             except Exception as exc:
                 LOG.exception(
@@ -324,6 +346,7 @@ class FWaaSV2AgentExtension(l2_extension.L2AgentExtension):
         host = cfg.CONF.host
         with self.driver.defer_apply():
             try:
+                self.rule_lists.resolve(context, firewall_group)
                 self._delete_firewall_group(
                     context, firewall_group, host, event=consts.UPDATE_FWG)
                 self._create_firewall_group(
@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import threading
+import time
+
 from neutron.agent.linux import ip_lib
 from neutron_lib.agent import l3_extension
 from neutron_lib import constants as nl_constants
@@ -22,6 +26,8 @@ from neutron_lib import rpc as n_rpc
 from oslo_config import cfg
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
+import oslo_messaging
+from oslo_service import loopingcall
 
 from neutron_fwaas.common import fwaas_constants
 from neutron_fwaas.common import resources as f_resources
@@ -46,6 +52,29 @@ class FWaaSL3PluginApi(api.FWaaSPluginApiMixin):
         return cctxt.call(context, 'get_firewall_groups_for_project',
                 host=self.host)
 
+    def get_firewall_groups_for_projects(self, context, project_ids,
+                                         **kwargs):
+        """Fetches the firewall groups of several projects from the plugin.
+
+        Returns a dictionary of firewall group lists keyed by project ID.
+        """
+        LOG.debug("Fetch firewall groups of %d projects from plugin",
+                  len(project_ids))
+        cctxt = self.client.prepare(version='1.1')
+        return cctxt.call(context, 'get_firewall_groups_for_projects',
+                          project_ids=project_ids, host=self.host)
+
+    def get_firewall_groups_for_router(self, context, port_ids, **kwargs):
+        """Fetches the firewall groups bound to router ports from the plugin.
+
+        Only the firewall groups bound to one of the given router interface
+        ports are returned.
+        """
+        LOG.debug("Fetch firewall groups bound to router ports from plugin")
+        cctxt = self.client.prepare(version='1.2')
+        return cctxt.call(context, 'get_firewall_groups_for_router',
+                          port_ids=port_ids, host=self.host)
+
     def get_projects_with_firewall_groups(self, context, **kwargs):
         """Fetches from the plugin all projects that have firewall groups
            configured.
@@ -72,7 +101,15 @@ class FWaaSL3PluginApi(api.FWaaSPluginApiMixin):
 
 
 class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
-    """FWaaS agent extension."""
+    """FWaaS agent extension.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - Firewall groups may carry rule list revisions and patches.
+        1.2 - Firewall groups may carry slim rules.
+    """
+
+    target = oslo_messaging.Target(version='1.2')
 
     SUPPORTED_RESOURCE_TYPES = [f_resources.FIREWALL_GROUP,
                                 f_resources.FIREWALL_POLICY,
@@ -95,6 +132,9 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
         self.conn = n_rpc.Connection()
         self.conn.create_consumer(
             fwaas_constants.FW_AGENT, self.endpoints, fanout=False)
+        # Firewall group changes cast to this host only
+        self.conn.create_consumer(
+            fwaas_constants.FW_AGENT_L3, self.endpoints, fanout=False)
         return self.conn.consume_in_threads()
 
     def __init__(self, host, conf):
@@ -125,6 +165,31 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
         self.services_sync_needed = False
         self.fwplugin_rpc = FWaaSL3PluginApi(fwaas_constants.FIREWALL_PLUGIN,
                                              host)
+        self.rule_lists = api.RuleListResolver(self.fwplugin_rpc)
+
+        # Startup bulk sync: routers added during the initial full sync are
+        # gathered and firewalled all together once the sync has settled.
+        self._startup_lock = threading.Lock()
+        self._startup_routers = {}
+        self._startup_started_at = time.monotonic()
+        self._startup_last_added_at = None
+        self.startup_sync_duration = None
+        self.startup_bulk_sync = (self.fwaas_enabled and
+                                  cfg.CONF.fwaas.startup_bulk_sync)
+        if self.startup_bulk_sync:
+            self._startup_sync_loop = loopingcall.FixedIntervalLoopingCall(
+                self._check_startup_routers)
+            self._startup_sync_loop.start(interval=1)
+
+        # Firewall audit: routers are audited in turn, a limited number of
+        # them at each interval, and repaired if their rules drifted.
+        self._audit_routers = collections.OrderedDict()
+        audit_interval = cfg.CONF.fwaas.audit_interval
+        if self.fwaas_enabled and audit_interval:
+            self._audit_loop = loopingcall.FixedIntervalLoopingCall(
+                self._audit_next_routers)
+            self._audit_loop.start(interval=audit_interval,
+                                   initial_delay=audit_interval)
         super(FWaaSL3AgentExtension, self).__init__()
 
     @property
@@ -239,23 +304,37 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
 
     def _process_router_update(self, updated_router):
         """If a new or existing router in the local namespace is updated,
-        queries the plugin to get the firewall groups for the project in
-        question and then sees if the router has any ports for any firewall
-        group that is configured for that project. If so, installs firewall
-        group rules on the requested ports on this router.
+        queries the plugin to get the firewall groups bound to the router
+        ports. If any, installs firewall group rules on the requested ports
+        on this router.
         """
         LOG.debug("Process router update, router_id: %s  tenant: %s.",
                   updated_router['id'], updated_router['tenant_id'])
         router_id = updated_router['id']
         if not self.agent_api.is_router_in_namespace(router_id):
             return
+        router_port_ids = [
+            p['id']
+            for p in updated_router.get(nl_constants.INTERFACE_KEY, [])]
+        if not router_port_ids:
+            return
 
-        # Get the firewall groups for the new router's project.
+        # Get the firewall groups bound to the router ports, the plugin
+        # filters out the other firewall groups of the router's project.
         # NOTE: Vernacular move from "tenant" to "project" doesn't yet appear
         # as a key in router or firewall group objects.
         ctx = context.Context('', updated_router['tenant_id'])
-        fwg_list = self.fwplugin_rpc.get_firewall_groups_for_project(ctx)
+        fwg_list = self.fwplugin_rpc.get_firewall_groups_for_router(
+            ctx, router_port_ids)
+        self._apply_firewall_groups_to_router(ctx, updated_router, fwg_list)
+
+    def _apply_firewall_groups_to_router(self, ctx, updated_router, fwg_list):
+        """Installs the firewall groups of a project on the router ports
 
+        Sees if the router has any ports for any firewall group of the given
+        list. If so, installs firewall group rules on the requested ports on
+        this router.
+        """
         if nl_constants.INTERFACE_KEY not in updated_router:
             return
 
@@ -285,12 +364,132 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
                 ctx, ports_to_process, firewall_group)
             processed_ports |= ports_to_process
 
+    def _defer_startup_router(self, router):
+        """Gathers a router added by the initial sync for the bulk sync
+
+        Returns False if the startup bulk sync is over and the router has to
+        be processed right away.
+        """
+        with self._startup_lock:
+            if not self.startup_bulk_sync:
+                return False
+            self._startup_routers[router['id']] = router
+            self._startup_last_added_at = time.monotonic()
+            return True
+
+    def _defer_startup_router_update(self, router):
+        """Refreshes a router gathered for the startup bulk sync
+
+        Router updates do not postpone the startup bulk sync. Returns False
+        if the router is not gathered and has to be processed right away.
+        """
+        with self._startup_lock:
+            if router['id'] not in self._startup_routers:
+                return False
+            self._startup_routers[router['id']] = router
+            return True
+
+    def _check_startup_routers(self):
+        """Firewalls the gathered routers once the initial sync settled
+
+        The gathered routers are firewalled anyway once
+        startup_bulk_sync_max_duration has elapsed since the agent start.
+        """
+        with self._startup_lock:
+            last_added_at = (self._startup_last_added_at or
+                             self._startup_started_at)
+        now = time.monotonic()
+        if (now - last_added_at <
+                cfg.CONF.fwaas.startup_bulk_sync_quiet_period and
+                now - self._startup_started_at <
+                cfg.CONF.fwaas.startup_bulk_sync_max_duration):
+            return
+        try:
+            self._process_startup_routers()
+        except Exception:
+            LOG.exception("FWaaS startup bulk sync failed")
+            self.services_sync_needed = True
+        raise loopingcall.LoopingCallDone()
+
+    def _process_startup_routers(self):
+        """Firewalls all the routers gathered during the initial sync
+
+        The firewall groups of all the routers' projects are fetched with a
+        single RPC call and the driver applies its changes once per
+        namespace at the end.
+        """
+        with self._startup_lock:
+            routers = list(self._startup_routers.values())
+            self._startup_routers = {}
+            self.startup_bulk_sync = False
+
+        routers = [router for router in routers
+                   if self.agent_api.is_router_in_namespace(router['id'])]
+        if not routers:
+            return
+        project_ids = sorted(set(router['tenant_id'] for router in routers))
+        LOG.info("Firewalling %(routers)d routers of %(projects)d projects "
+                 "gathered during startup",
+                 {'routers': len(routers), 'projects': len(project_ids)})
+        try:
+            fwgs_by_project = (
+                self.fwplugin_rpc.get_firewall_groups_for_projects(
+                    context.get_admin_context(), project_ids))
+        except Exception:
+            LOG.exception("FWaaS startup bulk sync RPC call failed, "
+                          "processing routers one by one")
+            for router in routers:
+                self.add_router(None, router)
+            return
+
+        with self.fwaas_driver.defer_apply():
+            for router in routers:
+                ctx = context.Context('', router['tenant_id'])
+                self._apply_firewall_groups_to_router(
+                    ctx, router, fwgs_by_project.get(router['tenant_id'], []))
+
+        self.startup_sync_duration = (time.monotonic() -
+                                      self._startup_started_at)
+        LOG.info("FWaaS time to fully firewalled: %(duration).3f seconds "
+                 "for %(routers)d routers",
+                 {'duration': self.startup_sync_duration,
+                  'routers': len(routers)})
+
+    def _audit_next_routers(self):
+        """Audits the firewall rules of the next routers in turn"""
+        if self.startup_bulk_sync:
+            return
+        router_ids = list(self._audit_routers)[
+            :cfg.CONF.fwaas.audit_max_routers]
+        repaired = 0
+        for router_id in router_ids:
+            if router_id not in self._audit_routers:
+                # Deleted while auditing the previous routers.
+                continue
+            self._audit_routers.move_to_end(router_id)
+            router_info = self.agent_api.get_router_info(router_id)
+            if not router_info:
+                self._audit_routers.pop(router_id, None)
+                continue
+            try:
+                if self.fwaas_driver.audit_router(self.conf.agent_mode,
+                                                  router_info):
+                    repaired += 1
+            except Exception:
+                LOG.exception("FWaaS audit failed for router %s", router_id)
+        LOG.debug("FWaaS audited %(audited)d routers, %(repaired)d of them "
+                  "had their firewall rules reapplied",
+                  {'audited': len(router_ids), 'repaired': repaired})
+
     def add_router(self, context, new_router):
         """Handles agent restart and router add. Fetches firewall groups from
         plugin and updates driver.
         """
         if not self.fwaas_enabled:
             return
+        self._audit_routers.setdefault(new_router['id'])
+        if self._defer_startup_router(new_router):
+            return
 
         try:
             self._process_router_update(new_router)
@@ -305,6 +504,9 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
         """
         if not self.fwaas_enabled:
             return
+        self._audit_routers.setdefault(updated_router['id'])
+        if self._defer_startup_router_update(updated_router):
+            return
 
         try:
             self._process_router_update(updated_router)
@@ -322,7 +524,9 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
         """
         # TODO(njohnston): When another firewall driver is implemented, look at
         # expanding this out so that the driver can handle deletion calls.
-        pass
+        with self._startup_lock:
+            self._startup_routers.pop(new_router.get('id'), None)
+        self._audit_routers.pop(new_router.get('id'), None)
 
     def update_network(self, context, data):
         pass
@@ -357,11 +561,29 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
             LOG.exception("Failed FWaaS process services sync.")
             self.services_sync_needed = True
 
+    def _resolve_rule_lists(self, context, firewall_group):
+        """Rebuild the rule lists of a firewall group cast with patches.
+
+        Returns False, and requests a full sync, if they cannot be rebuilt.
+        """
+        try:
+            self.rule_lists.resolve(context, firewall_group)
+        except Exception:
+            LOG.exception("FWaaS failed to get the rule lists of firewall "
+                          "group: %(fwg_id)s",
+                          {'fwg_id': firewall_group['id']})
+            self.services_sync_needed = True
+            return False
+        return True
+
     @log_helpers.log_method_call
     def create_firewall_group(self, context, firewall_group, host):
         """Handles RPC from plugin to create a firewall group.
         """
 
+        if not self._resolve_rule_lists(context, firewall_group):
+            return
+
         # Get the in-namespace ports to which to add the firewall group.
         ports_for_fwg = self._get_firewall_group_ports(context, firewall_group)
         if not ports_for_fwg:
@@ -405,6 +627,9 @@ class FWaaSL3AgentExtension(l3_extension.L3AgentExtension):
         """Handles RPC from plugin to update a firewall group.
         """
 
+        if not self._resolve_rule_lists(context, firewall_group):
+            return
+
         # Initialize firewall group status.
         status = ""
 
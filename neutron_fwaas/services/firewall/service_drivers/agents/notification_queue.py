@@ -0,0 +1,237 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import itertools
+import threading
+import time
+
+from neutron_lib import context as neutron_context
+from oslo_log import log as logging
+from sqlalchemy import event
+from sqlalchemy import orm
+
+LOG = logging.getLogger(__name__)
+
+# Key of the session info holding the notifications queued once the session
+# transaction commits
+PENDING_NOTIFICATIONS = 'fwaas_pending_notifications'
+# Number of times a failed notification is retried, and seconds before its
+# first retry, doubled at each retry
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_INTERVAL = 2
+# Minimum number of seconds between two logs of the queue statistics
+STATS_INTERVAL = 60
+
+
+@event.listens_for(orm.Session, 'after_commit')
+def _queue_pending_notifications(session):
+    for queue, notification in session.info.pop(PENDING_NOTIFICATIONS, []):
+        queue._put(*notification)
+
+
+@event.listens_for(orm.Session, 'after_rollback')
+def _drop_pending_notifications(session):
+    session.info.pop(PENDING_NOTIFICATIONS, None)
+
+
+class NotificationQueue(object):
+    """Queue of agent notifications built and cast in the background
+
+    A notification is a driver method building the payloads of firewall
+    groups and casting them to the agents. It is queued once the transaction
+    of the request commits and run with an admin context by a single
+    background thread, in the order of the queue, so that the notifications
+    of a firewall group are cast in the order of its changes.
+
+    A notification queued under the key of a notification still waiting in
+    the queue is coalesced with it, the notifications reading the state of
+    the resources when they run. Notifications queued without a key are
+    never coalesced. A notification can be delayed, to be coalesced with the
+    notifications queued under its key in the meantime. The notifications
+    queued after a delayed one are not held back by it.
+
+    A failed notification is retried up to max_retries times, with an
+    increasing delay, its on_failure method being then called with the same
+    arguments so that the resources it was notifying do not stay pending.
+    It keeps its position in the queue and holds back the notifications
+    queued after it until it is retried.
+    """
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_interval=DEFAULT_RETRY_INTERVAL):
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        # key -> (due time, method, args, items, on_failure, attempts)
+        self._pending = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._thread = None
+        self.coalesced = 0
+        self.dispatched = 0
+        self.failures = 0
+        self._reported_at = time.monotonic()
+
+    def put(self, context, key, method, *args, on_failure=None):
+        """Queue method(admin context, *args) once the context commits"""
+        self._put_on_commit(context, (key, method, args, None, 0,
+                                      on_failure))
+
+    def put_items(self, context, key, method, items, delay=0,
+                  on_failure=None):
+        """Queue method(admin context, items) once the context commits
+
+        The items of the notifications coalesced under key are merged, the
+        method is called with the sorted list of all of them. The
+        notification is run delay seconds after it is first queued.
+        """
+        self._put_on_commit(context, (key, method, (), set(items), delay,
+                                      on_failure))
+
+    def _put_on_commit(self, context, notification):
+        session = context.session
+        if session.in_transaction():
+            session.info.setdefault(PENDING_NOTIFICATIONS, []).append(
+                (self, notification))
+        else:
+            self._put(*notification)
+
+    def _put(self, key, method, args, items=None, delay=0, on_failure=None,
+             attempts=0):
+        with self._condition:
+            if key is None:
+                key = (None, next(self._sequence))
+            elif key in self._pending:
+                self.coalesced += 1
+                if items:
+                    self._pending[key][3].update(items)
+                return
+            self._pending[key] = (time.monotonic() + delay, method, args,
+                                  items, on_failure, attempts)
+            self._start()
+            self._condition.notify()
+
+    def _start(self):
+        # the thread is started on the first notification, in the process
+        # forked for the API worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='fwaas-notifications', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                timeout = self._next_timeout()
+                while timeout is None or timeout > 0:
+                    self._condition.wait(timeout)
+                    timeout = self._next_timeout()
+            self.dispatch_pending()
+
+    def _next_timeout(self):
+        due = None
+        for entry in self._pending.values():
+            due = entry[0] if due is None else min(due, entry[0])
+            if entry[5]:
+                # a notification being retried holds back the next ones
+                break
+        return None if due is None else due - time.monotonic()
+
+    def _pop_due(self, wait):
+        # the first notification in the queue which is due, with its
+        # position, the queue holding few notifications
+        now = time.monotonic()
+        for position, (key, entry) in enumerate(self._pending.items()):
+            if wait or entry[0] <= now:
+                del self._pending[key]
+                return position, key, entry
+            if entry[5]:
+                break
+        return None, None, None
+
+    def _requeue(self, position, key, entry):
+        # the failed notification gets back to its position in the queue,
+        # the notification queued under its key while it ran being merged
+        # into it
+        queued = self._pending.pop(key, None)
+        if queued is not None:
+            self.coalesced += 1
+            if entry[3] is not None:
+                entry[3].update(queued[3])
+        pending = list(self._pending.items())
+        pending.insert(position, (key, entry))
+        self._pending = collections.OrderedDict(pending)
+
+    def dispatch_pending(self, wait=False):
+        """Run the queued notifications which are due, in order
+
+        With wait, the delayed notifications are run as well, and the queue
+        is emptied.
+        """
+        while True:
+            self._report_stats()
+            with self._condition:
+                position, key, entry = self._pop_due(wait)
+                if entry is None:
+                    return
+            due, method, args, items, on_failure, attempts = entry
+            call_args = args if items is None else (sorted(items),)
+            try:
+                method(neutron_context.get_admin_context(), *call_args)
+                self.dispatched += 1
+            except Exception:
+                self.failures += 1
+                LOG.exception("Failed to notify the agents with %(method)s "
+                              "for %(key)s",
+                              {'method': method.__name__, 'key': key})
+                if attempts < self.max_retries:
+                    due = (time.monotonic() +
+                           self.retry_interval * 2 ** attempts)
+                    with self._condition:
+                        self._requeue(position, key, (
+                            due, method, args, items, on_failure,
+                            attempts + 1))
+                elif on_failure is not None:
+                    self._fail(key, on_failure, call_args)
+
+    def _fail(self, key, on_failure, args):
+        try:
+            on_failure(neutron_context.get_admin_context(), *args)
+        except Exception:
+            LOG.exception("Failed to handle the failed notification of "
+                          "%(key)s with %(method)s",
+                          {'key': key, 'method': on_failure.__name__})
+
+    def _report_stats(self):
+        now = time.monotonic()
+        if now - self._reported_at < STATS_INTERVAL:
+            return
+        self._reported_at = now
+        LOG.debug("FWaaS agent notification queue stats: %s",
+                  self.get_stats())
+
+    def get_items(self, key):
+        """Return the items of the notification waiting under key"""
+        with self._condition:
+            entry = self._pending.get(key)
+            return set(entry[3] or []) if entry else set()
+
+    def get_stats(self):
+        """Return the depth of the queue and the notification counters"""
+        with self._condition:
+            return {'depth': len(self._pending),
+                    'coalesced': self.coalesced,
+                    'dispatched': self.dispatched,
+                    'failures': self.failures}
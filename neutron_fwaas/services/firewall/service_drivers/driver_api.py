@@ -14,6 +14,7 @@
 #    under the License.
 
 import abc
+import collections
 import copy
 
 
@@ -30,6 +31,12 @@ from neutron_fwaas.db.firewall.v2 import firewall_db_v2
 
 LOG = logging.getLogger(__name__)
 
+# Fields of the firewall group given to the driver hooks when a single port
+# is associated to it, its port list being left out
+FIREWALL_GROUP_FIELDS_WITHOUT_PORTS = [
+    'id', 'tenant_id', 'name', 'description', 'ingress_firewall_policy_id',
+    'egress_firewall_policy_id', 'admin_state_up', 'status', 'shared']
+
 
 class FirewallDriver(object, metaclass=abc.ABCMeta):
     """Firewall v2 interface for driver
@@ -56,6 +63,10 @@ class FirewallDriver(object, metaclass=abc.ABCMeta):
     def create_firewall_group(self, context, firewall_group):
         pass
 
+    def create_firewall_groups(self, context, firewall_groups):
+        return [self.create_firewall_group(context, firewall_group)
+                for firewall_group in firewall_groups]
+
     @abc.abstractmethod
     def delete_firewall_group(self, context, id):
         pass
@@ -68,15 +79,76 @@ class FirewallDriver(object, metaclass=abc.ABCMeta):
     def get_firewall_groups(self, context, filters=None, fields=None):
         pass
 
+    def get_firewall_groups_count(self, context, filters=None):
+        return len(self.get_firewall_groups(context, filters=filters))
+
+    def get_firewall_group_ports_in_use(self, context, port_ids, project_id,
+                                        exclude_id=None):
+        """Return the given ports bound to a firewall group of a project
+
+        The ports bound to the firewall group exclude_id are left out.
+        """
+        filters = {'tenant_id': [project_id], 'ports': port_ids}
+        ports_in_use = set()
+        for fwg in self.get_firewall_groups(context, filters=filters):
+            if exclude_id is not None and fwg['id'] == exclude_id:
+                continue
+            ports_in_use |= set(fwg.get('ports', [])) & set(port_ids)
+        return ports_in_use
+
+    def get_pending_firewall_groups_for_policies(self, context, project_id,
+                                                 policy_ids):
+        """Return the pending firewall groups of a project using policies
+
+        The firewall groups in a pending state using any of the policies are
+        returned as a dictionary of statuses keyed by firewall group ID.
+        """
+        pending = {}
+        for policy_id_field in ('ingress_firewall_policy_id',
+                                'egress_firewall_policy_id'):
+            filters = {'tenant_id': [project_id],
+                       'status': list(const.PENDING_STATES),
+                       policy_id_field: list(policy_ids)}
+            for fwg in self.get_firewall_groups(context, filters=filters,
+                                                fields=['id', 'status']):
+                pending[fwg['id']] = fwg['status']
+        return pending
+
+    def get_pending_firewall_groups_for_rule(self, context, project_id,
+                                             rule_id):
+        """Return the pending firewall groups of a project using a rule
+
+        The firewall groups in a pending state using any policy of the
+        project with the rule are returned as a dictionary of statuses keyed
+        by firewall group ID.
+        """
+        policy_ids = self.get_firewall_policy_ids(
+            context, filters={'tenant_id': [project_id],
+                              'firewall_rules': [rule_id]})
+        if not policy_ids:
+            return {}
+        return self.get_pending_firewall_groups_for_policies(
+            context, project_id, policy_ids)
+
     @abc.abstractmethod
     def update_firewall_group(self, context, id, firewall_group):
         pass
 
+    def add_firewall_group_port(self, context, id, port_id):
+        """Associate a single port to a firewall group"""
+        firewall_group = self.get_firewall_group(context, id)
+        return self.update_firewall_group(
+            context, id, {'ports': firewall_group['ports'] + [port_id]})
+
     # Firewall Policy
     @abc.abstractmethod
     def create_firewall_policy(self, context, firewall_policy):
         pass
 
+    def create_firewall_policies(self, context, firewall_policies):
+        return [self.create_firewall_policy(context, firewall_policy)
+                for firewall_policy in firewall_policies]
+
     @abc.abstractmethod
     def delete_firewall_policy(self, context, id):
         pass
@@ -89,6 +161,13 @@ class FirewallDriver(object, metaclass=abc.ABCMeta):
     def get_firewall_policies(self, context, filters=None, fields=None):
         pass
 
+    def get_firewall_policies_count(self, context, filters=None):
+        return len(self.get_firewall_policies(context, filters=filters))
+
+    def get_firewall_policy_ids(self, context, filters=None):
+        return [fwp['id'] for fwp in self.get_firewall_policies(
+            context, filters=filters, fields=['id'])]
+
     @abc.abstractmethod
     def update_firewall_policy(self, context, id, firewall_policy):
         pass
@@ -98,6 +177,10 @@ class FirewallDriver(object, metaclass=abc.ABCMeta):
     def create_firewall_rule(self, context, firewall_rule):
         pass
 
+    def create_firewall_rules(self, context, firewall_rules):
+        return [self.create_firewall_rule(context, firewall_rule)
+                for firewall_rule in firewall_rules]
+
     @abc.abstractmethod
     def delete_firewall_rule(self, context, id):
         pass
@@ -110,6 +193,9 @@ class FirewallDriver(object, metaclass=abc.ABCMeta):
     def get_firewall_rules(self, context, filters=None, fields=None):
         pass
 
+    def get_firewall_rules_count(self, context, filters=None):
+        return len(self.get_firewall_rules(context, filters=filters))
+
     @abc.abstractmethod
     def update_firewall_rule(self, context, id, firewall_rule):
         pass
@@ -141,6 +227,16 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
                               filter_by(id=resource_dict['id']).\
                               update({'status': resource_dict['status']})
 
+    def _publish_bulk_create(self, context, resource, request_bodies,
+                             resources):
+        for request_body, resource_dict in zip(request_bodies, resources):
+            payload = events.DBEventPayload(context=context,
+                                            resource_id=resource_dict['id'],
+                                            request_body=request_body,
+                                            states=(resource_dict,))
+            registry.publish(resource, events.AFTER_CREATE, self,
+                             payload=payload)
+
     # Firewall Group
     def create_firewall_group(self, context, firewall_group):
         request_body = firewall_group
@@ -160,6 +256,27 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
             const.FIREWALL_GROUP, events.AFTER_CREATE, self, payload=payload)
         return firewall_group
 
+    def create_firewall_groups(self, context, firewall_groups):
+        request_bodies = firewall_groups
+        with db_api.CONTEXT_WRITER.using(context):
+            firewall_groups = self.firewall_db.create_firewall_groups(
+                context, firewall_groups)
+            fwg_ids_by_status = collections.defaultdict(list)
+            for firewall_group in firewall_groups:
+                self.create_firewall_group_precommit(context, firewall_group)
+                fwg_ids_by_status[firewall_group['status']].append(
+                    firewall_group['id'])
+            # the status of the firewall groups is set with an UPDATE per
+            # status rather than per firewall group
+            for status, fwg_ids in fwg_ids_by_status.items():
+                self.firewall_db.update_firewall_groups_status(
+                    context, fwg_ids, status)
+        self.create_firewall_groups_postcommit(context, firewall_groups)
+
+        self._publish_bulk_create(context, const.FIREWALL_GROUP,
+                                  request_bodies, firewall_groups)
+        return firewall_groups
+
     @abc.abstractmethod
     def create_firewall_group_precommit(self, context, firewall_group):
         pass
@@ -168,6 +285,11 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
     def create_firewall_group_postcommit(self, context, firewall_group):
         pass
 
+    def create_firewall_groups_postcommit(self, context, firewall_groups):
+        """Called once for all the firewall groups created in bulk"""
+        for firewall_group in firewall_groups:
+            self.create_firewall_group_postcommit(context, firewall_group)
+
     def delete_firewall_group(self, context, id):
         firewall_group = self.firewall_db.get_firewall_group(context, id)
         if firewall_group['status'] == nl_constants.PENDING_DELETE:
@@ -198,6 +320,24 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
     def get_firewall_groups(self, context, filters=None, fields=None):
         return self.firewall_db.get_firewall_groups(context, filters, fields)
 
+    def get_firewall_groups_count(self, context, filters=None):
+        return self.firewall_db.get_firewall_groups_count(context, filters)
+
+    def get_firewall_group_ports_in_use(self, context, port_ids, project_id,
+                                        exclude_id=None):
+        return self.firewall_db.get_firewall_group_ports_in_use(
+            context, port_ids, project_id, exclude_id=exclude_id)
+
+    def get_pending_firewall_groups_for_policies(self, context, project_id,
+                                                 policy_ids):
+        return self.firewall_db.get_pending_firewall_groups(
+            context, project_id, policy_ids=policy_ids)
+
+    def get_pending_firewall_groups_for_rule(self, context, project_id,
+                                             rule_id):
+        return self.firewall_db.get_pending_firewall_groups(
+            context, project_id, rule_id=rule_id)
+
     def update_firewall_group(self, context, id, firewall_group_delta):
         old_firewall_group = self.firewall_db.get_firewall_group(context, id)
         new_firewall_group = copy.deepcopy(old_firewall_group)
@@ -219,6 +359,71 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
 
         return firewall_group
 
+    def add_firewall_group_port(self, context, id, port_id):
+        """Associate a single port to a firewall group
+
+        Only the association of the port is inserted, the ones of the ports
+        already in the group are left untouched. Neither the port list of
+        the group nor the returned firewall group hold its ports, the driver
+        hooks being given the added port. The AFTER_UPDATE event carries the
+        port delta, the added port being the only port of the new state.
+        """
+        old_firewall_group = self.firewall_db.get_firewall_group(
+            context, id, fields=FIREWALL_GROUP_FIELDS_WITHOUT_PORTS)
+        new_firewall_group = dict(old_firewall_group)
+        self.add_firewall_group_port_precommit(context, new_firewall_group,
+                                               port_id)
+        with db_api.CONTEXT_WRITER.using(context):
+            self.firewall_db.add_firewall_group_port(context, id, port_id)
+            if new_firewall_group['status'] != old_firewall_group['status']:
+                self.firewall_db.update_firewall_group_status(
+                    context, id, new_firewall_group['status'])
+        self.add_firewall_group_port_postcommit(context, new_firewall_group,
+                                                port_id)
+
+        payload = events.DBEventPayload(
+            context=context, resource_id=id,
+            states=(dict(old_firewall_group, ports=[]),
+                    dict(new_firewall_group, ports=[port_id])))
+        registry.publish(
+            const.FIREWALL_GROUP, events.AFTER_UPDATE, self, payload=payload)
+
+        return new_firewall_group
+
+    def add_firewall_group_port_precommit(self, context, firewall_group,
+                                          port_id):
+        """Called before a port is associated to a firewall group
+
+        The firewall group is given without its ports, its status may be
+        set. By default, the firewall group is loaded with its ports and the
+        driver is given the group before and after the port is added, like
+        on a port list update.
+        """
+        old_firewall_group = self.firewall_db.get_firewall_group(
+            context, firewall_group['id'])
+        new_firewall_group = copy.deepcopy(old_firewall_group)
+        new_firewall_group['ports'] = old_firewall_group['ports'] + [port_id]
+        self.update_firewall_group_precommit(context, old_firewall_group,
+                                             new_firewall_group)
+        firewall_group['status'] = new_firewall_group['status']
+
+    def add_firewall_group_port_postcommit(self, context, firewall_group,
+                                           port_id):
+        """Called after a port is associated to a firewall group
+
+        By default, the firewall group is loaded with its ports and the
+        driver is given the group before and after the port was added.
+        """
+        new_firewall_group = self.firewall_db.get_firewall_group(
+            context, firewall_group['id'])
+        new_firewall_group['status'] = firewall_group['status']
+        old_firewall_group = copy.deepcopy(new_firewall_group)
+        old_firewall_group['ports'] = [
+            fwg_port_id for fwg_port_id in new_firewall_group['ports']
+            if fwg_port_id != port_id]
+        self.update_firewall_group_postcommit(context, old_firewall_group,
+                                              new_firewall_group)
+
     @abc.abstractmethod
     def update_firewall_group_precommit(self, context, old_firewall_group,
                                         new_firewall_group):
@@ -246,6 +451,20 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
             const.FIREWALL_POLICY, events.AFTER_CREATE, self, payload=payload)
         return firewall_policy
 
+    def create_firewall_policies(self, context, firewall_policies):
+        request_bodies = firewall_policies
+        with db_api.CONTEXT_WRITER.using(context):
+            firewall_policies = self.firewall_db.create_firewall_policies(
+                context, firewall_policies)
+            for firewall_policy in firewall_policies:
+                self.create_firewall_policy_precommit(context,
+                                                      firewall_policy)
+        self.create_firewall_policies_postcommit(context, firewall_policies)
+
+        self._publish_bulk_create(context, const.FIREWALL_POLICY,
+                                  request_bodies, firewall_policies)
+        return firewall_policies
+
     @abc.abstractmethod
     def create_firewall_policy_precommit(self, context, firewall_policy):
         pass
@@ -254,6 +473,11 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
     def create_firewall_policy_postcommit(self, context, firewall_policy):
         pass
 
+    def create_firewall_policies_postcommit(self, context, firewall_policies):
+        """Called once for all the firewall policies created in bulk"""
+        for firewall_policy in firewall_policies:
+            self.create_firewall_policy_postcommit(context, firewall_policy)
+
     def delete_firewall_policy(self, context, id):
         firewall_policy = self.firewall_db.get_firewall_policy(context, id)
         self.delete_firewall_policy_precommit(context, firewall_policy)
@@ -280,6 +504,12 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
     def get_firewall_policies(self, context, filters=None, fields=None):
         return self.firewall_db.get_firewall_policies(context, filters, fields)
 
+    def get_firewall_policies_count(self, context, filters=None):
+        return self.firewall_db.get_firewall_policies_count(context, filters)
+
+    def get_firewall_policy_ids(self, context, filters=None):
+        return self.firewall_db.get_firewall_policy_ids(context, filters)
+
     def update_firewall_policy(self, context, id, firewall_policy_delta):
         old_firewall_policy = self.firewall_db.get_firewall_policy(context, id)
         new_firewall_policy = copy.deepcopy(old_firewall_policy)
@@ -325,6 +555,19 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
             const.FIREWALL_RULE, events.AFTER_CREATE, self, payload=payload)
         return firewall_rule
 
+    def create_firewall_rules(self, context, firewall_rules):
+        request_bodies = firewall_rules
+        with db_api.CONTEXT_WRITER.using(context):
+            firewall_rules = self.firewall_db.create_firewall_rules(
+                context, firewall_rules)
+            for firewall_rule in firewall_rules:
+                self.create_firewall_rule_precommit(context, firewall_rule)
+        self.create_firewall_rules_postcommit(context, firewall_rules)
+
+        self._publish_bulk_create(context, const.FIREWALL_RULE,
+                                  request_bodies, firewall_rules)
+        return firewall_rules
+
     @abc.abstractmethod
     def create_firewall_rule_precommit(self, context, firewall_rule):
         pass
@@ -333,6 +576,11 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
     def create_firewall_rule_postcommit(self, context, firewall_rule):
         pass
 
+    def create_firewall_rules_postcommit(self, context, firewall_rules):
+        """Called once for all the firewall rules created in bulk"""
+        for firewall_rule in firewall_rules:
+            self.create_firewall_rule_postcommit(context, firewall_rule)
+
     def delete_firewall_rule(self, context, id):
         firewall_rule = self.firewall_db.get_firewall_rule(context, id)
         self.delete_firewall_rule_precommit(context, firewall_rule)
@@ -359,6 +607,9 @@ class FirewallDriverDBMixin(FirewallDriver, metaclass=abc.ABCMeta):
     def get_firewall_rules(self, context, filters=None, fields=None):
         return self.firewall_db.get_firewall_rules(context, filters, fields)
 
+    def get_firewall_rules_count(self, context, filters=None):
+        return self.firewall_db.get_firewall_rules_count(context, filters)
+
     def update_firewall_rule(self, context, id, firewall_rule_delta):
         old_firewall_rule = self.firewall_db.get_firewall_rule(context, id)
         new_firewall_rule = copy.deepcopy(old_firewall_rule)
@@ -527,3 +778,11 @@ class FirewallDriverRPCMixin(object, metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def start_rpc_listener(self):
         pass
+
+    def get_rpc_workers(self):
+        """Return the number of RPC worker processes of the driver
+
+        The RPC listener of the driver is started in that many dedicated
+        processes, or in the Neutron server workers when it is 0.
+        """
+        return 0
@@ -101,3 +101,50 @@ class TestSanityCheck(testlib_api.SqlTestCaseLight):
             self.assertRaises(
                 script.DuplicatePortRecordinFirewallGroupPortAssociation,
                 script.check_sanity, conn)
+
+
+class TestFirewallIndexesMysql(testlib_api.MySQLTestCaseMixin,
+                               testlib_api.SqlTestCaseLight):
+    BUILD_WITH_MIGRATIONS = True
+
+    def _explain(self, query, **params):
+        with self.engine.connect() as conn:
+            return [row._mapping for row in conn.execute(
+                sqlalchemy.text('EXPLAIN ' + query), params)]
+
+    def _assert_index_lookup(self, index, query, **params):
+        plan = self._explain(query, **params)
+        self.assertEqual(1, len(plan))
+        self.assertNotEqual('ALL', plan[0]['type'])
+        # possible_keys is NULL when no index can be used
+        possible_keys = plan[0]['possible_keys']
+        self.assertIsNotNone(possible_keys, plan[0])
+        self.assertIn(index, possible_keys.split(','))
+
+    def test_firewall_groups_of_policy(self):
+        for direction in ('ingress', 'egress'):
+            column = '%s_firewall_policy_id' % direction
+            self._assert_index_lookup(
+                'ix_firewall_groups_v2_%s' % column,
+                'SELECT id FROM firewall_groups_v2 WHERE %s = :fwp_id' %
+                column, fwp_id='fwp_id')
+
+    def test_firewall_groups_by_status(self):
+        self._assert_index_lookup(
+            'ix_firewall_groups_v2_status',
+            'SELECT id FROM firewall_groups_v2 WHERE status = :status',
+            status='PENDING_UPDATE')
+
+    def test_firewall_group_by_name(self):
+        self._assert_index_lookup(
+            'ix_firewall_groups_v2_project_id_name',
+            'SELECT id FROM firewall_groups_v2 '
+            'WHERE project_id = :project_id AND name = :name',
+            project_id='project_id', name='default')
+
+    def test_firewall_policies_of_rule(self):
+        self._assert_index_lookup(
+            'ix_firewall_policy_rule_associations_v2_firewall_rule_id',
+            'SELECT firewall_policy_id '
+            'FROM firewall_policy_rule_associations_v2 '
+            'WHERE firewall_rule_id = :fwr_id', fwr_id='fwr_id')
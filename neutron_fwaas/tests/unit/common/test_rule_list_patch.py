@@ -0,0 +1,72 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from neutron.tests import base
+
+from neutron_fwaas.common import rule_list_patch
+
+
+class TestRuleListPatch(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRuleListPatch, self).setUp()
+        self.rules = [{'id': 'rule%d' % i, 'action': 'allow', 'position': i}
+                      for i in range(1, 6)]
+
+    def _check_patch(self, rules):
+        patch = rule_list_patch.make_patch(self.rules, rules, 1, 2)
+        self.assertIsNotNone(patch)
+        self.assertEqual(1, patch['base_revision'])
+        self.assertEqual(2, patch['revision'])
+        self.assertEqual(rules,
+                         rule_list_patch.apply_patch(self.rules, patch))
+        return patch
+
+    def test_update(self):
+        rules = [dict(rule) for rule in self.rules]
+        rules[2]['action'] = 'deny'
+        patch = self._check_patch(rules)
+        self.assertEqual([['rule3', {'action': 'deny'}]], patch['updated'])
+        self.assertEqual([], patch['added'])
+        self.assertEqual([], patch['removed'])
+
+    def test_insert_and_remove(self):
+        rules = [dict(rule) for rule in self.rules[1:]]
+        rules.insert(2, {'id': 'rule6', 'action': 'deny', 'position': 3})
+        patch = self._check_patch(rules)
+        self.assertEqual(['rule1'], patch['removed'])
+        self.assertEqual([[2, rules[2]]], patch['added'])
+
+    def test_apply_patch_leaves_base_untouched(self):
+        rules = [dict(rule) for rule in self.rules]
+        rules[0]['action'] = 'deny'
+        self._check_patch(rules)
+        self.assertEqual('allow', self.rules[0]['action'])
+
+    def test_no_patch_on_reorder(self):
+        rules = list(reversed(self.rules))
+        self.assertIsNone(
+            rule_list_patch.make_patch(self.rules, rules, 1, 2))
+
+    def test_no_patch_when_not_smaller(self):
+        rules = [dict(rule, action='deny') for rule in self.rules]
+        self.assertIsNone(
+            rule_list_patch.make_patch(self.rules, rules, 1, 2))
+
+    def test_no_patch_on_new_fields(self):
+        rules = [dict(rule) for rule in self.rules]
+        rules[0]['name'] = 'rule'
+        self.assertIsNone(
+            rule_list_patch.make_patch(self.rules, rules, 1, 2))
@@ -0,0 +1,92 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.tests import base
+
+from neutron_fwaas.common import rule_schema
+
+
+class TestRuleSchema(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRuleSchema, self).setUp()
+        self.rule = {'id': 'rule1',
+                     'tenant_id': 'tenant1',
+                     'name': 'rule1',
+                     'description': '',
+                     'firewall_policy_id': ['policy1'],
+                     'protocol': 'TCP',
+                     'ip_version': 4,
+                     'source_ip_address': None,
+                     'destination_ip_address': '10.0.0.0/24',
+                     'source_port': '1000:2000',
+                     'destination_port': '22',
+                     'action': 'allow',
+                     'enabled': True,
+                     'shared': False}
+
+    def test_encode_rule(self):
+        self.assertEqual(
+            ['rule1', 4, 'tcp', None, '10.0.0.0/24', [1000, 2000], [22, 22],
+             'allow', True],
+            rule_schema.encode_rule(self.rule))
+
+    def test_decode_rule(self):
+        rule = rule_schema.decode_rule(rule_schema.encode_rule(self.rule))
+        self.assertEqual(set(rule_schema.SLIM_FIELDS), set(rule))
+        for field in rule_schema.SLIM_FIELDS:
+            if field != 'protocol':
+                self.assertEqual(self.rule[field], rule[field])
+        self.assertEqual('tcp', rule['protocol'])
+
+    def test_decode_rule_any_port_and_protocol(self):
+        self.rule.update(protocol=None, source_port=None,
+                         destination_port=None)
+        rule = rule_schema.slim_rule(self.rule)
+        self.assertIsNone(rule['protocol'])
+        self.assertIsNone(rule['source_port'])
+        self.assertIsNone(rule['destination_port'])
+
+    def test_encode_and_decode_firewall_group(self):
+        patch = {'base_revision': 1, 'revision': 2, 'removed': [],
+                 'updated': [], 'added': [[0, self.rule]]}
+        fwg = {'ingress_rule_list': [self.rule],
+               'egress_rule_list_patch': patch}
+        rule_schema.encode_firewall_group(fwg)
+        self.assertEqual([rule_schema.encode_rule(self.rule)],
+                         fwg['ingress_rule_list'])
+        self.assertEqual([[0, rule_schema.encode_rule(self.rule)]],
+                         fwg['egress_rule_list_patch']['added'])
+        # the patch shared with other firewall groups is left untouched
+        self.assertEqual([[0, self.rule]], patch['added'])
+
+        rule_schema.decode_firewall_group(fwg)
+        slim_rule = rule_schema.slim_rule(self.rule)
+        self.assertEqual([slim_rule], fwg['ingress_rule_list'])
+        self.assertEqual([[0, slim_rule]],
+                         fwg['egress_rule_list_patch']['added'])
+
+    def test_slim_firewall_group(self):
+        fwg = {'ingress_rule_list': [self.rule], 'egress_rule_list': []}
+        rule_schema.slim_firewall_group(fwg)
+        self.assertEqual([rule_schema.slim_rule(self.rule)],
+                         fwg['ingress_rule_list'])
+        self.assertEqual([], fwg['egress_rule_list'])
+        # the rules decoded from a cast compare equal to the synced ones
+        cast = rule_schema.encode_firewall_group(
+            {'ingress_rule_list': [self.rule]})
+        self.assertEqual(fwg['ingress_rule_list'],
+                         rule_schema.decode_firewall_group(
+                             cast)['ingress_rule_list'])
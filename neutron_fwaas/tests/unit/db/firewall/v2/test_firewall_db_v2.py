@@ -19,11 +19,17 @@ import testtools
 import webob.exc
 
 from neutron_lib import constants as nl_constants
+from neutron_lib.db import api as db_api
 from neutron_lib.exceptions import firewall_v2 as f_exc
 from oslo_config import cfg
 from oslo_utils import uuidutils
+from sqlalchemy import event
+from sqlalchemy.orm import exc as orm_exc
 
 from neutron_fwaas.common import fwaas_constants as constants
+from neutron_fwaas.db.firewall.v2 import firewall_db_v2
+from neutron_fwaas.services.firewall.service_drivers import driver_api
+from neutron_fwaas.services.logapi.common import fwg_callback
 from neutron_fwaas.tests.unit.services.firewall import test_fwaas_plugin_v2
 
 
@@ -48,6 +54,33 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
                 observed_ids = [r['id'] for r in observeds]
                 self.assertEqual(expected_ids, observed_ids)
 
+    def test_get_policy_ordered_rules_cached(self):
+        with self.firewall_rule(name='fwr1', as_admin=True) as fwr:
+            fwr_id = fwr['firewall_rule']['id']
+            with self.firewall_policy(firewall_rules=[fwr_id],
+                                      as_admin=True) as fwp:
+                ctx = self._get_admin_context()
+                fwp_id = fwp['firewall_policy']['id']
+                cache = self.db.policy_rules_cache
+                self.db._get_policy_ordered_rules(ctx, fwp_id)
+                hits = cache.hits
+                observeds = self.db._get_policy_ordered_rules(ctx, fwp_id)
+                self.assertEqual(hits + 1, cache.hits)
+                self.assertEqual([fwr_id], [r['id'] for r in observeds])
+                self.assertGreater(cache.get_stats()['memory'], 0)
+
+                # another API worker sees the rule update through the
+                # revision number of the policy
+                other_db = firewall_db_v2.FirewallPluginDb()
+                other_db._get_policy_ordered_rules(ctx, fwp_id)
+                data = {'firewall_rule': {'name': 'fwr1-updated'}}
+                req = self.new_update_request('firewall_rules', data,
+                                              fwr_id, as_admin=True)
+                req.get_response(self.ext_api)
+                for db in (self.db, other_db):
+                    observeds = db._get_policy_ordered_rules(ctx, fwp_id)
+                    self.assertEqual('fwr1-updated', observeds[0]['name'])
+
     def test_create_firewall_policy(self):
         name = "firewall_policy1"
         attrs = self._get_test_firewall_policy_attrs(name)
@@ -101,6 +134,22 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
             for k, v in attrs.items():
                 self.assertEqual(v, res['firewall_policy'][k])
 
+    def _count_selects(self, list_func):
+        engine = db_api.get_context_manager().writer.get_engine()
+        statements = []
+
+        def _before_cursor_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        try:
+            list_func(self._get_admin_context())
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         _before_cursor_execute)
+        return len(statements)
+
     def test_list_firewall_policies(self):
         with self.firewall_policy(name='fwp1', description='fwp',
                                   as_admin=True) as fwp1, \
@@ -113,6 +162,21 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
                                       fw_policies,
                                       query_params='description=fwp')
 
+    def test_list_firewall_policies_query_count(self):
+        with self.firewall_rule(as_admin=True) as fwr:
+            fwr_id = fwr['firewall_rule']['id']
+            with self.firewall_policy(name='fwp1', firewall_rules=[fwr_id],
+                                      as_admin=True):
+                count = self._count_selects(self.plugin.get_firewall_policies)
+                with self.firewall_policy(name='fwp2',
+                                          firewall_rules=[fwr_id],
+                                          as_admin=True), \
+                        self.firewall_policy(name='fwp3',
+                                             firewall_rules=[fwr_id],
+                                             as_admin=True):
+                    self.assertEqual(count, self._count_selects(
+                        self.plugin.get_firewall_policies))
+
     def test_update_firewall_policy(self):
         name = "new_firewall_policy1"
         attrs = self._get_test_firewall_policy_attrs(name, audited=False)
@@ -605,6 +669,23 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
             self._test_list_resources('firewall_rule', fr,
                                       query_params=query_params)
 
+    def test_get_firewall_rules_and_policies_count(self):
+        ctx = self._get_admin_context()
+        with self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                self.firewall_rule(name='fwr2', protocol='udp',
+                                   as_admin=True):
+            fwr1_id = fwr1['firewall_rule']['id']
+            with self.firewall_policy(firewall_rules=[fwr1_id],
+                                      as_admin=True), \
+                    self.firewall_policy(name='fwp2', as_admin=True):
+                self.assertEqual(2, self.plugin.get_firewall_rules_count(ctx))
+                self.assertEqual(1, self.plugin.get_firewall_rules_count(
+                    ctx, filters={'protocol': ['udp']}))
+                self.assertEqual(
+                    2, self.plugin.get_firewall_policies_count(ctx))
+                self.assertEqual(1, self.plugin.get_firewall_policies_count(
+                    ctx, filters={'firewall_rules': [fwr1_id]}))
+
     def test_update_firewall_rule(self):
         name = "new_firewall_rule1"
         attrs = self._get_test_firewall_rule_attrs(name)
@@ -1131,6 +1212,107 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
                                           query_params='description=fwg',
                                           as_admin=True)
 
+    def test_list_firewall_groups_query_count(self):
+        with self.firewall_group(name='fwg1', as_admin=True):
+            count = self._count_selects(self.plugin.get_firewall_groups)
+            with self.firewall_group(name='fwg2', as_admin=True), \
+                    self.firewall_group(name='fwg3', as_admin=True):
+                self.assertEqual(count, self._count_selects(
+                    self.plugin.get_firewall_groups))
+
+    def test_get_firewall_policy_ids(self):
+        ctx = self._get_admin_context()
+        with self.firewall_rule(as_admin=True) as fwr:
+            fwr = fwr['firewall_rule']
+            with self.firewall_policy(firewall_rules=[fwr['id']],
+                                      as_admin=True) as fwp, \
+                    mock.patch.object(
+                        self.plugin, 'get_firewall_policies') as get_fwps:
+                self.assertEqual(
+                    [fwp['firewall_policy']['id']],
+                    self.plugin.driver.get_firewall_policy_ids(
+                        ctx, filters={
+                            'tenant_id': [fwr['tenant_id']],
+                            'firewall_rules': [fwr['id']]}))
+                get_fwps.assert_not_called()
+
+    def test_get_pending_firewall_groups(self):
+        ctx = self._get_admin_context()
+        with self.firewall_rule(as_admin=True) as fwr:
+            fwr = fwr['firewall_rule']
+            with self.firewall_policy(firewall_rules=[fwr['id']],
+                                      as_admin=True) as fwp:
+                fwp = fwp['firewall_policy']
+                with self.firewall_group(
+                        name='fwg1',
+                        ingress_firewall_policy_id=fwp['id'],
+                        tenant_id=fwp['tenant_id'],
+                        as_admin=True), \
+                        self.firewall_group(
+                            name='fwg2',
+                            egress_firewall_policy_id=fwp['id'],
+                            tenant_id=fwp['tenant_id'],
+                            as_admin=True) as fwg2:
+                    fwg2_id = fwg2['firewall_group']['id']
+                    project_id = fwp['tenant_id']
+                    self.assertEqual({}, self.db.get_pending_firewall_groups(
+                        ctx, project_id, rule_id=fwr['id']))
+
+                    self.db.update_firewall_group_status(
+                        ctx, fwg2_id, nl_constants.PENDING_UPDATE)
+                    expected = {fwg2_id: nl_constants.PENDING_UPDATE}
+                    self.assertEqual(expected,
+                                     self.db.get_pending_firewall_groups(
+                                         ctx, project_id,
+                                         policy_ids=[fwp['id']]))
+                    self.assertEqual(expected,
+                                     self.db.get_pending_firewall_groups(
+                                         ctx, project_id, rule_id=fwr['id']))
+                    self.assertEqual({}, self.db.get_pending_firewall_groups(
+                        ctx, 'other-project', rule_id=fwr['id']))
+                    self.assertEqual({}, self.db.get_pending_firewall_groups(
+                        ctx, project_id, rule_id=fwr['id'],
+                        queued_policy_ids=[fwp['id']]))
+                    self.db.update_firewall_group_status(
+                        ctx, fwg2_id, nl_constants.ACTIVE)
+
+    def test_update_firewall_groups_status_for_policies(self):
+        ctx = self._get_admin_context()
+        with self.port() as port, \
+                self.firewall_policy(as_admin=True) as fwp:
+            fwp_id = fwp['firewall_policy']['id']
+            with self.firewall_group(
+                    ingress_firewall_policy_id=fwp_id,
+                    tenant_id=fwp['firewall_policy']['tenant_id'],
+                    as_admin=True) as fwg:
+                fwg_id = fwg['firewall_group']['id']
+                self.db.add_firewall_group_port(ctx, fwg_id,
+                                                port['port']['id'])
+                self.db.update_firewall_group_status(
+                    ctx, fwg_id, nl_constants.PENDING_DELETE)
+                self.assertEqual(
+                    0, self.db.update_firewall_groups_status_for_policies(
+                        ctx, [fwp_id], nl_constants.ERROR,
+                        not_in=[nl_constants.PENDING_DELETE]))
+                self.assertEqual(
+                    nl_constants.PENDING_DELETE,
+                    self.db.get_firewall_group(ctx, fwg_id)['status'])
+                self.assertEqual(
+                    1, self.db.update_firewall_groups_status_for_policies(
+                        ctx, [fwp_id], nl_constants.ACTIVE))
+                self.db._delete_ports_in_firewall_group(ctx, fwg_id)
+
+    def test_get_firewall_groups_count(self):
+        ctx = self._get_admin_context()
+        with self.firewall_group(name='fwg1', tenant_id='tenant1',
+                                 as_admin=True), \
+                self.firewall_group(name='fwg2', tenant_id='tenant2',
+                                    as_admin=True):
+            self.assertEqual(1, self.plugin.get_firewall_groups_count(
+                ctx, filters={'tenant_id': ['tenant1'], 'name': ['fwg1']}))
+            self.assertEqual(0, self.plugin.get_firewall_groups_count(
+                ctx, filters={'tenant_id': ['tenant1'], 'name': ['fwg2']}))
+
     def test_update_firewall_group(self):
         name = "new_firewall1"
         attrs = self._get_test_firewall_group_attrs(name)
@@ -1679,6 +1861,122 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
                                   expected_code=webob.exc.HTTPOk.code,
                                   expected_body=attrs)
 
+    def _get_rule_positions(self, fwp_id):
+        ctx = self._get_admin_context()
+        query = ctx.session.query(
+            firewall_db_v2.FirewallPolicyRuleAssociation).filter_by(
+                firewall_policy_id=fwp_id)
+        return {fwpra.firewall_rule_id: fwpra.position for fwpra in query}
+
+    def test_insert_rule_keeps_other_rule_positions(self):
+        gap = firewall_db_v2.RULE_POSITION_GAP
+        with self.firewall_rule(name='fwr0', as_admin=True) as fwr0, \
+                self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                self.firewall_rule(name='fwr2', as_admin=True) as fwr2, \
+                self.firewall_rule(name='fwr3', as_admin=True) as fwr3:
+            fwr_ids = [fwr['firewall_rule']['id']
+                       for fwr in (fwr0, fwr1, fwr2, fwr3)]
+            with self.firewall_policy(firewall_rules=fwr_ids[:2],
+                                      as_admin=True) as fwp:
+                fwp_id = fwp['firewall_policy']['id']
+                self.assertEqual({fwr_ids[0]: gap, fwr_ids[1]: 2 * gap},
+                                 self._get_rule_positions(fwp_id))
+                self._rule_action('insert', fwp_id, fwr_ids[2],
+                                  insert_before=None,
+                                  insert_after=fwr_ids[0],
+                                  expected_code=webob.exc.HTTPOk.code)
+                self._rule_action('insert', fwp_id, fwr_ids[3],
+                                  insert_before=None,
+                                  insert_after=None,
+                                  expected_code=webob.exc.HTTPOk.code)
+                self.assertEqual({fwr_ids[3]: 0,
+                                  fwr_ids[0]: gap,
+                                  fwr_ids[2]: gap + gap // 2,
+                                  fwr_ids[1]: 2 * gap},
+                                 self._get_rule_positions(fwp_id))
+                self._rule_action('remove', fwp_id, fwr_ids[2],
+                                  expected_code=webob.exc.HTTPOk.code,
+                                  body_data={'firewall_rule_id': fwr_ids[2]})
+                self.assertEqual({fwr_ids[3]: 0,
+                                  fwr_ids[0]: gap,
+                                  fwr_ids[1]: 2 * gap},
+                                 self._get_rule_positions(fwp_id))
+
+    def test_insert_rules_at_top_without_renumbering(self):
+        with self.firewall_rule(name='fwr0', as_admin=True) as fwr0, \
+                self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                self.firewall_rule(name='fwr2', as_admin=True) as fwr2, \
+                mock.patch.object(firewall_db_v2, 'RULE_POSITION_GAP', 2), \
+                mock.patch.object(
+                    self.db, '_renumber_rule_associations') as renumber:
+            fwr_ids = [fwr['firewall_rule']['id']
+                       for fwr in (fwr0, fwr1, fwr2)]
+            with self.firewall_policy(firewall_rules=fwr_ids[:1],
+                                      as_admin=True) as fwp:
+                fwp_id = fwp['firewall_policy']['id']
+                for fwr_id in fwr_ids[1:]:
+                    self._rule_action('insert', fwp_id, fwr_id,
+                                      insert_before=None,
+                                      insert_after=None,
+                                      expected_code=webob.exc.HTTPOk.code)
+                self.assertEqual({fwr_ids[2]: -2, fwr_ids[1]: 0,
+                                  fwr_ids[0]: 2},
+                                 self._get_rule_positions(fwp_id))
+                renumber.assert_not_called()
+
+    def test_insert_rule_renumbers_when_no_gap_left(self):
+        with self.firewall_rule(name='fwr0', as_admin=True) as fwr0, \
+                self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                self.firewall_rule(name='fwr2', as_admin=True) as fwr2, \
+                self.firewall_rule(name='fwr3', as_admin=True) as fwr3, \
+                mock.patch.object(firewall_db_v2, 'RULE_POSITION_GAP', 2):
+            fwr_ids = [fwr['firewall_rule']['id']
+                       for fwr in (fwr0, fwr1, fwr2, fwr3)]
+            with self.firewall_policy(firewall_rules=fwr_ids[:2],
+                                      as_admin=True) as fwp:
+                fwp_id = fwp['firewall_policy']['id']
+                self._rule_action('insert', fwp_id, fwr_ids[2],
+                                  insert_before=fwr_ids[1],
+                                  insert_after=None,
+                                  expected_code=webob.exc.HTTPOk.code)
+                self.assertEqual({fwr_ids[0]: 2, fwr_ids[2]: 3,
+                                  fwr_ids[1]: 4},
+                                 self._get_rule_positions(fwp_id))
+                expected = self._get_test_firewall_policy_attrs()
+                expected.update(id=fwp_id, audited=False,
+                                firewall_rules=[fwr_ids[0], fwr_ids[3],
+                                                fwr_ids[2], fwr_ids[1]])
+                self._rule_action('insert', fwp_id, fwr_ids[3],
+                                  insert_before=fwr_ids[2],
+                                  insert_after=None,
+                                  expected_code=webob.exc.HTTPOk.code,
+                                  expected_body=expected)
+                self.assertEqual({fwr_ids[0]: 2, fwr_ids[3]: 3,
+                                  fwr_ids[2]: 4, fwr_ids[1]: 6},
+                                 self._get_rule_positions(fwp_id))
+
+    def test_insert_rule_retried_on_concurrent_policy_update(self):
+        ctx = self._get_admin_context()
+        process_rule_for_policy = self.db._process_rule_for_policy
+        calls = []
+
+        def _process_rule_for_policy(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise orm_exc.StaleDataError()
+            return process_rule_for_policy(*args)
+
+        with self.firewall_rule(name='fwr0', as_admin=True) as fwr, \
+                self.firewall_policy(as_admin=True) as fwp, \
+                mock.patch.object(self.db, '_process_rule_for_policy',
+                                  side_effect=_process_rule_for_policy):
+            fwr_id = fwr['firewall_rule']['id']
+            fwp_id = fwp['firewall_policy']['id']
+            fwp = self.plugin.insert_rule(ctx, fwp_id,
+                                          {'firewall_rule_id': fwr_id})
+            self.assertEqual([fwr_id], fwp['firewall_rules'])
+            self.assertEqual(2, len(calls))
+
     def test_remove_rule_and_not_associated(self):
         with self.firewall_rule(name='fwr0', as_admin=True) as fwr:
             with self.firewall_policy(name='firewall_policy2',
@@ -1813,3 +2111,212 @@ class TestFirewallDBPluginV2(test_fwaas_plugin_v2.FirewallPluginV2TestCase):
             default_fwg = self.plugin.get_firewall_group(ctx,
                                                          default_fwg['id'])
             self.assertEqual(sorted(port_ids), sorted(default_fwg['ports']))
+
+    def test_validate_ports_for_firewall_group_in_bulk(self):
+        ctx = self._get_nonadmin_context()
+        default_fwg = self._build_default_fwg(ctx=ctx)
+        port_args = {
+            'tenant_id': ctx.tenant_id,
+            'device_owner': 'compute:nova',
+            'binding:vif_type': 'ovs',
+        }
+        self.plugin._is_supported_l2_port = mock.Mock(
+            return_value=True)
+        core_plugin = self.plugin._core_plugin
+        with self.port(**port_args) as port1, \
+                self.port(**port_args) as port2, \
+                mock.patch.object(core_plugin, 'get_ports',
+                                  wraps=core_plugin.get_ports) as get_ports, \
+                mock.patch.object(core_plugin, 'get_port') as get_port:
+            port1_id = port1['port']['id']
+            port_ids = [port1_id, port2['port']['id']]
+
+            self.plugin.update_firewall_group(
+                ctx,
+                default_fwg['id'],
+                {'firewall_group': {'ports': port_ids}},
+            )
+            get_ports.assert_any_call(ctx, filters={'id': port_ids})
+            get_port.assert_not_called()
+            self.assertEqual(
+                {port1_id},
+                self.db.get_firewall_group_ports_in_use(
+                    ctx, [port1_id, 'other_port'], ctx.tenant_id))
+            self.assertEqual(
+                set(),
+                self.db.get_firewall_group_ports_in_use(
+                    ctx, [port1_id], ctx.tenant_id,
+                    exclude_id=default_fwg['id']))
+
+    def test_add_firewall_group_port(self):
+        ctx = self._get_nonadmin_context()
+        default_fwg = self._build_default_fwg(ctx=ctx)
+        port_args = {
+            'tenant_id': ctx.tenant_id,
+            'device_owner': 'compute:nova',
+            'binding:vif_type': 'ovs',
+        }
+        self.plugin._is_supported_l2_port = mock.Mock(
+            return_value=True)
+        with self.port(**port_args) as port1, \
+                self.port(**port_args) as port2, \
+                mock.patch.object(self.db,
+                                  '_delete_ports_in_firewall_group') as delete:
+            port1_id = port1['port']['id']
+            port2_id = port2['port']['id']
+            self.db.add_firewall_group_port(ctx, default_fwg['id'], port1_id)
+
+            fwg = self.plugin.add_firewall_group_port(
+                ctx, default_fwg['id'], port2_id)
+            delete.assert_not_called()
+            self.assertEqual(default_fwg['id'], fwg['id'])
+            self.assertNotIn('ports', fwg)
+            self.assertEqual(
+                sorted([port1_id, port2_id]),
+                sorted(self.db.get_ports_in_firewall_group(
+                    ctx, default_fwg['id'])))
+            self.assertRaises(f_exc.FirewallGroupPortInUse,
+                              self.db.add_firewall_group_port,
+                              ctx, default_fwg['id'], port1_id)
+
+    def test_add_firewall_group_port_logging_callback(self):
+        ctx = self._get_nonadmin_context()
+        default_fwg = self._build_default_fwg(ctx=ctx)
+        port_args = {
+            'tenant_id': ctx.tenant_id,
+            'device_owner': 'compute:nova',
+            'binding:vif_type': 'ovs',
+        }
+        self.plugin._is_supported_l2_port = mock.Mock(
+            return_value=True)
+        callback = fwg_callback.FirewallGroupCallBack(mock.Mock(),
+                                                      mock.Mock())
+        with self.port(**port_args) as port, \
+                mock.patch.object(driver_api.registry,
+                                  'publish') as publish, \
+                mock.patch.object(callback, 'need_to_notify',
+                                  return_value=True), \
+                mock.patch.object(callback, 'trigger_logging') as trigger:
+            port_id = port['port']['id']
+            self.plugin.add_firewall_group_port(ctx, default_fwg['id'],
+                                                port_id)
+            resource, event_type, trigger_obj = publish.call_args[0]
+            self.assertEqual(constants.FIREWALL_GROUP, resource)
+            callback.handle_event(resource, event_type, trigger_obj,
+                                  **publish.call_args[1])
+            trigger.assert_called_once_with(ctx, default_fwg['id'],
+                                            {port_id})
+
+    def _bulk_create_firewall_rules(self, rules, expected_res_status):
+        data = {'firewall_rules': [{'firewall_rule': rule} for rule in rules]}
+        req = self.new_create_request('firewall_rules', data, self.fmt,
+                                      as_admin=True)
+        res = req.get_response(self.ext_api)
+        self.assertEqual(expected_res_status, res.status_int)
+        return self.deserialize(self.fmt, res)
+
+    def test_create_firewall_rule_bulk(self):
+        rules = []
+        for i in range(3):
+            rule = self._get_test_firewall_rule_attrs(name='rule%d' % i)
+            del rule['project_id']
+            rules.append(rule)
+        with mock.patch.object(self.db, 'create_firewall_rule') as create:
+            res = self._bulk_create_firewall_rules(
+                rules, webob.exc.HTTPCreated.code)
+            create.assert_not_called()
+        self.assertEqual(['rule0', 'rule1', 'rule2'],
+                         [rule['name'] for rule in res['firewall_rules']])
+        ctx = self._get_admin_context()
+        self.assertEqual(3, self.db.get_firewall_rules_count(ctx))
+
+    def test_create_firewall_rule_bulk_rollback(self):
+        rules = []
+        for i in range(3):
+            rule = self._get_test_firewall_rule_attrs(name='rule%d' % i)
+            del rule['project_id']
+            rules.append(rule)
+        # the port ranges of an ICMP rule are invalid
+        rules[2]['protocol'] = 'icmp'
+        self._bulk_create_firewall_rules(rules,
+                                         webob.exc.HTTPBadRequest.code)
+        ctx = self._get_admin_context()
+        self.assertEqual(0, self.db.get_firewall_rules_count(ctx))
+
+    def test_create_firewall_policy_bulk(self):
+        with self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                self.firewall_rule(name='fwr2', as_admin=True) as fwr2:
+            fwr_ids = [fwr1['firewall_rule']['id'],
+                       fwr2['firewall_rule']['id']]
+            data = {'firewall_policies': [
+                {'firewall_policy': {'name': 'fwp1',
+                                     'firewall_rules': fwr_ids}},
+                {'firewall_policy': {'name': 'fwp2',
+                                     'firewall_rules': fwr_ids[::-1]}}]}
+            req = self.new_create_request('firewall_policies', data,
+                                          self.fmt, as_admin=True)
+            with mock.patch.object(self.db,
+                                   'create_firewall_policy') as create, \
+                    mock.patch.object(
+                        self.db, '_check_rules_for_policy_is_valid') as check:
+                res = req.get_response(self.ext_api)
+                create.assert_not_called()
+                check.assert_not_called()
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            fwps = self.deserialize(self.fmt, res)['firewall_policies']
+            self.assertEqual([fwr_ids, fwr_ids[::-1]],
+                             [fwp['firewall_rules'] for fwp in fwps])
+            for fwp in fwps:
+                self.assertEqual(
+                    fwp['firewall_rules'],
+                    self.db.get_firewall_policy(
+                        self._get_admin_context(),
+                        fwp['id'])['firewall_rules'])
+                self._delete('firewall_policies', fwp['id'], as_admin=True)
+
+    def test_create_firewall_group_bulk(self):
+        ctx = self._get_admin_context()
+        with self.port(device_owner='compute:nova') as port1, \
+                self.port(device_owner='compute:nova') as port2:
+            port_ids = [port1['port']['id'], port2['port']['id']]
+            self.plugin._is_supported_l2_port = mock.Mock(return_value=True)
+            data = {'firewall_groups': [
+                {'firewall_group': {'name': 'fwg%d' % i, 'ports': [port_id],
+                                    'tenant_id': self._tenant_id}}
+                for i, port_id in enumerate(port_ids)]}
+            req = self.new_create_request('firewall_groups', data, self.fmt,
+                                          as_admin=True)
+            with mock.patch.object(self.db,
+                                   'create_firewall_group') as create:
+                res = req.get_response(self.ext_api)
+                create.assert_not_called()
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            fwgs = self.deserialize(self.fmt, res)['firewall_groups']
+            self.assertEqual([[port_id] for port_id in port_ids],
+                             [fwg['ports'] for fwg in fwgs])
+            for fwg in fwgs:
+                self.assertEqual(
+                    fwg['ports'],
+                    self.db.get_ports_in_firewall_group(ctx, fwg['id']))
+                req = self.new_update_request(
+                    'firewall_groups', {'firewall_group': {'ports': []}},
+                    fwg['id'], as_admin=True)
+                req.get_response(self.ext_api)
+                self._delete('firewall_groups', fwg['id'], as_admin=True)
+
+    def test_create_firewall_group_bulk_same_port(self):
+        ctx = self._get_admin_context()
+        with self.port(device_owner='compute:nova') as port:
+            port_id = port['port']['id']
+            self.plugin._is_supported_l2_port = mock.Mock(return_value=True)
+            data = {'firewall_groups': [
+                {'firewall_group': {'name': 'fwg%d' % i, 'ports': [port_id],
+                                    'tenant_id': self._tenant_id}}
+                for i in range(2)]}
+            req = self.new_create_request('firewall_groups', data, self.fmt,
+                                          as_admin=True)
+            res = req.get_response(self.ext_api)
+            self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+            self.assertEqual(
+                [], self.db.get_firewall_groups(
+                    ctx, filters={'name': ['fwg0', 'fwg1']}))
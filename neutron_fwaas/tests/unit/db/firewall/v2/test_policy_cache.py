@@ -0,0 +1,113 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import threading
+from unittest import mock
+
+from neutron.tests import base
+
+from neutron_fwaas.db.firewall.v2 import policy_cache
+
+
+class TestPolicyRulesCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPolicyRulesCache, self).setUp()
+        self.cache = policy_cache.PolicyRulesCache(max_policies=2)
+        self.rules = [{'id': 'rule1', 'action': 'allow'}]
+
+    def test_get_revision_match(self):
+        self.cache.set('policy1', 3, self.rules)
+        self.assertEqual(self.rules, self.cache.get('policy1', 3))
+        self.assertIsNone(self.cache.get('policy1', 4))
+        self.assertIsNone(self.cache.get('policy2', 3))
+        stats = self.cache.get_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertAlmostEqual(1.0 / 3, stats['hit_rate'])
+
+    def test_report_stats(self):
+        self.cache.set('policy1', 3, self.rules)
+        with mock.patch.object(policy_cache.LOG, 'debug') as debug:
+            self.cache.get('policy1', 3)
+            debug.assert_not_called()
+            self.cache._reported_at -= policy_cache.STATS_INTERVAL
+            self.cache.get('policy1', 3)
+            debug.assert_called_once_with(mock.ANY, {
+                'policies': 1, 'hits': 1, 'misses': 0, 'hit_rate': 1.0,
+                'memory': mock.ANY})
+
+    def test_get_returns_copy(self):
+        self.cache.set('policy1', 1, self.rules)
+        self.cache.get('policy1', 1)[0]['action'] = 'deny'
+        self.assertEqual('allow', self.cache.get('policy1', 1)[0]['action'])
+
+    def test_invalidate(self):
+        self.cache.set('policy1', 1, self.rules)
+        self.cache.set('policy2', 1, [])
+        self.cache.invalidate(['policy1', 'unknown'])
+        self.assertIsNone(self.cache.get('policy1', 1))
+        self.assertIsNone(self.cache.get_latest('policy1'))
+        self.assertEqual([], self.cache.get('policy2', 1))
+        self.cache.clear()
+        self.assertEqual(0, self.cache.get_stats()['memory'])
+
+    def test_get_latest(self):
+        new_rules = [{'id': 'rule1', 'action': 'deny'}]
+        self.cache.set('policy1', 1, self.rules)
+        self.assertEqual((1, self.rules, None),
+                         self.cache.get_latest('policy1'))
+        self.cache.invalidate(['policy1'])
+        self.cache.set('policy1', 2, new_rules)
+        self.assertEqual((2, new_rules, (1, self.rules)),
+                         self.cache.get_latest('policy1'))
+        self.cache.set('policy1', 2, new_rules)
+        self.assertEqual((2, new_rules, (1, self.rules)),
+                         self.cache.get_latest('policy1'))
+        self.cache.invalidate(['policy1'])
+        self.cache.set('policy1', 3, self.rules)
+        self.assertEqual((3, self.rules, (2, new_rules)),
+                         self.cache.get_latest('policy1'))
+
+    def test_set_evicts_least_recently_used(self):
+        self.cache.set('policy1', 1, self.rules)
+        self.cache.set('policy2', 1, self.rules)
+        self.cache.get('policy1', 1)
+        self.cache.set('policy3', 1, self.rules)
+        self.assertIsNone(self.cache.get('policy2', 1))
+        self.assertIsNotNone(self.cache.get('policy1', 1))
+        self.assertEqual(2, self.cache.get_stats()['policies'])
+
+    def test_concurrent_access(self):
+        def _use_cache(thread):
+            for i in range(500):
+                policy_id = 'policy%d' % (i % 5)
+                self.cache.set(policy_id, thread, self.rules)
+                self.cache.get(policy_id, thread)
+                self.cache.get_latest(policy_id)
+                self.cache.invalidate([policy_id])
+
+        threads = [threading.Thread(target=_use_cache, args=(thread,))
+                   for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.cache.get_stats()
+        self.assertEqual(2, stats['policies'])
+        self.assertEqual(2000, stats['hits'] + stats['misses'])
+        self.assertEqual(sum(self.cache._entry_memory(entry)
+                             for entry in self.cache._entries.values()),
+                         stats['memory'])
@@ -519,3 +519,90 @@ class IptablesFwaasTestCase(base.BaseTestCase):
             self.firewall.conntrack.delete_entries.assert_called_once_with(
                 rules_changed, namespace
             )
+
+    def test_defer_apply(self):
+        apply_list = self._fake_apply_list(router_count=2)
+        firewall = self._fake_firewall_no_rule()
+        with self.firewall.defer_apply():
+            self.firewall.create_firewall_group(FW_LEGACY, apply_list,
+                                                firewall)
+            self.firewall.update_firewall_group(FW_LEGACY, apply_list,
+                                                firewall)
+            for router_info_inst, port_ids in apply_list:
+                router_info_inst.iptables_manager.defer_apply_off.\
+                    assert_not_called()
+        for router_info_inst, port_ids in apply_list:
+            router_info_inst.iptables_manager.defer_apply_off.\
+                assert_called_once_with()
+
+    def test_defer_apply_failure(self):
+        apply_list = self._fake_apply_list()
+        ipt_mgr = apply_list[0][0].iptables_manager
+        ipt_mgr.defer_apply_off.side_effect = RuntimeError()
+        firewall = self._fake_firewall_no_rule()
+
+        def _create():
+            with self.firewall.defer_apply():
+                self.firewall.create_firewall_group(FW_LEGACY, apply_list,
+                                                    firewall)
+
+        self.assertRaises(fwaas.fw_ext.FirewallInternalDriverError, _create)
+        self.assertIsNone(self.firewall._deferred_ipt_mgrs)
+
+    def _fake_audit_router(self, live_rules):
+        bname = 'neutron-l3-agent'
+        chain = 'iv4%s' % _uuid()[:8]
+        compiled_rules = [
+            fwaas.iptables_manager.IptablesRule(
+                chain, '-j %s-accepted' % bname, binary_name=bname),
+            fwaas.iptables_manager.IptablesRule(
+                'FORWARD', '-o qr-1 -j %s-%s' % (bname, chain),
+                binary_name=bname),
+            fwaas.iptables_manager.IptablesRule(
+                'FORWARD', '-j %s-local' % bname, binary_name=bname,
+                top=True)]
+        router_info_inst = self._fake_apply_list()[0][0]
+        ipt_mgr = router_info_inst.iptables_manager
+        ipt_mgr.iptables_apply_deferred = False
+        ipt_mgr.use_ipv6 = False
+        ipt_mgr.wrap_name = bname
+        ipt_mgr.namespace = 'qrouter-fake'
+        ipt_mgr.ipv4['filter'].rules = compiled_rules
+        ipt_mgr.execute.return_value = '\n'.join(
+            ['*filter', ':%s-%s - [0:0]' % (bname, chain)] +
+            [rule % {'bname': bname, 'chain': chain}
+             for rule in live_rules] +
+            ['COMMIT'])
+        return router_info_inst
+
+    def test_audit_router_in_sync(self):
+        router_info_inst = self._fake_audit_router([
+            '-A %(bname)s-FORWARD -j %(bname)s-local',
+            '-A %(bname)s-%(chain)s -j %(bname)s-accepted',
+            '-A %(bname)s-FORWARD -j %(bname)s-scope',
+            '-A %(bname)s-FORWARD -o qr-1 -j %(bname)s-%(chain)s'])
+        self.assertFalse(
+            self.firewall.audit_router(FW_LEGACY, router_info_inst))
+        ipt_mgr = router_info_inst.iptables_manager
+        ipt_mgr.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'qrouter-fake',
+             'iptables-save', '-t', 'filter'],
+            run_as_root=True, privsep_exec=True)
+        ipt_mgr.defer_apply_off.assert_not_called()
+
+    def test_audit_router_drifted(self):
+        router_info_inst = self._fake_audit_router([
+            '-A %(bname)s-FORWARD -j %(bname)s-local',
+            '-A %(bname)s-%(chain)s -j %(bname)s-accepted'])
+        self.assertTrue(
+            self.firewall.audit_router(FW_LEGACY, router_info_inst))
+        router_info_inst.iptables_manager.defer_apply_off.\
+            assert_called_once_with()
+
+    def test_audit_router_apply_deferred(self):
+        router_info_inst = self._fake_audit_router([])
+        ipt_mgr = router_info_inst.iptables_manager
+        ipt_mgr.iptables_apply_deferred = True
+        self.assertFalse(
+            self.firewall.audit_router(FW_LEGACY, router_info_inst))
+        ipt_mgr.execute.assert_not_called()
@@ -69,8 +69,9 @@ class TestFWaasV2AgentExtension(TestFWaasV2AgentExtensionBase):
         self.driver.assert_called_with('neutron.agent.l2.firewall_drivers',
                                        'ovs')
         conn.assert_called_with()
-        self.l2.conn.create_consumer.assert_called_with(
-            consts.FW_AGENT, [self.l2], fanout=False)
+        self.l2.conn.create_consumer.assert_has_calls([
+            mock.call(consts.FW_AGENT, [self.l2], fanout=False),
+            mock.call(consts.FW_AGENT_L2, [self.l2], fanout=False)])
         self.l2.conn.consume_in_threads.assert_called_with()
 
 
@@ -686,6 +687,15 @@ class TestFWaaSL2PluginApi(TestFWaasV2AgentExtensionBase):
             port_id=mock.ANY
         )
 
+    def test_get_firewall_groups_for_ports(self):
+        self.plugin.get_firewall_groups_for_ports(self.ctx, mock.ANY)
+        self.plugin.client.prepare.assert_called_with(version='1.3')
+        self.cctxt.call.assert_called_once_with(
+            self.ctx,
+            'get_firewall_groups_for_ports',
+            port_ids=mock.ANY
+        )
+
     def test_set_firewall_group_status(self):
         self.plugin.set_firewall_group_status(
             self.ctx, self.fwg_id, 'ACTIVE', self.host)
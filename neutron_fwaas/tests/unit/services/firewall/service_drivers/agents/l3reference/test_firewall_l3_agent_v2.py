@@ -491,17 +491,19 @@ class TestFWaaSL3AgentExtension(base.BaseTestCase):
             agent.conf.agent_mode = mock.Mock()
             agent.fwaas_driver = iptables_fwaas_v2.IptablesFwaasDriver()
             with mock.patch.object(agent.fwplugin_rpc,
-                                   'get_firewall_groups_for_project'
-                                   ) as mock_get_firewall_groups_for_project, \
+                                   'get_firewall_groups_for_router'
+                                   ) as mock_get_firewall_groups_for_router, \
                     mock.patch.object(agent.agent_api,
                                       'get_router_hosting_port'
                                       ) as mock_get_router_hosting_port, \
                     mock.patch.object(agent.fwaas_driver,
                                       '_get_ipt_mgrs_with_if_prefix'
                                       ) as mock_get_ipt_mgrs_with_if_prefix:
-                mock_get_firewall_groups_for_project.return_value = [fwg]
+                mock_get_firewall_groups_for_router.return_value = [fwg]
                 mock_get_router_hosting_port.return_value = mock.Mock()
                 agent.add_router(self.context, updated_router)
+                mock_get_firewall_groups_for_router.assert_called_once_with(
+                    mock.ANY, ['1'])
                 mock_get_ipt_mgrs_with_if_prefix.assert_any_call(
                     agent.conf.agent_mode, mock.ANY)
 
@@ -546,15 +548,17 @@ class TestFWaaSL3AgentExtension(base.BaseTestCase):
         agent.conf.agent_mode = mock.Mock()
         agent.fwaas_driver = iptables_fwaas_v2.IptablesFwaasDriver()
 
-        patch_project = mock.patch.object(
-            agent.fwplugin_rpc, 'get_firewall_groups_for_project')
+        patch_router = mock.patch.object(
+            agent.fwplugin_rpc, 'get_firewall_groups_for_router')
         patch_invoke = mock.patch.object(
             agent, '_invoke_driver_for_sync_from_plugin')
 
-        with patch_project as mock_get_firewall_groups, \
+        with patch_router as mock_get_firewall_groups, \
                 patch_invoke as mock_invoke_driver:
             mock_get_firewall_groups.return_value = [fwg1, fwg2]
             agent.add_router(self.context, updated_router)
+            mock_get_firewall_groups.assert_called_once_with(
+                mock.ANY, ['1', '2', '3'])
 
             # Check that mock_invoke_driver was called exactly twice with
             # correct arguments.
@@ -563,6 +567,22 @@ class TestFWaaSL3AgentExtension(base.BaseTestCase):
                 mock.call(mock.ANY, {'2'}, fwg2),
             ], mock_invoke_driver.call_args_list)
 
+    def test_add_router_without_interfaces(self):
+        fw_agent = _setup_test_agent_class([fwaas_constants.FIREWALL])
+        cfg.CONF.set_override('enabled', True, 'fwaas')
+        new_router = {
+            'tenant_id': 'demo_tenant_id',
+            'id': '0b109a4e-d228-479d-ad43-08bf3245adbb',
+            'name': 'demo_router'
+        }
+        with mock.patch('oslo_utils.importutils.import_object'):
+            agent = fw_agent(cfg.CONF)
+            agent.agent_api = mock.Mock()
+            agent.fwplugin_rpc = mock.Mock()
+            agent.add_router(self.context, new_router)
+            agent.fwplugin_rpc.get_firewall_groups_for_router.\
+                assert_not_called()
+
     def test_add_router(self):
         fw_agent = _setup_test_agent_class([fwaas_constants.FIREWALL])
         cfg.CONF.set_override('enabled', True, 'fwaas')
@@ -612,3 +632,156 @@ class TestFWaaSL3AgentExtension(base.BaseTestCase):
                                    ) as mock_process_router_update:
                 agent.update_router(self.context, updated_router)
                 mock_process_router_update.assert_called_with(updated_router)
+
+    def test_audit_next_routers(self):
+        fw_agent = _setup_test_agent_class([fwaas_constants.FIREWALL])
+        cfg.CONF.set_override('enabled', True, 'fwaas')
+        cfg.CONF.set_override('audit_max_routers', 2, 'fwaas')
+        with mock.patch('oslo_utils.importutils.import_object'):
+            agent = fw_agent(cfg.CONF)
+        agent.agent_api = mock.Mock()
+        agent.agent_api.get_router_info.side_effect = (
+            lambda router_id: None if router_id == 'router2' else router_id)
+        agent.fwaas_driver = mock.Mock()
+        agent.fwaas_driver.audit_router.side_effect = [True, Exception(),
+                                                       False]
+        with mock.patch.object(agent, '_process_router_update'):
+            for router_id in ('router1', 'router2', 'router3', 'router4'):
+                agent.add_router(self.context, {'id': router_id})
+        agent.delete_router(self.context, {'id': 'router4'})
+
+        agent._audit_next_routers()
+        agent._audit_next_routers()
+
+        self.assertEqual([
+            mock.call(agent.conf.agent_mode, 'router1'),
+            mock.call(agent.conf.agent_mode, 'router3'),
+            mock.call(agent.conf.agent_mode, 'router1'),
+        ], agent.fwaas_driver.audit_router.call_args_list)
+        self.assertEqual(['router3', 'router1'], list(agent._audit_routers))
+
+    def _setup_startup_bulk_sync_agent(self):
+        fw_agent = _setup_test_agent_class([fwaas_constants.FIREWALL])
+        cfg.CONF.set_override('enabled', True, 'fwaas')
+        cfg.CONF.set_override('startup_bulk_sync', True, 'fwaas')
+        with mock.patch('oslo_utils.importutils.import_object'), \
+                mock.patch.object(firewall_l3_agent_v2.loopingcall,
+                                  'FixedIntervalLoopingCall'):
+            agent = fw_agent(cfg.CONF)
+        agent.agent_api = mock.Mock()
+        agent.fwplugin_rpc = mock.Mock()
+        agent.conf.agent_mode = mock.Mock()
+        agent.fwaas_driver = test_firewall_agent_api.NoopFwaasDriverV2()
+        return agent
+
+    def _get_router(self, router_id, project_id, port_ids):
+        return {
+            '_interfaces': [{'device_owner': 'network: router_interface',
+                             'id': port_id,
+                             'tenant_id': project_id}
+                            for port_id in port_ids],
+            'tenant_id': project_id,
+            'id': router_id,
+        }
+
+    def test_add_router_startup_bulk_sync_deferred(self):
+        agent = self._setup_startup_bulk_sync_agent()
+        router = self._get_router('router1', 'project1', ['1'])
+        with mock.patch.object(agent,
+                               '_process_router_update'
+                               ) as mock_process_router_update:
+            agent.add_router(self.context, router)
+            agent.update_router(self.context, router)
+            mock_process_router_update.assert_not_called()
+        self.assertEqual({'router1': router}, agent._startup_routers)
+        agent.fwplugin_rpc.get_firewall_groups_for_project.assert_not_called()
+
+    def test_update_router_startup_bulk_sync(self):
+        agent = self._setup_startup_bulk_sync_agent()
+        router1 = self._get_router('router1', 'project1', ['1'])
+        router2 = self._get_router('router2', 'project1', ['2'])
+        agent.add_router(self.context, router1)
+        last_added_at = agent._startup_last_added_at
+        updated_router1 = self._get_router('router1', 'project1', ['1', '3'])
+        with mock.patch.object(agent,
+                               '_process_router_update'
+                               ) as mock_process_router_update:
+            # an update refreshes a gathered router without postponing the
+            # sync, the routers not gathered are processed right away
+            agent.update_router(self.context, updated_router1)
+            agent.update_router(self.context, router2)
+            mock_process_router_update.assert_called_once_with(router2)
+        self.assertEqual({'router1': updated_router1},
+                         agent._startup_routers)
+        self.assertEqual(last_added_at, agent._startup_last_added_at)
+
+    def test_check_startup_routers_max_duration(self):
+        agent = self._setup_startup_bulk_sync_agent()
+        agent.add_router(self.context,
+                         self._get_router('router1', 'project1', ['1']))
+        with mock.patch.object(agent,
+                               '_process_startup_routers') as mock_process:
+            agent._check_startup_routers()
+            mock_process.assert_not_called()
+
+            # routers still being added do not postpone the sync past the
+            # maximum duration
+            agent._startup_started_at -= (
+                cfg.CONF.fwaas.startup_bulk_sync_max_duration)
+            self.assertRaises(firewall_l3_agent_v2.loopingcall.LoopingCallDone,
+                              agent._check_startup_routers)
+            mock_process.assert_called_once_with()
+
+    def test_process_startup_routers(self):
+        agent = self._setup_startup_bulk_sync_agent()
+        router1 = self._get_router('router1', 'project1', ['1', '2'])
+        router2 = self._get_router('router2', 'project2', ['3'])
+        router3 = self._get_router('router3', 'project2', ['4'])
+        fwg1 = {'id': 'fwg1', 'status': 'ACTIVE', 'admin_state_up': True,
+                'tenant_id': 'project1', 'add-port-ids': ['1', '2'],
+                'del-port-ids': []}
+        fwg2 = {'id': 'fwg2', 'status': 'ACTIVE', 'admin_state_up': True,
+                'tenant_id': 'project2', 'add-port-ids': ['3', '4'],
+                'del-port-ids': []}
+        agent.fwplugin_rpc.get_firewall_groups_for_projects.return_value = {
+            'project1': [fwg1], 'project2': [fwg2]}
+        for router in (router1, router2, router3):
+            agent.add_router(self.context, router)
+        agent.delete_router(self.context, {'id': 'router3'})
+
+        with mock.patch.object(agent.fwaas_driver,
+                               'defer_apply') as mock_defer_apply, \
+                mock.patch.object(agent,
+                                  '_invoke_driver_for_sync_from_plugin'
+                                  ) as mock_invoke_driver:
+            agent._process_startup_routers()
+
+        agent.fwplugin_rpc.get_firewall_groups_for_projects.\
+            assert_called_once_with(mock.ANY, ['project1', 'project2'])
+        agent.fwplugin_rpc.get_firewall_groups_for_project.assert_not_called()
+        mock_defer_apply.assert_called_once_with()
+        self.assertEqual([
+            mock.call(mock.ANY, {'1', '2'}, fwg1),
+            mock.call(mock.ANY, {'3'}, fwg2),
+        ], mock_invoke_driver.call_args_list)
+        self.assertFalse(agent.startup_bulk_sync)
+        self.assertIsNotNone(agent.startup_sync_duration)
+
+        # Once the startup bulk sync is over, routers are processed directly
+        with mock.patch.object(agent,
+                               '_process_router_update'
+                               ) as mock_process_router_update:
+            agent.add_router(self.context, router3)
+            mock_process_router_update.assert_called_once_with(router3)
+
+    def test_process_startup_routers_rpc_failure(self):
+        agent = self._setup_startup_bulk_sync_agent()
+        router = self._get_router('router1', 'project1', ['1'])
+        agent.add_router(self.context, router)
+        agent.fwplugin_rpc.get_firewall_groups_for_projects.side_effect = (
+            Exception())
+        with mock.patch.object(agent,
+                               '_process_router_update'
+                               ) as mock_process_router_update:
+            agent._process_startup_routers()
+            mock_process_router_update.assert_called_once_with(router)
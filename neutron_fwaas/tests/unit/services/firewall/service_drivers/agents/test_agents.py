@@ -17,17 +17,24 @@ from unittest import mock
 
 from neutron.conf import common as common_conf
 from neutron import extensions as neutron_extensions
+from neutron import service
 from neutron.tests.unit.extensions import test_l3
 from neutron_lib import constants as nl_constants
 from neutron_lib import context
 from neutron_lib.db import api as db_api
+from neutron_lib import exceptions as n_exc
 from neutron_lib.exceptions import firewall_v2 as f_exc
 from neutron_lib.plugins import directory
 from oslo_config import cfg
 
 from neutron_fwaas._i18n import _
+from neutron_fwaas.common import fwaas_constants as constants
+from neutron_fwaas.common import rule_schema
 from neutron_fwaas.db.firewall.v2.firewall_db_v2 import FirewallGroup
+from neutron_fwaas.services.firewall import fwaas_plugin_v2
 from neutron_fwaas.services.firewall.service_drivers.agents import agents
+from neutron_fwaas.services.firewall.service_drivers.agents import \
+    notification_queue
 from neutron_fwaas.tests import base
 from neutron_fwaas.tests.unit.services.firewall import test_fwaas_plugin_v2
 
@@ -89,6 +96,36 @@ class TestFirewallAgentApi(base.BaseTestCase):
     def test_delete_firewall_group(self):
         self._call_test_helper('delete_firewall_group')
 
+    def test_update_firewall_group_versioned(self):
+        with mock.patch.object(self.api.client, 'cast') as rpc_mock, \
+                mock.patch.object(self.api.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = self.api.client
+            self.api.update_firewall_group(mock.sentinel.context, 'test',
+                                           version='1.1')
+
+        prepare_mock.assert_called_once_with(fanout=True, version='1.1')
+        rpc_mock.assert_called_once_with(mock.sentinel.context,
+                                         'update_firewall_group',
+                                         firewall_group='test', host='host')
+
+    def test_update_firewall_group_host_targeted(self):
+        agent_hosts = {'topic_l3': ['host1', 'host2'], 'topic_l2': ['host3']}
+        with mock.patch.object(self.api.client, 'cast') as rpc_mock, \
+                mock.patch.object(self.api.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = self.api.client
+            self.api.update_firewall_group(mock.sentinel.context, 'test',
+                                           agent_hosts=agent_hosts)
+
+        self.assertEqual([
+            mock.call(topic='topic_l2', server='host3'),
+            mock.call(topic='topic_l3', server='host1'),
+            mock.call(topic='topic_l3', server='host2'),
+        ], prepare_mock.call_args_list)
+        self.assertEqual(3, rpc_mock.call_count)
+        rpc_mock.assert_called_with(mock.sentinel.context,
+                                    'update_firewall_group',
+                                    firewall_group='test', host='host')
+
 
 class TestAgentDriver(test_fwaas_plugin_v2.FirewallPluginV2TestCase,
                       test_l3.L3NatTestCaseMixin):
@@ -135,6 +172,80 @@ class TestAgentDriver(test_fwaas_plugin_v2.FirewallPluginV2TestCase,
         return super(TestAgentDriver, self)._get_test_firewall_group_attrs(
             name, status=status)
 
+    def test_dedicated_rpc_workers(self):
+        cfg.CONF.set_override('rpc_workers', 2, 'fwaas')
+        plugin = fwaas_plugin_v2.FirewallPluginV2()
+        rpc_workers = [worker for worker in plugin.get_workers()
+                       if isinstance(worker, service.RpcWorker)]
+        self.assertEqual(1, len(rpc_workers))
+        self.assertIsInstance(rpc_workers[0],
+                              fwaas_plugin_v2.FirewallRpcWorker)
+        self.assertEqual(2, rpc_workers[0].worker_process_count)
+        with mock.patch.object(plugin.driver,
+                               'start_rpc_listener') as start_rpc_listener:
+            self.assertEqual([], plugin.start_rpc_listeners())
+            start_rpc_listener.assert_not_called()
+            self.assertEqual(start_rpc_listener.return_value,
+                             plugin.start_fwaas_rpc_listeners())
+
+    def test_get_fwg_agent_hosts(self):
+        cfg.CONF.set_override('host_targeted_notifications', True, 'fwaas')
+        port_details = {
+            'port1': {'device_owner': nl_constants.DEVICE_OWNER_ROUTER_INTF,
+                      'device_id': 'router1'},
+            'port2': {'device_owner': nl_constants.DEVICE_OWNER_DVR_INTERFACE,
+                      'device_id': 'router2'},
+            'port3': {'device_owner': 'compute:nova',
+                      'device_id': 'vm1',
+                      'host': 'compute1'},
+        }
+        router_hosts = {'router1': ['network1'],
+                        'router2': ['network1', 'compute2']}
+        l3_plugin = mock.Mock()
+        l3_plugin.get_hosts_to_notify.side_effect = (
+            lambda ctx, router_id: router_hosts[router_id])
+        with mock.patch.object(agents.directory, 'get_plugin',
+                               return_value=l3_plugin):
+            agent_hosts = self.plugin.driver._get_fwg_agent_hosts(
+                self._self_context, port_details)
+
+        self.assertEqual(
+            {constants.FW_AGENT_L3: ['compute2', 'network1'],
+             constants.FW_AGENT_L2: ['compute1']}, agent_hosts)
+
+    def test_get_fwg_agent_hosts_fanout(self):
+        self.assertIsNone(self.plugin.driver._get_fwg_agent_hosts(
+            self._self_context, {}))
+
+    def test_get_fwg_port_details(self):
+        core_plugin = self.plugin.driver._core_plugin
+        with self.port(device_owner='compute:nova') as port1, \
+                self.port() as port2, \
+                mock.patch.object(core_plugin, 'get_ports',
+                                  wraps=core_plugin.get_ports) as get_ports:
+            port_id1 = port1['port']['id']
+            port_id2 = port2['port']['id']
+            port_details = self.plugin.driver._get_fwg_port_details(
+                context.get_admin_context(), [port_id1, port_id2])
+
+        get_ports.assert_called_once_with(
+            mock.ANY, filters={'id': mock.ANY},
+            fields=agents.PORT_DETAILS_FIELDS)
+        self.assertEqual({port_id1, port_id2}, set(port_details))
+        self.assertEqual('compute:nova',
+                         port_details[port_id1]['device_owner'])
+        self.assertIn('host', port_details[port_id1])
+        self.assertNotIn('host', port_details[port_id2])
+        self.assertEqual(port2['port']['network_id'],
+                         port_details[port_id2]['network_id'])
+        self.assertEqual(port2['port']['fixed_ips'],
+                         port_details[port_id2]['fixed_ips'])
+
+    def test_get_fwg_port_details_port_not_found(self):
+        self.assertRaises(
+            n_exc.PortNotFound, self.plugin.driver._get_fwg_port_details,
+            context.get_admin_context(), ['unknown'])
+
     def test_set_firewall_group_status(self):
         ctx = context.get_admin_context()
         with self.firewall_policy(as_admin=True) as fwp:
@@ -237,6 +348,159 @@ class TestAgentDriver(test_fwaas_plugin_v2.FirewallPluginV2TestCase,
                 fwg_db = self.db._get_firewall_group(ctx, fwg_id)
                 self.assertEqual(nl_constants.ERROR, fwg_db['status'])
 
+    def test_get_firewall_groups_for_project(self):
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id1 = body['port_id']
+            with self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                    self.firewall_rule(name='fwr2', as_admin=True) as fwr2:
+                fwr_ids = [fwr2['firewall_rule']['id'],
+                           fwr1['firewall_rule']['id']]
+                with self.firewall_policy(firewall_rules=fwr_ids,
+                                          as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            ingress_firewall_policy_id=fwp_id,
+                            egress_firewall_policy_id=fwp_id,
+                            ports=[port_id1],
+                            admin_state_up=self.ADMIN_STATE_UP) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        observed = (
+                            self.callbacks.get_firewall_groups_for_project(
+                                self._self_context))
+
+        fwgs = {fwg['id']: fwg for fwg in observed}
+        self.assertIn(fwg_id, fwgs)
+        self.assertEqual(fwr_ids,
+                         [r['id'] for r in fwgs[fwg_id]['ingress_rule_list']])
+        self.assertEqual(fwr_ids,
+                         [r['id'] for r in fwgs[fwg_id]['egress_rule_list']])
+        self.assertEqual([port_id1], fwgs[fwg_id]['add-port-ids'])
+        self.assertEqual([], fwgs[fwg_id]['del-port-ids'])
+        for fwg in observed:
+            self.assertEqual(self._tenant_id, fwg['tenant_id'])
+
+    def test_get_firewall_groups_for_projects(self):
+        ctx = context.get_admin_context()
+        with self.firewall_rule(as_admin=True) as fwr:
+            with self.firewall_policy(
+                    firewall_rules=[fwr['firewall_rule']['id']],
+                    as_admin=True) as fwp:
+                fwp_id = fwp['firewall_policy']['id']
+                with self.firewall_group(
+                        ingress_firewall_policy_id=fwp_id,
+                        admin_state_up=self.ADMIN_STATE_UP) as fwg:
+                    fwg_id = fwg['firewall_group']['id']
+                    observed = self.callbacks.get_firewall_groups_for_projects(
+                        ctx, [self._tenant_id, 'other_project'])
+
+        self.assertEqual([], observed['other_project'])
+        fwgs = {fwg['id']: fwg for fwg in observed[self._tenant_id]}
+        self.assertIn(fwg_id, fwgs)
+        self.assertEqual([fwr['firewall_rule']['id']],
+                         [r['id'] for r in fwgs[fwg_id]['ingress_rule_list']])
+        self.assertEqual([], fwgs[fwg_id]['egress_rule_list'])
+        self.assertEqual([], fwgs[fwg_id]['add-port-ids'])
+        self.assertEqual([], fwgs[fwg_id]['del-port-ids'])
+
+    def test_get_firewall_groups_for_router(self):
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1, \
+                self.subnet(cidr='20.0.0.0/24') as s2:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id1 = body['port_id']
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s2['subnet']['id'],
+                None)
+            port_id2 = body['port_id']
+            with self.firewall_rule(as_admin=True) as fwr:
+                with self.firewall_policy(
+                        firewall_rules=[fwr['firewall_rule']['id']],
+                        as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            ingress_firewall_policy_id=fwp_id,
+                            ports=[port_id1, port_id2],
+                            admin_state_up=self.ADMIN_STATE_UP) as fwg, \
+                            self.firewall_group(
+                                name='unbound',
+                                admin_state_up=self.ADMIN_STATE_UP):
+                        fwg_id = fwg['firewall_group']['id']
+                        observed = (
+                            self.callbacks.get_firewall_groups_for_router(
+                                ctx, [port_id1, 'other_port']))
+                        self.assertEqual(
+                            [], self.callbacks.get_firewall_groups_for_router(
+                                ctx, ['other_port']))
+
+        self.assertEqual([fwg_id], [fwg['id'] for fwg in observed])
+        self.assertEqual([fwr['firewall_rule']['id']],
+                         [r['id'] for r in observed[0]['ingress_rule_list']])
+        self.assertEqual([], observed[0]['egress_rule_list'])
+        self.assertEqual([port_id1], observed[0]['add-port-ids'])
+        self.assertEqual([], observed[0]['del-port-ids'])
+
+    def test_get_firewall_groups_for_ports(self):
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1, \
+                self.subnet(cidr='20.0.0.0/24') as s2:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id1 = body['port_id']
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s2['subnet']['id'],
+                None)
+            port_id2 = body['port_id']
+            with self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                    self.firewall_rule(name='fwr2', as_admin=True) as fwr2:
+                fwr_ids = [fwr1['firewall_rule']['id'],
+                           fwr2['firewall_rule']['id']]
+                with self.firewall_policy(firewall_rules=fwr_ids,
+                                          as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            egress_firewall_policy_id=fwp_id,
+                            ports=[port_id1, port_id2],
+                            admin_state_up=self.ADMIN_STATE_UP) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        observed = (
+                            self.callbacks.get_firewall_groups_for_ports(
+                                ctx, [port_id1, 'other_port']))
+                        observed_one = (
+                            self.callbacks.get_firewall_group_for_port(
+                                ctx, port_id=port_id2))
+                        self.assertIsNone(
+                            self.callbacks.get_firewall_group_for_port(
+                                ctx, port_id='other_port'))
+
+        self.assertEqual([port_id1], list(observed))
+        for fwg in (observed[port_id1], observed_one):
+            self.assertEqual(fwg_id, fwg['id'])
+            self.assertEqual([], fwg['ingress_rule_list'])
+            self.assertEqual(fwr_ids,
+                             [r['id'] for r in fwg['egress_rule_list']])
+
     def test_create_firewall_group_ports_not_specified(self):
         """neutron firewall-create test-policy """
         with self.firewall_policy(as_admin=True) as fwp:
@@ -498,6 +762,62 @@ class TestAgentDriver(test_fwaas_plugin_v2.FirewallPluginV2TestCase,
                     self.assertEqual(sorted([port_id2, port_id3]),
                                      sorted(res['firewall_group']['ports']))
 
+    def test_add_firewall_group_port(self):
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1, \
+                self.subnet(cidr='20.0.0.0/24') as s2:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id1 = body['port_id']
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s2['subnet']['id'],
+                None)
+            port_id2 = body['port_id']
+            with self.firewall_policy(as_admin=True) as fwp:
+                fwp_id = fwp['firewall_policy']['id']
+                with self.firewall_group(
+                        name='test',
+                        ingress_firewall_policy_id=fwp_id,
+                        ports=[port_id1],
+                        admin_state_up=True) as fwg:
+                    fwg_id = fwg['firewall_group']['id']
+                    ctx = context.get_admin_context()
+                    self.callbacks.set_firewall_group_status(
+                        ctx, fwg_id, nl_constants.ACTIVE)
+
+                    with mock.patch.object(
+                            self.plugin.driver.agent_rpc,
+                            'update_firewall_group') as mock_update, \
+                            mock.patch.object(
+                                self.plugin.driver,
+                                'update_firewall_group_precommit') as pre:
+                        observed = self.plugin.add_firewall_group_port(
+                            ctx, fwg_id, port_id2)
+                        # the ports already in the group are not loaded
+                        pre.assert_not_called()
+
+                    self.assertNotIn('ports', observed)
+                    self.assertEqual(nl_constants.PENDING_UPDATE,
+                                     observed['status'])
+                    self.assertEqual(
+                        nl_constants.PENDING_UPDATE,
+                        self.db.get_firewall_group(ctx, fwg_id)['status'])
+                    payload = mock_update.call_args[0][1]
+                    self.assertEqual([port_id2], payload['ports'])
+                    self.assertEqual([port_id2], payload['add-port-ids'])
+                    self.assertEqual([], payload['del-port-ids'])
+                    self.assertFalse(payload['last-port'])
+                    self.assertEqual([port_id2],
+                                     list(payload['port_details']))
+                    self.callbacks.set_firewall_group_status(
+                        ctx, fwg_id, nl_constants.ACTIVE)
+
     def test_update_firewall_rule_on_active_fwg(self):
         name = "new_firewall_rule1"
         attrs = self._get_test_firewall_rule_attrs(name)
@@ -535,6 +855,418 @@ class TestAgentDriver(test_fwaas_plugin_v2.FirewallPluginV2TestCase,
                         for k, v in attrs.items():
                             self.assertEqual(v, res['firewall_rule'][k])
 
+    def test_update_firewall_rule_on_several_active_fwgs(self):
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1, \
+                self.subnet(cidr='20.0.0.0/24') as s2:
+            port_ids = []
+            for s in (s1, s2):
+                body = self._router_interface_action(
+                    'add',
+                    r['router']['id'],
+                    s['subnet']['id'],
+                    None)
+                port_ids.append(body['port_id'])
+            with self.firewall_rule(as_admin=True) as fwr:
+                fwr_id = fwr['firewall_rule']['id']
+                with self.firewall_policy(
+                        firewall_rules=[fwr_id], as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test1',
+                            ingress_firewall_policy_id=fwp_id,
+                            ports=[port_ids[0]],
+                            admin_state_up=True) as fwg1, \
+                            self.firewall_group(
+                                name='test2',
+                                egress_firewall_policy_id=fwp_id,
+                                ports=[port_ids[1]],
+                                admin_state_up=True) as fwg2:
+                        fwg_ids = [fwg1['firewall_group']['id'],
+                                   fwg2['firewall_group']['id']]
+                        for fwg_id in fwg_ids:
+                            self.callbacks.set_firewall_group_status(
+                                ctx, fwg_id, nl_constants.ACTIVE)
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group') as mock_update:
+                            data = {'firewall_rule': {'name': 'new_name'}}
+                            req = self.new_update_request(
+                                'firewall_rules', data, fwr_id)
+                            res = req.get_response(self.ext_api)
+                            self.assertEqual(200, res.status_int)
+
+                        fwgs = {call[0][1]['id']: call[0][1]
+                                for call in mock_update.call_args_list}
+                        self.assertEqual(sorted(fwg_ids), sorted(fwgs))
+                        fwg1_payload = fwgs[fwg_ids[0]]
+                        self.assertEqual(nl_constants.PENDING_UPDATE,
+                                         fwg1_payload['status'])
+                        self.assertEqual(
+                            ['new_name'],
+                            [rule['name'] for rule in
+                             fwg1_payload['ingress_rule_list']])
+                        self.assertEqual([],
+                                         fwg1_payload['egress_rule_list'])
+                        self.assertEqual([port_ids[0]],
+                                         fwg1_payload['add-port-ids'])
+                        self.assertEqual([port_ids[0]],
+                                         list(fwg1_payload['port_details']))
+                        for fwg_id in fwg_ids:
+                            self.assertEqual(
+                                nl_constants.PENDING_UPDATE,
+                                self.db.get_firewall_group(
+                                    ctx, fwg_id)['status'])
+                        for fwg_id in fwg_ids:
+                            self.callbacks.set_firewall_group_status(
+                                ctx, fwg_id, nl_constants.ACTIVE)
+
+    def test_update_firewall_rule_delta_notification(self):
+        cfg.CONF.set_override('delta_notifications', True, 'fwaas')
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id = body['port_id']
+            with self.firewall_rule(name='fwr1', as_admin=True) as fwr1, \
+                    self.firewall_rule(name='fwr2', as_admin=True) as fwr2:
+                fwr_ids = [fwr1['firewall_rule']['id'],
+                           fwr2['firewall_rule']['id']]
+                with self.firewall_policy(
+                        firewall_rules=fwr_ids, as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test',
+                            ingress_firewall_policy_id=fwp_id,
+                            ports=[port_id],
+                            admin_state_up=True) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group') as mock_update:
+                            data = {'firewall_rule': {'name': 'new_name'}}
+                            req = self.new_update_request(
+                                'firewall_rules', data, fwr_ids[1])
+                            res = req.get_response(self.ext_api)
+                            self.assertEqual(200, res.status_int)
+
+                        mock_update.assert_called_once_with(
+                            mock.ANY, mock.ANY, agent_hosts=mock.ANY,
+                            version=agents.DELTA_RPC_VERSION)
+                        payload = mock_update.call_args[0][1]
+                        self.assertNotIn('ingress_rule_list', payload)
+                        patch = payload['ingress_rule_list_patch']
+                        revision = self.db.get_compiled_policies(
+                            ctx, [fwp_id])[fwp_id]['revision']
+                        self.assertEqual(revision, patch['revision'])
+                        self.assertEqual(
+                            revision, payload['ingress_rule_list_revision'])
+                        self.assertEqual([], patch['removed'])
+                        self.assertEqual([], patch['added'])
+                        self.assertEqual([fwr_ids[1]],
+                                         [rule_id for rule_id, changes
+                                          in patch['updated']])
+                        self.assertEqual('new_name',
+                                         patch['updated'][0][1]['name'])
+
+                        rule_lists = (
+                            self.callbacks.get_firewall_policies_rule_lists(
+                                ctx, [fwp_id]))
+                        self.assertEqual(revision,
+                                         rule_lists[fwp_id]['revision'])
+                        self.assertEqual(
+                            ['fwr1', 'new_name'],
+                            [rule['name'] for rule in
+                             rule_lists[fwp_id]['rules']])
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+    def test_update_firewall_rule_async_notification(self):
+        mock.patch.object(notification_queue.NotificationQueue,
+                          '_start').start()
+        queue = notification_queue.NotificationQueue()
+        self.plugin.driver.notification_queue = queue
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id = body['port_id']
+            with self.firewall_rule(name='fwr1', as_admin=True) as fwr1:
+                fwr_id = fwr1['firewall_rule']['id']
+                with self.firewall_policy(
+                        firewall_rules=[fwr_id], as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test',
+                            ingress_firewall_policy_id=fwp_id,
+                            ports=[port_id],
+                            admin_state_up=True) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        queue.dispatch_pending()
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group') as mock_update:
+                            data = {'firewall_rule': {'name': 'new_name'}}
+                            req = self.new_update_request(
+                                'firewall_rules', data, fwr_id)
+                            res = req.get_response(self.ext_api)
+                            self.assertEqual(200, res.status_int)
+                            mock_update.assert_not_called()
+                            self.assertEqual(
+                                nl_constants.PENDING_UPDATE,
+                                self.db.get_firewall_group(
+                                    ctx, fwg_id)['status'])
+                            self.assertEqual(1, queue.get_stats()['depth'])
+                            queue.dispatch_pending()
+
+                        mock_update.assert_called_once_with(
+                            mock.ANY, mock.ANY, agent_hosts=mock.ANY,
+                            version=None)
+                        payload = mock_update.call_args[0][1]
+                        self.assertEqual(
+                            ['new_name'],
+                            [rule['name'] for rule in
+                             payload['ingress_rule_list']])
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+    def test_update_firewall_rule_delayed_notification(self):
+        cfg.CONF.set_override('policy_notification_delay', 60, 'fwaas')
+        mock.patch.object(notification_queue.NotificationQueue,
+                          '_start').start()
+        queue = notification_queue.NotificationQueue()
+        self.plugin.driver.notification_queue = queue
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id = body['port_id']
+            with self.firewall_rule(name='fwr1', as_admin=True) as fwr1:
+                fwr_id = fwr1['firewall_rule']['id']
+                with self.firewall_policy(
+                        firewall_rules=[fwr_id], as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test',
+                            ingress_firewall_policy_id=fwp_id,
+                            ports=[port_id],
+                            admin_state_up=True) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        queue.dispatch_pending()
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group') as mock_update:
+                            # the firewall group is pending on the queued
+                            # notification, the second change of the policy
+                            # within the delay is coalesced into it
+                            for name in ('name1', 'name2'):
+                                data = {'firewall_rule': {'name': name}}
+                                req = self.new_update_request(
+                                    'firewall_rules', data, fwr_id)
+                                res = req.get_response(self.ext_api)
+                                self.assertEqual(200, res.status_int)
+                                self.assertEqual(
+                                    nl_constants.PENDING_UPDATE,
+                                    self.db.get_firewall_group(
+                                        ctx, fwg_id)['status'])
+                            queue.dispatch_pending()
+                            mock_update.assert_not_called()
+                            stats = queue.get_stats()
+                            self.assertEqual(1, stats['depth'])
+                            self.assertEqual(1, stats['coalesced'])
+                            queue.dispatch_pending(wait=True)
+
+                        mock_update.assert_called_once_with(
+                            mock.ANY, mock.ANY, agent_hosts=mock.ANY,
+                            version=None)
+                        payload = mock_update.call_args[0][1]
+                        self.assertEqual(
+                            ['name2'],
+                            [rule['name'] for rule in
+                             payload['ingress_rule_list']])
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+    def test_update_firewall_rule_async_notification_failure(self):
+        mock.patch.object(notification_queue.NotificationQueue,
+                          '_start').start()
+        queue = notification_queue.NotificationQueue()
+        self.plugin.driver.notification_queue = queue
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id = body['port_id']
+            with self.firewall_rule(name='fwr1', as_admin=True) as fwr1:
+                fwr_id = fwr1['firewall_rule']['id']
+                with self.firewall_policy(
+                        firewall_rules=[fwr_id], as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test',
+                            ingress_firewall_policy_id=fwp_id,
+                            ports=[port_id],
+                            admin_state_up=True) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        queue.dispatch_pending()
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group',
+                                side_effect=ValueError) as mock_update:
+                            data = {'firewall_rule': {'name': 'new_name'}}
+                            req = self.new_update_request(
+                                'firewall_rules', data, fwr_id)
+                            res = req.get_response(self.ext_api)
+                            self.assertEqual(200, res.status_int)
+                            queue.dispatch_pending(wait=True)
+
+                        # the firewall group is not left pending once the
+                        # retries of its notification are exhausted
+                        self.assertEqual(queue.max_retries + 1,
+                                         mock_update.call_count)
+                        self.assertEqual(
+                            nl_constants.ERROR,
+                            self.db.get_firewall_group(
+                                ctx, fwg_id)['status'])
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+    def test_update_firewall_rule_slim_notification(self):
+        cfg.CONF.set_override('slim_rule_notifications', True, 'fwaas')
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id = body['port_id']
+            with self.firewall_rule(as_admin=True) as fwr:
+                fwr_id = fwr['firewall_rule']['id']
+                with self.firewall_policy(
+                        firewall_rules=[fwr_id], as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test',
+                            egress_firewall_policy_id=fwp_id,
+                            ports=[port_id],
+                            admin_state_up=True) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group') as mock_update:
+                            data = {'firewall_rule': {'name': 'new_name'}}
+                            req = self.new_update_request(
+                                'firewall_rules', data, fwr_id)
+                            res = req.get_response(self.ext_api)
+                            self.assertEqual(200, res.status_int)
+
+                        mock_update.assert_called_once_with(
+                            mock.ANY, mock.ANY, agent_hosts=mock.ANY,
+                            version=agents.SLIM_RPC_VERSION)
+                        payload = mock_update.call_args[0][1]
+                        self.assertEqual([], payload['ingress_rule_list'])
+                        rule = self.db.get_firewall_rule(ctx, fwr_id)
+                        self.assertEqual([rule_schema.encode_rule(rule)],
+                                         payload['egress_rule_list'])
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
+    def test_slim_rules_synced_then_cast(self):
+        cfg.CONF.set_override('slim_rule_notifications', True, 'fwaas')
+        ctx = context.get_admin_context()
+        with self.router(name='router1', admin_state_up=True,
+            tenant_id=self._tenant_id) as r, \
+                self.subnet() as s1:
+            body = self._router_interface_action(
+                'add',
+                r['router']['id'],
+                s1['subnet']['id'],
+                None)
+            port_id = body['port_id']
+            with self.firewall_rule(as_admin=True) as fwr:
+                fwr_id = fwr['firewall_rule']['id']
+                with self.firewall_policy(
+                        firewall_rules=[fwr_id], as_admin=True) as fwp:
+                    fwp_id = fwp['firewall_policy']['id']
+                    with self.firewall_group(
+                            name='test',
+                            egress_firewall_policy_id=fwp_id,
+                            ports=[port_id],
+                            admin_state_up=True) as fwg:
+                        fwg_id = fwg['firewall_group']['id']
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+                        synced = self.callbacks.get_firewall_groups_for_ports(
+                            ctx, [port_id])[port_id]
+                        synced_router = (
+                            self.callbacks.get_firewall_groups_for_router(
+                                ctx, [port_id]))[0]
+                        rule_lists = (
+                            self.callbacks.get_firewall_policies_rule_lists(
+                                ctx, [fwp_id]))
+
+                        with mock.patch.object(
+                                self.plugin.driver.agent_rpc,
+                                'update_firewall_group') as mock_update:
+                            data = {'firewall_rule': {'name': 'new_name'}}
+                            req = self.new_update_request(
+                                'firewall_rules', data, fwr_id)
+                            res = req.get_response(self.ext_api)
+                            self.assertEqual(200, res.status_int)
+
+                        payload = rule_schema.decode_firewall_group(
+                            mock_update.call_args[0][1])
+                        # the rules synced before the cast are unchanged
+                        expected = payload['egress_rule_list']
+                        self.assertEqual(expected, synced['egress_rule_list'])
+                        self.assertEqual(expected,
+                                         synced_router['egress_rule_list'])
+                        self.assertEqual(expected,
+                                         rule_lists[fwp_id]['rules'])
+                        self.callbacks.set_firewall_group_status(
+                            ctx, fwg_id, nl_constants.ACTIVE)
+
     def test_update_firewall_rule_on_pending_create_fwg(self):
         """update should fail"""
         name = "new_firewall_rule1"
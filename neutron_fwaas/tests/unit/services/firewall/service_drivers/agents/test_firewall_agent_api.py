@@ -15,6 +15,7 @@
 
 from unittest import mock
 
+from neutron_fwaas.common import rule_schema
 from neutron_fwaas.services.firewall.service_drivers.agents.drivers \
     import fwaas_base
 from neutron_fwaas.services.firewall.service_drivers.agents.drivers \
@@ -95,3 +96,86 @@ class TestFWaaSAgentApi(base.BaseTestCase):
 
     def test_firewall_deleted(self):
         self._test_firewall_method('firewall_deleted')
+
+    def test_get_firewall_policies_rule_lists(self):
+        with mock.patch.object(self.api.client, 'call') as rpc_mock, \
+                mock.patch.object(self.api.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = self.api.client
+            self.api.get_firewall_policies_rule_lists(
+                mock.sentinel.context, ['policy1'])
+
+        prepare_mock.assert_called_once_with(version='1.4')
+        rpc_mock.assert_called_once_with(
+            mock.sentinel.context, 'get_firewall_policies_rule_lists',
+            policy_ids=['policy1'])
+
+
+class TestRuleListResolver(base.BaseTestCase):
+    def setUp(self):
+        super(TestRuleListResolver, self).setUp()
+        self.plugin_rpc = mock.Mock()
+        self.resolver = api.RuleListResolver(self.plugin_rpc)
+        self.rules = [{'id': 'rule1', 'action': 'allow'},
+                      {'id': 'rule2', 'action': 'allow'}]
+
+    def _fwg(self, revision=1, **kwargs):
+        fwg = {'id': 'fwg1',
+               'ingress_firewall_policy_id': 'policy1',
+               'egress_firewall_policy_id': None,
+               'ingress_rule_list_revision': revision,
+               'egress_rule_list': []}
+        fwg.update(kwargs)
+        return fwg
+
+    def _patch(self, base_revision=1, revision=2):
+        return {'base_revision': base_revision, 'revision': revision,
+                'removed': [], 'added': [],
+                'updated': [['rule2', {'action': 'deny'}]]}
+
+    def test_resolve_full_rule_list(self):
+        fwg = self._fwg(ingress_rule_list=self.rules)
+        self.assertEqual(self.rules,
+                         self.resolver.resolve(mock.sentinel.context,
+                                               fwg)['ingress_rule_list'])
+        self.plugin_rpc.get_firewall_policies_rule_lists.assert_not_called()
+
+    def test_resolve_patch(self):
+        self.resolver.resolve(mock.sentinel.context,
+                              self._fwg(ingress_rule_list=self.rules))
+        fwg = self._fwg(revision=2, ingress_rule_list_patch=self._patch())
+        self.resolver.resolve(mock.sentinel.context, fwg)
+
+        self.assertNotIn('ingress_rule_list_patch', fwg)
+        self.assertEqual(['allow', 'deny'],
+                         [rule['action'] for rule in
+                          fwg['ingress_rule_list']])
+        self.assertEqual('allow', self.rules[1]['action'])
+        # the same patch cast to another firewall group of the policy
+        fwg = self._fwg(revision=2, id='fwg2',
+                        ingress_rule_list_patch=self._patch())
+        self.resolver.resolve(mock.sentinel.context, fwg)
+        self.assertEqual(['allow', 'deny'],
+                         [rule['action'] for rule in
+                          fwg['ingress_rule_list']])
+        self.plugin_rpc.get_firewall_policies_rule_lists.assert_not_called()
+
+    def test_resolve_slim_rules(self):
+        slim_rules = [rule_schema.encode_rule(rule) for rule in self.rules]
+        fwg = self._fwg(ingress_rule_list=slim_rules)
+        self.resolver.resolve(mock.sentinel.context, fwg)
+        self.assertEqual([rule_schema.slim_rule(rule) for rule in self.rules],
+                         fwg['ingress_rule_list'])
+
+    def test_resolve_patch_unknown_base(self):
+        self.resolver.resolve(mock.sentinel.context,
+                              self._fwg(ingress_rule_list=self.rules))
+        self.plugin_rpc.get_firewall_policies_rule_lists.return_value = {
+            'policy1': {'revision': 3, 'rules': self.rules[:1]}}
+        fwg = self._fwg(revision=3, ingress_rule_list_patch=self._patch(
+            base_revision=2, revision=3))
+        self.resolver.resolve(mock.sentinel.context, fwg)
+
+        rpc_mock = self.plugin_rpc.get_firewall_policies_rule_lists
+        rpc_mock.assert_called_once_with(mock.sentinel.context, ['policy1'])
+        self.assertEqual(self.rules[:1], fwg['ingress_rule_list'])
+        self.assertEqual(3, fwg['ingress_rule_list_revision'])
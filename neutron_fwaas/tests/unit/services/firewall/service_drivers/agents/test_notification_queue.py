@@ -0,0 +1,145 @@
+# Copyright (c) 2026
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from neutron_fwaas.services.firewall.service_drivers.agents import \
+    notification_queue
+from neutron_fwaas.tests import base
+
+
+class TestNotificationQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestNotificationQueue, self).setUp()
+        mock.patch.object(notification_queue.NotificationQueue,
+                          '_start').start()
+        self.queue = notification_queue.NotificationQueue()
+        self.context = mock.Mock()
+        self.context.session.in_transaction.return_value = False
+        self.calls = []
+
+    def _notification(self, context, *args):
+        self.calls.append(args)
+
+    def _failing(self, *errors):
+        errors = list(errors)
+
+        def failing(context, *args):
+            self.calls.append(('failing',) + args)
+            error = errors.pop(0)
+            if error:
+                raise error()
+        return failing
+
+    def test_dispatch_in_order(self):
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        self.queue.put(self.context, 'fwp1', self._notification, 'fwp1')
+        self.assertEqual(3, self.queue.get_stats()['depth'])
+        self.queue.dispatch_pending()
+        self.assertEqual([('fwg1',), ('fwg1',), ('fwp1',)], self.calls)
+        self.assertEqual({'depth': 0, 'coalesced': 0, 'dispatched': 3,
+                          'failures': 0}, self.queue.get_stats())
+
+    def test_coalesce_pending_notifications(self):
+        self.queue.put(self.context, 'fwp1', self._notification, 'fwp1')
+        self.queue.put(self.context, 'fwp2', self._notification, 'fwp2')
+        self.queue.put(self.context, 'fwp1', self._notification, 'fwp1')
+        self.queue.dispatch_pending()
+        self.queue.put(self.context, 'fwp1', self._notification, 'fwp1')
+        self.queue.dispatch_pending()
+        self.assertEqual([('fwp1',), ('fwp2',), ('fwp1',)], self.calls)
+        self.assertEqual(1, self.queue.get_stats()['coalesced'])
+
+    def test_merge_delayed_items(self):
+        self.queue.put_items(self.context, 'policies', self._notification,
+                             ['fwp2'], delay=60)
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        self.queue.put_items(self.context, 'policies', self._notification,
+                             ['fwp1', 'fwp2'], delay=60)
+        self.assertEqual({'fwp1', 'fwp2'}, self.queue.get_items('policies'))
+        self.assertEqual(set(), self.queue.get_items('fwg1'))
+        # the notifications queued after a delayed one are not held back
+        self.assertLess(self.queue._next_timeout(), 0)
+        self.queue.dispatch_pending()
+        self.assertEqual([('fwg1',)], self.calls)
+        self.assertEqual(1, self.queue.get_stats()['depth'])
+        self.assertGreater(self.queue._next_timeout(), 0)
+        self.queue.dispatch_pending(wait=True)
+        self.assertEqual([('fwg1',), (['fwp1', 'fwp2'],)], self.calls)
+        self.assertEqual(1, self.queue.get_stats()['coalesced'])
+
+    def test_failed_notification(self):
+        failing = self._failing(ValueError, None)
+        self.queue.put(self.context, None, failing, 'fwg1')
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        self.queue.dispatch_pending()
+        # the failed notification is retried later and holds back the
+        # notifications queued after it
+        self.assertEqual([('failing', 'fwg1')], self.calls)
+        self.assertEqual(2, self.queue.get_stats()['depth'])
+        self.assertGreater(self.queue._next_timeout(), 0)
+        self.queue.dispatch_pending(wait=True)
+        self.assertEqual(
+            [('failing', 'fwg1'), ('failing', 'fwg1'), ('fwg1',)],
+            self.calls)
+        self.assertEqual({'depth': 0, 'coalesced': 0, 'dispatched': 2,
+                          'failures': 1}, self.queue.get_stats())
+
+    def test_failed_notification_retried_in_place(self):
+        self.queue = notification_queue.NotificationQueue(retry_interval=0)
+        failing = self._failing(ValueError, None)
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        self.queue.put(self.context, None, failing, 'fwg2')
+        self.queue.put(self.context, None, self._notification, 'fwg2')
+        self.queue.dispatch_pending()
+        self.assertEqual(
+            [('fwg1',), ('failing', 'fwg2'), ('failing', 'fwg2'),
+             ('fwg2',)], self.calls)
+
+    def test_failed_notification_retries_exhausted(self):
+        failing = mock.Mock(side_effect=ValueError, __name__='failing')
+        self.queue.put_items(self.context, 'policies', failing, ['fwp1'],
+                             on_failure=self._notification)
+        self.queue.dispatch_pending(wait=True)
+        self.assertEqual(self.queue.max_retries + 1, failing.call_count)
+        self.assertEqual([(['fwp1'],)], self.calls)
+        self.assertEqual(self.queue.max_retries + 1,
+                         self.queue.get_stats()['failures'])
+
+    def test_report_stats(self):
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        with mock.patch.object(notification_queue.LOG, 'debug') as debug:
+            self.queue.dispatch_pending()
+            debug.assert_not_called()
+            self.queue._reported_at -= notification_queue.STATS_INTERVAL
+            self.queue.dispatch_pending()
+            debug.assert_called_once_with(mock.ANY, self.queue.get_stats())
+
+    def test_queued_on_commit(self):
+        session = self.context.session
+        session.in_transaction.return_value = True
+        session.info = {}
+        self.queue.put(self.context, None, self._notification, 'fwg1')
+        self.assertEqual(0, self.queue.get_stats()['depth'])
+        notification_queue._queue_pending_notifications(session)
+        self.assertEqual(1, self.queue.get_stats()['depth'])
+
+        self.queue.put(self.context, None, self._notification, 'fwg2')
+        notification_queue._drop_pending_notifications(session)
+        notification_queue._queue_pending_notifications(session)
+        self.queue.dispatch_pending()
+        self.assertEqual([('fwg1',)], self.calls)
@@ -618,6 +618,40 @@ class TestFirewallPluginBasev2(FirewallPluginV2TestCase):
                         self.assertEqual(webob.exc.HTTPConflict.code,
                                          res.status_int)
 
+    def test_update_firewall_group_reads_policy_once(self):
+        ctx = self._get_admin_context()
+        with self.firewall_policy(as_admin=True) as fwp, \
+                self.firewall_group(as_admin=True) as fwg:
+            fwp_id = fwp['firewall_policy']['id']
+            fwg_id = fwg['firewall_group']['id']
+            data = {'firewall_group': {'ingress_firewall_policy_id': fwp_id,
+                                       'egress_firewall_policy_id': fwp_id}}
+            with mock.patch.object(
+                    self.plugin, 'get_firewall_policy',
+                    wraps=self.plugin.get_firewall_policy) as get_fwp:
+                fwg = self.plugin.update_firewall_group(ctx, fwg_id, data)
+            get_fwp.assert_called_once_with(ctx, fwp_id)
+            self.assertEqual(fwp_id, fwg['egress_firewall_policy_id'])
+
+    def test_create_firewall_group_bulk_reads_policies_once(self):
+        ctx = self._get_admin_context()
+        with self.firewall_policy(as_admin=True) as fwp:
+            fwp_id = fwp['firewall_policy']['id']
+            data = {'firewall_groups': [
+                {'firewall_group': {'name': 'fwg%d' % i,
+                                    'tenant_id': self._tenant_id,
+                                    'ingress_firewall_policy_id': fwp_id,
+                                    'egress_firewall_policy_id': fwp_id}}
+                for i in range(3)]}
+            with mock.patch.object(
+                    self.plugin, 'get_firewall_policy',
+                    wraps=self.plugin.get_firewall_policy) as get_fwp, \
+                    mock.patch.object(self.plugin.driver,
+                                      'create_firewall_groups') as create:
+                self.plugin.create_firewall_group_bulk(ctx, data)
+            get_fwp.assert_called_once_with(ctx, fwp_id)
+            self.assertEqual(3, len(create.call_args[0][1]))
+
     def test_create_firewall_policy_with_other_project_not_shared_rule(self):
         project1_context = self._get_nonadmin_context(tenant_id='project1')
         project2_context = self._get_nonadmin_context(tenant_id='project2')
@@ -683,6 +717,7 @@ class TestAutomaticAssociation(TestFirewallPluginBasev2):
         self.plugin.get_firewall_groups = \
             mock.Mock(return_value=[fake_default_fwg])
         self.plugin.update_firewall_group = mock.Mock()
+        self.plugin.add_firewall_group_port = mock.Mock()
         kwargs = {
             "context": mock.ANY,
             "port": port,
@@ -698,14 +733,11 @@ class TestAutomaticAssociation(TestFirewallPluginBasev2):
                 'tenant_id': [kwargs['port']['project_id']],
                 'name': [fake_default_fwg['name']],
             },
-            fields=['id', 'ports'],
-        )
-        port_ids = fake_default_fwg['ports'] + [kwargs['port']['id']]
-        self.plugin.update_firewall_group.assert_called_once_with(
-            mock.ANY,
-            fake_default_fwg['id'],
-            {'firewall_group': {'ports': port_ids}},
+            fields=['id'],
         )
+        self.plugin.add_firewall_group_port.assert_called_once_with(
+            mock.ANY, fake_default_fwg['id'], kwargs['port']['id'])
+        self.plugin.update_firewall_group.assert_not_called()
 
     def test_vm_port_not_newly_created(self):
         self.plugin.get_firewall_group = mock.Mock()
@@ -763,7 +795,7 @@ class TestAutomaticAssociation(TestFirewallPluginBasev2):
         }
         self.plugin._core_plugin.get_port = mock.Mock(return_value=port)
         self.plugin.get_firewall_groups = mock.Mock(return_value=[])
-        self.plugin.update_firewall_group = mock.Mock(
+        self.plugin.add_firewall_group_port = mock.Mock(
             side_effect=f_exc.FirewallGroupPortInUse(port_ids=[port_id]))
         states = ({"binding:vif_type": "unbound"}, port)
         payload = events.DBEventPayload(mock.ANY, states=states)